@@ -0,0 +1,102 @@
+"""
+Shared configuration for the Signal ETL scripts.
+
+Every value can be overridden with an environment variable of the same name.
+"""
+import os
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "postgresql+psycopg2://postgres@localhost:5432/signal")
+
+# API keys
+ALPHA_VANTAGE_API_KEY = os.environ.get("ALPHA_VANTAGE_API_KEY", "SFRHBUTCXB3RDG5S")
+COINMARKETCAP_API_KEY = os.environ.get("COINMARKETCAP_API_KEY", "42485936-1986-4342-9e0a-e854c8b0fe47")
+GOLD_API_KEY = os.environ.get("GOLD_API_KEY", "goldapi-eooasm506kn11-io")
+
+# Provider base URLs. PROVIDER_SIMULATOR_URL points every provider at one
+# local stand-in (scripts/provider_simulator.py) unless a provider's own
+# variable is set.
+PROVIDER_SIMULATOR_URL = os.environ.get("PROVIDER_SIMULATOR_URL")
+COINMARKETCAP_BASE_URL = os.environ.get(
+    "COINMARKETCAP_BASE_URL", PROVIDER_SIMULATOR_URL or "https://pro-api.coinmarketcap.com"
+)
+GOLD_API_BASE_URL = os.environ.get("GOLD_API_BASE_URL", PROVIDER_SIMULATOR_URL or "https://www.goldapi.io")
+ALPHA_VANTAGE_BASE_URL = os.environ.get(
+    "ALPHA_VANTAGE_BASE_URL", PROVIDER_SIMULATOR_URL or "https://www.alphavantage.co"
+)
+
+# News sentiment queries; every ticker and topic is a separate Alpha Vantage call.
+NEWS_TICKERS = os.environ.get("NEWS_TICKERS", "CRYPTO:BTC,CRYPTO:ETH").split(",")
+NEWS_TOPICS = os.environ.get("NEWS_TOPICS", "blockchain,financial_markets").split(",")
+
+# CSV path or URL listing the S&P 500 members loaded by the sp500_constituents job.
+SP500_CONSTITUENTS = os.environ.get(
+    "SP500_CONSTITUENTS",
+    f"{PROVIDER_SIMULATOR_URL}/constituents.csv" if PROVIDER_SIMULATOR_URL
+    else "https://datahub.io/core/s-and-p-500-companies/r/constituents.csv",
+)
+
+# Maximum number of concurrent requests per provider. The Alpha Vantage jobs
+# share one key and quota, so they get the tightest limit.
+PROVIDER_CONCURRENCY = {
+    "alpha_vantage": int(os.environ.get("ALPHA_VANTAGE_MAX_CONCURRENCY", 2)),
+    "coinmarketcap": int(os.environ.get("COINMARKETCAP_MAX_CONCURRENCY", 4)),
+    "goldapi": int(os.environ.get("GOLD_API_MAX_CONCURRENCY", 1)),
+}
+
+# Scheduler cadence per job, in seconds. The Alpha Vantage jobs share one
+# 25 calls/day key: news_sentiment makes one call per ticker and topic (4 by
+# default, 8 a day every 12 hours), sp500, treasury_yield and
+# federal_funds_rate one each a day, and sp500_constituents its
+# SP500_CONSTITUENTS_CALLS_PER_RUN (10 a day), leaving a few for paging.
+SCHEDULE = {
+    "gold": int(os.environ.get("GOLD_INTERVAL", 60 * 60)),
+    "crypto": int(os.environ.get("CRYPTO_INTERVAL", 60 * 60)),
+    "news_sentiment": int(os.environ.get("NEWS_SENTIMENT_INTERVAL", 12 * 60 * 60)),
+    "sp500": int(os.environ.get("SP500_INTERVAL", 24 * 60 * 60)),
+    "treasury_yield": int(os.environ.get("TREASURY_YIELD_INTERVAL", 24 * 60 * 60)),
+    "federal_funds_rate": int(os.environ.get("FEDERAL_FUNDS_RATE_INTERVAL", 24 * 60 * 60)),
+    "sp500_constituents": int(os.environ.get("SP500_CONSTITUENTS_INTERVAL", 24 * 60 * 60)),
+}
+
+# How often the scheduler creates the upcoming monthly partitions, in seconds,
+# and how many months ahead it keeps them.
+PARTITION_MAINTENANCE_INTERVAL = int(os.environ.get("PARTITION_MAINTENANCE_INTERVAL", 24 * 60 * 60))
+PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", 3))
+
+# API quota per provider key: (calls per minute, calls per day). None means unlimited.
+PROVIDER_QUOTAS = {
+    "alpha_vantage": (int(os.environ.get("ALPHA_VANTAGE_CALLS_PER_MINUTE", 5)),
+                      int(os.environ.get("ALPHA_VANTAGE_CALLS_PER_DAY", 25))),
+    "coinmarketcap": (int(os.environ.get("COINMARKETCAP_CALLS_PER_MINUTE", 30)),
+                      int(os.environ.get("COINMARKETCAP_CALLS_PER_DAY", 333))),
+    "goldapi": (int(os.environ.get("GOLD_API_CALLS_PER_MINUTE", 10)), None),
+}
+
+# Calls one sp500_constituents run may make: its share of the Alpha Vantage
+# daily quota, spread over the runs in a day, so the other jobs on the key
+# (sp500, treasury_yield, federal_funds_rate, news_sentiment) still get theirs.
+# Every member is one call, so at the free 25 calls/day the first pass over
+# ~500 members takes weeks (10 symbols a day); raise ALPHA_VANTAGE_CALLS_PER_DAY
+# on a premium key to load them all in one run.
+SP500_CONSTITUENTS_QUOTA_SHARE = float(os.environ.get("SP500_CONSTITUENTS_QUOTA_SHARE", 0.4))
+SP500_CONSTITUENTS_CALLS_PER_RUN = int(os.environ.get(
+    "SP500_CONSTITUENTS_CALLS_PER_RUN",
+    max(1, int(PROVIDER_QUOTAS["alpha_vantage"][1] * SP500_CONSTITUENTS_QUOTA_SHARE
+               * SCHEDULE["sp500_constituents"] / 86400)),
+))
+
+# Streaming mode (scripts/stream.py): seconds between polls per job, and how
+# the write-behind queue batches ticks into database loads. A stream on a key
+# with a daily quota is paced to use at most STREAM_QUOTA_SHARE of it, leaving
+# the rest to the scheduled jobs on the same key; each poll is one call.
+STREAM_QUOTA_SHARE = float(os.environ.get("STREAM_QUOTA_SHARE", 0.25))
+STREAM_INTERVALS = {
+    "gold": float(os.environ.get("GOLD_STREAM_INTERVAL", 10)),
+    # 333 calls/day * 0.25 -> one poll about every 17 minutes.
+    "crypto": float(os.environ.get(
+        "CRYPTO_STREAM_INTERVAL", 86400 / (PROVIDER_QUOTAS["coinmarketcap"][1] * STREAM_QUOTA_SHARE)
+    )),
+}
+STREAM_CRYPTO_LIMIT = int(os.environ.get("STREAM_CRYPTO_LIMIT", 100))
+STREAM_FLUSH_ROWS = int(os.environ.get("STREAM_FLUSH_ROWS", 5000))
+STREAM_FLUSH_SECONDS = float(os.environ.get("STREAM_FLUSH_SECONDS", 30))
@@ -1,5 +1,5 @@
 CREATE TABLE crypto_data (
-    id INT PRIMARY KEY,
+    id INT NOT NULL,                         -- CoinMarketCap asset id
     name TEXT,
     symbol TEXT,
     cmc_rank INT,
@@ -14,11 +14,15 @@ CREATE TABLE crypto_data (
     percent_change_7d NUMERIC,
     last_updated TIMESTAMP,
     data_loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE (id, last_updated)
-);
+    PRIMARY KEY (id, last_updated)           -- One row per asset per CoinMarketCap update
+) PARTITION BY RANGE (last_updated);         -- Monthly partitions, see create_monthly_partitions()
+
+CREATE TABLE crypto_data_default PARTITION OF crypto_data DEFAULT;
+CREATE INDEX crypto_data_last_updated_brin ON crypto_data USING BRIN (last_updated);
+CREATE INDEX crypto_data_symbol_idx ON crypto_data (symbol, last_updated);
 
 CREATE TABLE gold_price_history (
-    id SERIAL PRIMARY KEY,                  -- Auto-incrementing unique identifier
+    id SERIAL,                              -- Auto-incrementing unique identifier
     timestamp TIMESTAMP NOT NULL,           -- Timestamp from the API response
     prev_close_price NUMERIC(10, 4),        -- Previous close price with 4 decimal precision
     open_price NUMERIC(10, 4),              -- Opening price with 4 decimal precision
@@ -29,7 +33,54 @@ CREATE TABLE gold_price_history (
     chp NUMERIC(6, 2),                      -- Percentage change in price
     ask NUMERIC(10, 4),                     -- Ask price
     bid NUMERIC(10, 4),                     -- Bid price
-    pulled_at TIMESTAMP NOT NULL            -- Timestamp when the data was pulled
+    pulled_at TIMESTAMP NOT NULL,           -- Timestamp when the data was pulled
+    PRIMARY KEY (id, timestamp),            -- Partitioned tables need the partition key in every unique key
+    UNIQUE (timestamp)                      -- One row per API quote, so repeated pulls dedupe
+) PARTITION BY RANGE (timestamp);           -- Monthly partitions, see create_monthly_partitions()
+
+CREATE TABLE gold_price_history_default PARTITION OF gold_price_history DEFAULT;
+CREATE INDEX gold_price_history_timestamp_brin ON gold_price_history USING BRIN (timestamp);
+
+-- Incremental OHLC rollups of the snapshot tables, maintained by etl/rollups.py.
+CREATE TABLE crypto_ohlc_hourly (
+    id INT NOT NULL,                         -- CoinMarketCap asset id
+    bucket TIMESTAMP NOT NULL,               -- Start of the hour
+    symbol TEXT,
+    open NUMERIC,
+    high NUMERIC,
+    low NUMERIC,
+    close NUMERIC,
+    volume_24h NUMERIC,                      -- 24h volume at the last snapshot in the bucket
+    samples INT NOT NULL,                    -- Snapshots in the bucket
+    PRIMARY KEY (id, bucket)
+);
+
+CREATE TABLE crypto_ohlc_daily (LIKE crypto_ohlc_hourly INCLUDING ALL);
+
+CREATE TABLE gold_ohlc_hourly (
+    bucket TIMESTAMP PRIMARY KEY,            -- Start of the hour
+    open NUMERIC(10, 4),
+    high NUMERIC(10, 4),
+    low NUMERIC(10, 4),
+    close NUMERIC(10, 4),
+    samples INT NOT NULL                     -- Snapshots in the bucket
+);
+
+CREATE TABLE gold_ohlc_daily (LIKE gold_ohlc_hourly INCLUDING ALL);
+
+-- Streaming technical indicators, maintained by etl/indicators.py.
+CREATE TABLE technical_indicators (
+    source TEXT NOT NULL,                    -- Price table (e.g., crypto_data)
+    series_key TEXT NOT NULL,                -- Asset within the source (crypto id, symbol, or the table name)
+    time TIMESTAMP NOT NULL,                 -- Time of the bar
+    sma_20 NUMERIC,
+    ema_12 NUMERIC,
+    ema_26 NUMERIC,
+    rsi_14 NUMERIC,                          -- Wilder RSI
+    bollinger_upper NUMERIC,                 -- SMA 20 + 2 standard deviations
+    bollinger_lower NUMERIC,                 -- SMA 20 - 2 standard deviations
+    realized_vol_20 NUMERIC,                 -- Standard deviation of the last 20 log returns
+    PRIMARY KEY (source, series_key, time)
 );
 
 CREATE TABLE treasury_yields (
@@ -54,9 +105,30 @@ CREATE TABLE sp500_index_data (
     pulled_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- When the data was pulled
 );
 
+CREATE TABLE sp500_constituents (
+    symbol VARCHAR(10) PRIMARY KEY,
+    name VARCHAR(100),
+    sector VARCHAR(50),                      -- GICS sector
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE sp500_constituent_bars (
+    symbol VARCHAR(10) NOT NULL,             -- Ticker as listed in sp500_constituents
+    date DATE NOT NULL,
+    open DECIMAL(10, 4) NOT NULL,
+    high DECIMAL(10, 4) NOT NULL,
+    low DECIMAL(10, 4) NOT NULL,
+    close DECIMAL(10, 4) NOT NULL,
+    volume BIGINT NOT NULL,
+    pulled_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (symbol, date)
+);
+
+CREATE INDEX sp500_constituent_bars_date_idx ON sp500_constituent_bars (date);
+
 CREATE TABLE news_sentiment (
     title TEXT NOT NULL,                     -- Title of the news article
-    url TEXT NOT NULL,                       -- URL of the news article
+    url TEXT PRIMARY KEY,                    -- URL of the news article, so re-pulled articles dedupe
     time_published TIMESTAMP NOT NULL,       -- Time the news was published
     authors TEXT[],                          -- Array of authors
     summary TEXT,                            -- Summary of the article
@@ -70,3 +142,176 @@ CREATE TABLE news_sentiment (
     ticker_sentiment JSONB,                  -- Ticker sentiment as JSON array (e.g., [{'ticker': 'META', 'relevance_score': '0.0621'}])
     pulled_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- When the data was pulled
 );
+
+CREATE INDEX news_sentiment_time_published_brin ON news_sentiment USING BRIN (time_published);
+CREATE INDEX news_sentiment_ticker_sentiment_gin ON news_sentiment USING GIN (ticker_sentiment jsonb_path_ops);
+CREATE INDEX news_sentiment_topics_gin ON news_sentiment USING GIN (topics jsonb_path_ops);
+
+CREATE TABLE news_ticker_sentiment (
+    url TEXT NOT NULL REFERENCES news_sentiment (url) ON DELETE CASCADE,
+    ticker TEXT NOT NULL,                    -- Ticker (e.g., CRYPTO:BTC)
+    relevance NUMERIC(10, 6),                -- Relevance of the article to the ticker
+    sentiment_score NUMERIC(10, 6),          -- Ticker sentiment score
+    label TEXT,                              -- Ticker sentiment label (e.g., Somewhat-Bullish)
+    time_published TIMESTAMP NOT NULL,       -- Copied from the article for per-ticker time ranges
+    PRIMARY KEY (url, ticker)
+);
+
+CREATE INDEX news_ticker_sentiment_ticker_idx ON news_ticker_sentiment (ticker, time_published);
+
+CREATE TABLE news_topics (
+    url TEXT NOT NULL REFERENCES news_sentiment (url) ON DELETE CASCADE,
+    topic TEXT NOT NULL,                     -- Topic (e.g., Blockchain)
+    relevance NUMERIC(10, 6),                -- Relevance of the article to the topic
+    time_published TIMESTAMP NOT NULL,       -- Copied from the article for per-topic time ranges
+    PRIMARY KEY (url, topic)
+);
+
+CREATE INDEX news_topics_topic_idx ON news_topics (topic, time_published);
+
+CREATE TABLE etl_metadata (
+    source TEXT PRIMARY KEY,                 -- Source key (the target table name)
+    watermark TIMESTAMP,                     -- Latest date or timestamp loaded
+    last_rows INT NOT NULL DEFAULT 0,        -- Rows inserted by the last run
+    total_rows BIGINT NOT NULL DEFAULT 0,    -- Rows inserted across all runs
+    payload_hash TEXT,                       -- SHA-256 of the last raw payload
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    failures INT NOT NULL DEFAULT 0,         -- Failed fetches since the last load, for backoff
+    failed_at TIMESTAMP                      -- Time of the last failed fetch
+);
+
+CREATE TABLE etl_runs (
+    run_id BIGSERIAL PRIMARY KEY,
+    source TEXT NOT NULL,                    -- Source key (the target table name)
+    started_at TIMESTAMP NOT NULL,
+    status VARCHAR(20) NOT NULL,             -- ok, fetch_failed, load_failed or error
+    total_seconds DOUBLE PRECISION,
+    fetch_seconds DOUBLE PRECISION,          -- Stage times exclude nested stages
+    process_seconds DOUBLE PRECISION,
+    validate_seconds DOUBLE PRECISION,
+    upsert_seconds DOUBLE PRECISION,
+    after_load_seconds DOUBLE PRECISION,
+    http_requests INT,
+    retries INT,
+    payload_bytes BIGINT,                    -- Response bytes as received (before decompression)
+    rows_in INT,                             -- Rows entering validation
+    rows_dropped INT,                        -- Rows removed by validation
+    rows_quarantined INT,                    -- Dropped rows stored in etl_quarantine
+    rows_stale INT,                          -- Rows at or below the watermark
+    rows_inserted INT,
+    rows_skipped INT                         -- Rows already present
+);
+
+CREATE INDEX etl_runs_source_started_idx ON etl_runs (source, started_at);
+
+CREATE TABLE etl_quarantine (
+    quarantine_id BIGSERIAL PRIMARY KEY,
+    source TEXT NOT NULL,                    -- Table the row was meant for
+    record_hash TEXT NOT NULL,               -- SHA-256 of the record without its load timestamp
+    reasons TEXT[] NOT NULL,                 -- Reason codes, e.g. null:price, overflow:chp, too_long:symbol
+    record JSONB NOT NULL,                   -- The row as processed
+    quarantined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (source, record_hash)             -- A row rejected again on a later run is stored once
+);
+
+CREATE INDEX etl_quarantine_source_idx ON etl_quarantine (source, quarantined_at);
+
+CREATE TABLE etl_backfill_chunks (
+    source TEXT NOT NULL,                    -- Source key (the target table name)
+    chunk_start DATE NOT NULL,
+    chunk_end DATE NOT NULL,                 -- Exclusive
+    status VARCHAR(10) NOT NULL,             -- done or failed
+    rows_inserted INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source, chunk_start, chunk_end)
+);
+
+CREATE TABLE schema_version (
+    version INT PRIMARY KEY,                 -- Bump on every schema change so ETL caches are refreshed
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO schema_version (version) VALUES (13);
+
+-- Partition maintenance for the append-only snapshot tables.
+
+-- Create the monthly partitions of a table from the current month through
+-- months_ahead months from now. Safe to run repeatedly. Rows that already
+-- landed in the DEFAULT partition for a new month are moved into it: the
+-- DEFAULT partition is detached, the month created, its rows moved and the
+-- DEFAULT partition attached again, all in the caller's transaction.
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent TEXT, months_ahead INT DEFAULT 3)
+RETURNS VOID AS $$
+DECLARE
+    month_start DATE;
+    month_end DATE;
+    partition_name TEXT;
+    default_partition REGCLASS;
+    partition_key TEXT;
+    pending BOOLEAN;
+BEGIN
+    SELECT NULLIF(p.partdefid, 0)::REGCLASS, a.attname
+    INTO default_partition, partition_key
+    FROM pg_partitioned_table p
+    JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+    WHERE p.partrelid = parent::REGCLASS;
+
+    FOR i IN 0..months_ahead LOOP
+        month_start := (date_trunc('month', CURRENT_DATE) + make_interval(months => i))::DATE;
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        partition_name := parent || '_' || to_char(month_start, 'YYYY_MM');
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+
+        pending := FALSE;
+        IF default_partition IS NOT NULL THEN
+            EXECUTE format('SELECT EXISTS (SELECT 1 FROM %s WHERE %I >= %L AND %I < %L)',
+                           default_partition, partition_key, month_start, partition_key, month_end)
+            INTO pending;
+        END IF;
+
+        IF pending THEN
+            EXECUTE format('ALTER TABLE %I DETACH PARTITION %s', parent, default_partition);
+        END IF;
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, parent, month_start, month_end);
+        IF pending THEN
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM %s WHERE %I >= %L AND %I < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                default_partition, partition_key, month_start, partition_key, month_end, partition_name
+            );
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %s DEFAULT', parent, default_partition);
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detach (and optionally drop) the monthly partitions of a table that end
+-- before the last keep_months months. Returns the detached partition names.
+CREATE OR REPLACE FUNCTION detach_old_partitions(parent TEXT, keep_months INT, drop_detached BOOLEAN DEFAULT FALSE)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    cutoff DATE := (date_trunc('month', CURRENT_DATE) - make_interval(months => keep_months))::DATE;
+    partition_name TEXT;
+BEGIN
+    FOR partition_name IN
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = parent::REGCLASS
+          AND child.relname ~ '_[0-9]{4}_[0-9]{2}$'
+        ORDER BY child.relname
+    LOOP
+        IF to_date(right(partition_name, 7), 'YYYY_MM') < cutoff THEN
+            EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, partition_name);
+            IF drop_detached THEN
+                EXECUTE format('DROP TABLE %I', partition_name);
+            END IF;
+            RETURN NEXT partition_name;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_monthly_partitions('crypto_data');
+SELECT create_monthly_partitions('gold_price_history');
@@ -0,0 +1,140 @@
+import io
+import json
+import math
+
+from sqlalchemy.types import ARRAY, JSON, Integer
+
+from registry import get_schema
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def _is_null(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _json_literal(value):
+    return None if _is_null(value) else json.dumps(value)
+
+
+def _array_literal(value):
+    """
+    Format a Python list as a PostgreSQL array literal, e.g. ['a', 'b'] -> {"a","b"}.
+    """
+    if _is_null(value):
+        return None
+    items = []
+    for item in value:
+        if item is None:
+            items.append("NULL")
+        else:
+            escaped = str(item).replace("\\", "\\\\").replace('"', '\\"')
+            items.append(f'"{escaped}"')
+    return "{" + ",".join(items) + "}"
+
+
+def _prepare_chunk(chunk, table):
+    """
+    Convert the columns COPY cannot read from pandas' default CSV output.
+    """
+    chunk = chunk.copy()
+    for name in chunk.columns:
+        column_type = table.c[name].type
+        if isinstance(column_type, JSON):
+            chunk[name] = chunk[name].map(_json_literal)
+        elif isinstance(column_type, ARRAY):
+            chunk[name] = chunk[name].map(_array_literal)
+        elif isinstance(column_type, Integer) and chunk[name].dtype.kind == "f":
+            # Float columns would be written as "1.0", which integer columns reject.
+            chunk[name] = chunk[name].astype("Int64")
+    return chunk
+
+
+def _copy_upsert(cursor, statement, df, chunk_size, count_by=None):
+    """
+    Run one table's chunked COPY and insert on an open cursor. Returns
+    (inserted, {count_by value: inserted}).
+    """
+    inserted = 0
+    counts = {}
+    cursor.execute(statement.create_staging)
+    for start in range(0, len(df), chunk_size):
+        chunk = _prepare_chunk(df.iloc[start:start + chunk_size], statement.table)
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        cursor.copy_expert(statement.copy, buffer)
+        if count_by:
+            cursor.execute(statement.counted_insert(count_by))
+            for value, count in cursor.fetchall():
+                counts[value] = counts.get(value, 0) + count
+                inserted += count
+        else:
+            cursor.execute(statement.insert)
+            inserted += cursor.rowcount
+        cursor.execute(statement.truncate)
+    return inserted, counts
+
+
+def bulk_upsert_many(engine, frames, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Upsert several (table_name, DataFrame) pairs in one transaction, e.g. a
+    parent table and the child rows derived from it, so either all of them
+    are loaded or none. Empty frames are skipped.
+
+    Returns an (inserted, skipped) tuple per pair.
+    """
+    schema = get_schema(engine)
+    statements = [schema.get_upsert_statement(table_name, list(df.columns)) if not df.empty else None
+                  for table_name, df in frames]
+
+    results = []
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for (_, df), statement in zip(frames, statements):
+            if statement is None:
+                results.append((0, 0))
+                continue
+            inserted, _ = _copy_upsert(cursor, statement, df, chunk_size)
+            results.append((inserted, len(df) - inserted))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    return results
+
+
+def bulk_upsert(engine, table_name, df, chunk_size=DEFAULT_CHUNK_SIZE, count_by=None):
+    """
+    Stream a DataFrame into a table through COPY.
+
+    Each chunk is copied into a temporary staging table and moved into the
+    target with INSERT ... SELECT ... ON CONFLICT DO NOTHING, so only one chunk
+    is serialized in memory at a time. The whole load runs in one transaction.
+    The table and statements come from the shared schema registry.
+
+    Returns a (inserted, skipped) tuple, or (inserted, skipped, {value:
+    inserted}) with the inserted rows per value of the count_by column.
+    """
+    if df.empty:
+        return (0, 0, {}) if count_by else (0, 0)
+
+    statement = get_schema(engine).get_upsert_statement(table_name, list(df.columns))
+
+    connection = engine.raw_connection()
+    try:
+        inserted, counts = _copy_upsert(connection.cursor(), statement, df, chunk_size, count_by)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    if count_by:
+        return inserted, len(df) - inserted, counts
+    return inserted, len(df) - inserted
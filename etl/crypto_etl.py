@@ -1,62 +1,74 @@
 from etl_processor import ETLProcessor
-import pandas as pd
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+import source_specs
+from indicators import update_indicators
+from rollups import update_rollups
+
+# CoinMarketCap returns at most this many listings per request.
+MAX_PAGE_SIZE = 5000
 
 class CryptoETLProcessor(ETLProcessor):
-    def process_data(self, raw_data):
+    spec = source_specs.CRYPTO
+    page_size = 1000
+
+    def __init__(self, database_url, table_name, max_workers=4, **kwargs):
+        super().__init__(database_url, table_name, **kwargs)
+        # Pages fetched at once; run_etl sizes it from the CoinMarketCap
+        # concurrency limit, and every page also holds the provider slot.
+        self.max_workers = max_workers
+
+    def fetch_data(self, url, parameters=None, headers=None):
         """
-        Process raw cryptocurrency data into a DataFrame.
+        Fetch every listings page. The first page reports the total number of
+        assets; the remaining pages are fetched concurrently and merged into
+        one payload. A 'limit' parameter caps the total instead of one page.
         """
-        organized_data = []
-        for item in raw_data.get('data', []):
-            btc_info = {
-                "symbol": item['symbol'],
-                "name": item['name'],
-                "cmc_rank": item['cmc_rank'],
-                "price": item['quote']['USD']['price'],
-                "volume_24h": item['quote']['USD']['volume_24h'],
-                "market_cap": item['quote']['USD']['market_cap'],
-                "market_cap_dominance": item['quote']['USD']['market_cap_dominance'],
-                "circulating_supply": item['circulating_supply'],
-                "max_supply": item['max_supply'],
-                "percent_change_1h": item['quote']['USD']['percent_change_1h'],
-                "percent_change_24h": item['quote']['USD']['percent_change_24h'],
-                "percent_change_7d": item['quote']['USD']['percent_change_7d'],
-                "last_updated": pd.to_datetime(item['quote']['USD']['last_updated']),
-                "pulled_at": datetime.now()
-            }
-            organized_data.append(btc_info)
+        parameters = dict(parameters or {})
+        start = int(parameters.pop("start", 1))
+        limit = int(parameters.pop("limit", 0)) or None
+        page_size = min(self.page_size, MAX_PAGE_SIZE, limit or MAX_PAGE_SIZE)
+
+        first_page = super().fetch_data(url, {**parameters, "start": start, "limit": page_size}, headers)
+        if not first_page:
+            return first_page
+
+        total = first_page.get("status", {}).get("total_count") or len(first_page.get("data", []))
+        end = start + (min(limit, total) if limit else total)
+
+        def fetch_page(page_start):
+            page_parameters = {**parameters, "start": page_start, "limit": min(page_size, end - page_start)}
+            return super(CryptoETLProcessor, self).fetch_data(url, page_parameters, headers)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pages = list(executor.map(instrumentation.bind(fetch_page), range(start + page_size, end, page_size)))
 
-        df = pd.DataFrame(organized_data)
-        return self.validate_and_truncate(df)
+        data = list(first_page.get("data", []))
+        for page in pages:
+            if page:
+                data.extend(page.get("data", []))
+        return {"status": first_page.get("status"), "data": data}
 
-    def validate_and_truncate(self, df):
+    def after_load(self, df):
         """
-        Validate and truncate cryptocurrency data fields to match database constraints.
+        Refresh the OHLC buckets and technical indicators this batch touched.
         """
-        df["symbol"] = df["symbol"].str[:10]
-        df["name"] = df["name"].str[:50]
-        df["price"] = df["price"].clip(upper=10**12 - 1)
-        df["volume_24h"] = df["volume_24h"].clip(upper=10**12 - 1)
-        df["market_cap"] = df["market_cap"].clip(upper=10**12 - 1)
-        df["market_cap_dominance"] = df["market_cap_dominance"].clip(upper=999.99)
-        df["circulating_supply"] = df["circulating_supply"].clip(upper=10**12 - 1)
-        df["max_supply"] = df["max_supply"].clip(upper=10**12 - 1)
-        df["percent_change_1h"] = df["percent_change_1h"].clip(-9999.9999, 9999.9999)
-        df["percent_change_24h"] = df["percent_change_24h"].clip(-9999.9999, 9999.9999)
-        df["percent_change_7d"] = df["percent_change_7d"].clip(-9999.9999, 9999.9999)
-        df = df.dropna(subset=["symbol", "last_updated"])
-        return df
+        try:
+            update_rollups(self.engine, self.table_name, df)
+            update_indicators(self.engine, self.table_name, df, chunk_size=self.chunk_size)
+        except Exception as e:
+            print(f"Error updating derived tables: {e}")
 
 # Usage example
 def main():
     api_key = '42485936-1986-4342-9e0a-e854c8b0fe47'
     url = 'https://pro-api.coinmarketcap.com/v1/cryptocurrency/listings/latest'
-    parameters = {'start': '1', 'limit': '100', 'convert': 'USD'}
+    parameters = {'convert': 'USD'}
     headers = {'Accepts': 'application/json', 'X-CMC_PRO_API_KEY': api_key}
 
     database_url = "postgresql+psycopg2://postgres@localhost:5432/signal"
-    table_name = "crypto_price_history"
+    table_name = "crypto_data"
 
     etl = CryptoETLProcessor(database_url, table_name)
     etl.run(url, parameters, headers)
@@ -0,0 +1,97 @@
+import hashlib
+import json
+
+from sqlalchemy import text
+
+
+def payload_hash(raw_data):
+    """
+    Return a stable SHA-256 hash of a raw API payload.
+    """
+    return hashlib.sha256(json.dumps(raw_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SourceState:
+    def __init__(self, source, watermark, last_rows, total_rows, payload_hash, updated_at, failures=0,
+                 failed_at=None):
+        self.source = source
+        self.watermark = watermark
+        self.last_rows = last_rows
+        self.total_rows = total_rows
+        self.payload_hash = payload_hash
+        self.updated_at = updated_at
+        self.failures = failures
+        self.failed_at = failed_at
+
+
+class ETLMetadataStore:
+    """
+    Per-source high-water marks kept in the etl_metadata table.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get(self, source):
+        """
+        Return the SourceState for a source, or None if it was never loaded.
+        """
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                text(
+                    "SELECT source, watermark, last_rows, total_rows, payload_hash, updated_at, failures, failed_at "
+                    "FROM etl_metadata WHERE source = :source"
+                ),
+                {"source": source},
+            ).first()
+        return SourceState(*row) if row else None
+
+    def get_prefixed(self, prefix):
+        """
+        Return {source: SourceState} for every source key starting with prefix.
+        """
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    "SELECT source, watermark, last_rows, total_rows, payload_hash, updated_at, failures, failed_at "
+                    "FROM etl_metadata WHERE starts_with(source, :prefix)"
+                ),
+                {"prefix": prefix},
+            ).all()
+        return {row[0]: SourceState(*row) for row in rows}
+
+    def record(self, source, watermark, rows_loaded, payload_hash=None):
+        """
+        Record a completed load. The watermark only ever moves forward.
+        """
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO etl_metadata (source, watermark, last_rows, total_rows, payload_hash, updated_at) "
+                    "VALUES (:source, :watermark, :rows, :rows, :payload_hash, CURRENT_TIMESTAMP) "
+                    "ON CONFLICT (source) DO UPDATE SET "
+                    "watermark = GREATEST(etl_metadata.watermark, EXCLUDED.watermark), "
+                    "last_rows = EXCLUDED.last_rows, "
+                    "total_rows = etl_metadata.total_rows + EXCLUDED.total_rows, "
+                    "payload_hash = COALESCE(EXCLUDED.payload_hash, etl_metadata.payload_hash), "
+                    "updated_at = EXCLUDED.updated_at, "
+                    "failures = 0"
+                ),
+                {"source": source, "watermark": watermark, "rows": rows_loaded, "payload_hash": payload_hash},
+            )
+
+    def record_failure(self, source):
+        """
+        Record a failed fetch. The watermark and updated_at are left alone;
+        failures counts the failures since the last completed load.
+        """
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO etl_metadata (source, updated_at, failures, failed_at) "
+                    "VALUES (:source, NULL, 1, CURRENT_TIMESTAMP) "
+                    "ON CONFLICT (source) DO UPDATE SET "
+                    "failures = etl_metadata.failures + 1, "
+                    "failed_at = EXCLUDED.failed_at"
+                ),
+                {"source": source},
+            )
@@ -1,39 +1,145 @@
+import multiprocessing
+
 import requests
 import pandas as pd
-from sqlalchemy import create_engine, Table, MetaData
-from sqlalchemy.dialects.postgresql import insert
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import instrumentation
+from bulk_loader import bulk_upsert, DEFAULT_CHUNK_SIZE
+from etl_metadata import ETLMetadataStore, payload_hash
+from http_transport import get_transport
+from payload_archive import PayloadArchive
+from registry import get_engine
+from validation import get_validator, quarantine
+
+
+def _process_archived(processor_cls, database_url, table_name, archive_root, digest):
+    """
+    Process one archived payload in a worker process.
+    """
+    processor = processor_cls(database_url, table_name, archive=PayloadArchive(archive_root))
+    return processor.process_data(processor.archive.load(digest))
+
 
 class ETLProcessor:
-    def __init__(self, database_url, table_name):
+    # Date or timestamp column used as the incremental high-water mark.
+    # Sources whose rows are not ordered by a single series leave it unset.
+    watermark_column = None
+    # SourceSpec describing how payloads map to the table (see source_specs.py).
+    spec = None
+    # Default length in days of the date ranges a backfill is split into.
+    backfill_chunk_days = 365
+
+    def __init__(self, database_url, table_name, chunk_size=DEFAULT_CHUNK_SIZE, archive=None, transport=None,
+                 slot=None):
         self.database_url = database_url
         self.table_name = table_name
-        self.engine = create_engine(database_url)
+        self.chunk_size = chunk_size
+        self.engine = get_engine(database_url)
+        self.metadata = ETLMetadataStore(self.engine)
+        self.archive = archive or PayloadArchive()
+        self.transport = transport or get_transport()
+        # Semaphore bounding the provider's concurrent requests across jobs;
+        # every request holds it, including pages fetched in parallel.
+        self.slot = slot
 
-    def fetch_data(self, url, parameters, headers):
+    def fetch_data(self, url, parameters=None, headers=None):
         """
-        Fetch data from an API.
+        Fetch data from an API through the shared HTTP transport.
         """
         try:
-            response = requests.get(url, headers=headers, params=parameters)
-            response.raise_for_status()
-            return response.json()
+            with self.slot or nullcontext():
+                return self.transport.get_json(url, params=parameters, headers=headers)
         except requests.exceptions.RequestException as e:
             print(f"Error fetching data from API: {e}")
             return None
 
-    def process_data(self, raw_data):
+    def process_data(self, raw_data, state=None):
         """
-        Process raw data into a DataFrame. Must be overridden by subclasses for specific transformations.
+        Process raw data into a DataFrame with the source's spec. Rows at or
+        below the watermark in `state` are dropped before validation, so
+        history re-sent on every run is not validated or quarantined again.
+        Subclasses without a spec must override this.
         """
-        raise NotImplementedError("process_data() must be implemented by subclasses")
+        if self.spec is None:
+            raise NotImplementedError("process_data() must be implemented by subclasses without a spec")
+        try:
+            df = self.transform(raw_data)
+        except KeyError as e:
+            print(f"Error processing data: Missing key {e}")
+            return pd.DataFrame(columns=self.spec.output_columns)
+        fresh = self.filter_new_rows(df, state)
+        instrumentation.count("rows_stale", len(df) - len(fresh))
+        return self.validate_and_truncate(fresh)
 
+    def transform(self, raw_data):
+        """
+        Turn a raw payload into rows with the source's spec. Subclasses
+        override this to add columns that come from outside the records, so
+        they are validated with the rest.
+        """
+        return self.spec.transform(raw_data)
+
+    @instrumentation.validation_stage
     def validate_and_truncate(self, df):
         """
-        Validate and truncate data to match database constraints.
+        Check the batch against the table's constraints in one vectorized pass.
+        Failing rows are quarantined with their reasons instead of failing the
+        load; when the table cannot be reflected only nulls are checked.
+        """
+        required = self.spec.required if self.spec is not None else []
+        validator = get_validator(self.engine, self.table_name, required)
+        if validator is None:
+            return self.spec.validate(df) if self.spec is not None else df.dropna()
+
+        df, rejected = validator.check(df)
+        if not rejected.empty:
+            instrumentation.count("rows_quarantined", len(rejected))
+            print(f"Quarantining {len(rejected)} rows of {self.table_name}: "
+                  f"{', '.join(sorted({reason for reasons in rejected['reasons'] for reason in reasons}))}")
+            try:
+                self.quarantine_rows(rejected)
+            except Exception as e:
+                print(f"Error quarantining rows: {e}")
+        return self.spec.deduplicate(df) if self.spec is not None else df
+
+    def quarantine_rows(self, rejected):
+        """
+        Store rows with a "reasons" column in etl_quarantine, keyed without
+        their load timestamp. Returns the number of new rows stored.
+        """
+        exclude = [self.spec.loaded_at] if self.spec is not None and self.spec.loaded_at else []
+        return quarantine(self.engine, self.table_name, rejected, exclude)
+
+    def incremental_request(self, url, parameters, state):
+        """
+        Adjust the request for what is already loaded. Subclasses override this
+        to ask for smaller payloads once the watermark is recent.
+        """
+        return url, parameters
+
+    def chunk_requests(self, url, parameters, start, end):
+        """
+        Return the (url, parameters) requests covering the dates [start, end),
+        or None when the API has no date range. Backfills of such sources
+        fetch the full history once and split it locally.
+        """
+        return None
+
+    def filter_new_rows(self, df, state):
+        """
+        Drop rows at or below the source's watermark. Rows without a time are
+        kept so validation can quarantine them.
+        """
+        if self.watermark_column is None or state is None or state.watermark is None or df.empty:
+            return df
+        return df[~(pd.to_datetime(df[self.watermark_column]) <= pd.Timestamp(state.watermark))]
+
+    def after_load(self, df):
+        """
+        Hook run after a batch is loaded, e.g. to update derived tables.
         """
-        df = df.dropna()
-        return df
 
     def upsert_data(self, df):
         """
@@ -41,31 +147,124 @@ class ETLProcessor:
         """
         if df.empty:
             print("No data to insert.")
-            return
+            return 0, 0
 
-        metadata = MetaData()
-        metadata.reflect(bind=self.engine)
-        table = Table(self.table_name, metadata, autoload_with=self.engine)
+        try:
+            inserted, skipped = bulk_upsert(self.engine, self.table_name, df, chunk_size=self.chunk_size)
+            print(f"Upsert completed. {inserted} new records inserted, {skipped} skipped.")
+            return inserted, skipped
+        except Exception as e:
+            print(f"Error during upsert: {e}")
+            return None
 
-        records = df.to_dict(orient="records")
+    def extract(self, url, parameters=None, headers=None):
+        """
+        Fetch the raw payload, requesting only what the watermark says is
+        missing, and archive it.
+        """
+        state = self.metadata.get(self.table_name)
+        url, parameters = self.incremental_request(url, parameters, state)
+        with instrumentation.stage("fetch"):
+            raw_data = self.fetch_data(url, parameters, headers)
+        if raw_data:
+            self.archive.store(self.table_name, raw_data)
+        return raw_data
 
-        stmt = insert(table).values(records)
-        stmt = stmt.on_conflict_do_nothing()
+    def load(self, raw_data):
+        """
+        Process a raw payload, load the rows newer than the watermark and
+        advance it. Returns the (inserted, skipped) counts, or None on failure.
+        A payload identical to the last one loaded is skipped entirely.
+        """
+        state = self.metadata.get(self.table_name)
+        digest = payload_hash(raw_data)
+        if state is not None and state.payload_hash == digest:
+            print("Payload unchanged since the last run; skipping.")
+            return 0, 0
 
-        with self.engine.connect() as connection:
-            try:
-                result = connection.execute(stmt)
-                connection.commit()  # Ensure changes are committed to the database
-                print(f"Upsert completed. {result.rowcount} new records inserted.")
-            except Exception as e:
-                print(f"Error during upsert: {e}")
+        with instrumentation.stage("process"):
+            df = self.process_data(raw_data, state)
+        return self.load_frame(df, digest)
 
-    def run(self, url, parameters, headers):
+    def load_frame(self, df, digest=None):
+        """
+        Upsert an already processed frame in one transaction, run after_load
+        and record it in etl_metadata. Returns (inserted, skipped) or None.
+        """
+        with instrumentation.stage("upsert"):
+            result = self.upsert_data(df)
+        if result is None:
+            return None
+        instrumentation.count("rows_inserted", result[0])
+        instrumentation.count("rows_skipped", result[1])
+        with instrumentation.stage("after_load"):
+            self.after_load(df)
+        self._record_load(df, result, digest)
+        return result[0], result[1]
+
+    def _record_load(self, df, result, digest):
+        """
+        Record a load in etl_metadata. result is what upsert_data returned;
+        subclasses returning more than (inserted, skipped) use the rest here.
+        """
+        watermark = None
+        if self.watermark_column is not None and not df.empty:
+            watermark = pd.to_datetime(df[self.watermark_column]).max().to_pydatetime()
+        self.metadata.record(self.table_name, watermark, result[0], digest)
+
+    def replay(self, since=None, until=None, max_workers=None, batch_size=50):
+        """
+        Rebuild the table from archived payloads without touching the network.
+
+        Each distinct payload is processed once; batches are processed in
+        parallel worker processes and loaded together. The workers are
+        spawned rather than forked: the parent may have HTTP and loader
+        threads running, and a forked child would inherit their locks and the
+        pooled database connections of the engine registry.
+        """
+        digests = list(dict.fromkeys(digest for _, digest in self.archive.entries(self.table_name, since, until)))
+        if not digests:
+            print("No archived payloads to replay.")
+            return 0, 0
+
+        inserted = skipped = 0
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            for start in range(0, len(digests), batch_size):
+                batch = digests[start:start + batch_size]
+                futures = [
+                    executor.submit(_process_archived, type(self), self.database_url, self.table_name, self.archive.root, digest)
+                    for digest in batch
+                ]
+                with instrumentation.stage("process"):
+                    frames = [frame for frame in (future.result() for future in futures) if not frame.empty]
+                if not frames:
+                    continue
+
+                df = pd.concat(frames, ignore_index=True)
+                instrumentation.count("rows_in", len(df))
+                result = self.load_frame(df, batch[-1])
+                if result is None:
+                    return None
+                inserted += result[0]
+                skipped += result[1]
+        return inserted, skipped
+
+    def run(self, url=None, parameters=None, headers=None, replay=False, profile_dir=None):
         """
         Run the ETL pipeline: fetch, process, validate, and load data.
+        With replay=True the table is rebuilt from the payload archive instead.
+        The run's timings and counts are recorded in etl_runs; with
+        profile_dir set, every stage is also profiled there.
         """
-        raw_data = self.fetch_data(url, parameters, headers)
-        if raw_data:
-            df = self.process_data(raw_data)
-            df_cleaned = self.validate_and_truncate(df)
-            self.upsert_data(df_cleaned)
\ No newline at end of file
+        with instrumentation.track_run(self.engine, self.table_name, profile_dir) as run:
+            if replay:
+                result = self.replay()
+            else:
+                raw_data = self.extract(url, parameters, headers)
+                if not raw_data:
+                    run.status = "fetch_failed"
+                    return None
+                result = self.load(raw_data)
+            if result is None:
+                run.status = "load_failed"
+            return result
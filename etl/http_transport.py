@@ -0,0 +1,158 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrumentation
+
+# (connect, read) timeouts in seconds.
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_CACHE_TTL = float(os.environ.get("SIGNAL_HTTP_CACHE_TTL", 0))
+# Most responses cached at once; the least recently used one is evicted first.
+DEFAULT_CACHE_SIZE = int(os.environ.get("SIGNAL_HTTP_CACHE_SIZE", 256))
+
+# Alpha Vantage answers throttled calls with HTTP 200 and one of these keys
+# instead of data. "Note" is the per-minute limit and clears on its own;
+# "Information" is the daily limit (or a plan restriction) and does not.
+THROTTLE_NOTE_KEY = "Note"
+THROTTLE_INFORMATION_KEY = "Information"
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimitError(requests.exceptions.RequestException):
+    """
+    Raised when a provider is still throttling after every retry.
+    """
+
+
+class HTTPTransport:
+    """
+    HTTP client shared by every processor.
+
+    Keeps one pooled keep-alive Session per host, applies connect/read
+    timeouts, retries transient failures and rate limits with exponential
+    backoff, and can cache up to cache_size JSON responses for a TTL.
+    """
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries=4, backoff=1.0, max_backoff=60.0,
+                 throttle_delay=20.0, cache_ttl=DEFAULT_CACHE_TTL, pool_size=10, cache_size=DEFAULT_CACHE_SIZE):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.throttle_delay = throttle_delay
+        self.cache_ttl = cache_ttl
+        self.pool_size = pool_size
+        self.cache_size = cache_size
+        self._sessions = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _session(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["Accept-Encoding"] = "gzip, deflate"
+                self._sessions[host] = session
+            return session
+
+    def _delay(self, attempt, minimum=0.0):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return max(minimum, delay) + random.uniform(0, self.backoff)
+
+    @staticmethod
+    def _cache_key(url, params, headers):
+        """
+        Hashable key for a request; list values (e.g. repeated query
+        parameters) become tuples.
+        """
+        def items(mapping):
+            return tuple(sorted(
+                (name, tuple(value) if isinstance(value, list) else value) for name, value in (mapping or {}).items()
+            ))
+        return url, items(params), items(headers)
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.headers.get("Retry-After", 0))
+        except ValueError:
+            return 0.0
+
+    def get_json(self, url, params=None, headers=None, cache_ttl=None):
+        """
+        GET a URL and return the decoded JSON body.
+        """
+        ttl = self.cache_ttl if cache_ttl is None else cache_ttl
+        key = self._cache_key(url, params, headers)
+        if ttl:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    if time.monotonic() - cached[0] < ttl:
+                        self._cache.move_to_end(key)
+                        return cached[1]
+                    del self._cache[key]
+
+        session = self._session(url)
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            instrumentation.count("http_requests")
+            try:
+                response = session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if last_attempt:
+                    raise
+                instrumentation.count("retries")
+                time.sleep(self._delay(attempt))
+                continue
+
+            instrumentation.count("payload_bytes", len(response.content))
+            if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+                instrumentation.count("retries")
+                time.sleep(self._delay(attempt, minimum=self._retry_after(response)))
+                continue
+            response.raise_for_status()
+
+            payload = response.json()
+            if isinstance(payload, dict) and THROTTLE_INFORMATION_KEY in payload and len(payload) == 1:
+                raise RateLimitError(payload[THROTTLE_INFORMATION_KEY])
+            if isinstance(payload, dict) and THROTTLE_NOTE_KEY in payload and len(payload) == 1:
+                if last_attempt:
+                    raise RateLimitError(payload[THROTTLE_NOTE_KEY])
+                instrumentation.count("retries")
+                time.sleep(self._delay(attempt, minimum=self.throttle_delay))
+                continue
+
+            if ttl:
+                with self._lock:
+                    self._cache[key] = (time.monotonic(), payload)
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+            return payload
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Return the process-wide HTTPTransport.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HTTPTransport()
+        return _transport
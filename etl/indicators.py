@@ -0,0 +1,246 @@
+import fcntl
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from bulk_loader import bulk_upsert
+
+DEFAULT_STATE_DIR = os.environ.get(
+    "SIGNAL_INDICATOR_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "indicators"),
+)
+
+INDICATOR_TABLE = "technical_indicators"
+
+WINDOW = 20          # SMA, Bollinger bands and realized volatility
+EMA_FAST = 12
+EMA_SLOW = 26
+RSI_PERIOD = 14
+BOLLINGER_K = 2.0
+
+# Price tables with indicators: table -> (series key column or None, time column, price column).
+INDICATOR_SOURCES = {
+    "crypto_data": ("id", "last_updated", "price"),
+    "gold_price_history": (None, "timestamp", "price"),
+    "sp500_index_data": (None, "date", "close"),
+    "sp500_constituent_bars": ("symbol", "date", "close"),
+}
+
+_FLOAT_FIELDS = [
+    "last_price", "ema_fast", "ema_slow", "avg_gain", "avg_loss",
+    "price_sum", "price_sumsq", "return_sum", "return_sumsq",
+]
+_INT_FIELDS = ["price_pos", "price_count", "return_pos", "return_count"]
+
+
+class IndicatorState:
+    """
+    Rolling indicator state for many series, updated one bar at a time.
+
+    Every series keeps ring buffers of its last WINDOW prices and log returns
+    with running sums, EMA values and Wilder RSI averages, so each new bar is
+    O(1) per series and every series is updated in the same NumPy operation.
+    """
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.keys = np.array([], dtype=object)
+        self.index = {}
+        self.price_ring = np.empty((0, window))
+        self.return_ring = np.empty((0, window))
+        self.last_time = np.array([], dtype="datetime64[ns]")
+        for name in _FLOAT_FIELDS:
+            setattr(self, name, np.empty(0))
+        for name in _INT_FIELDS:
+            setattr(self, name, np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        state = cls()
+        if not os.path.exists(path):
+            return state
+        with np.load(path, allow_pickle=True) as data:
+            state.window = int(data["window"])
+            state.keys = data["keys"]
+            state.price_ring = data["price_ring"]
+            state.return_ring = data["return_ring"]
+            state.last_time = data["last_time"]
+            for name in _FLOAT_FIELDS + _INT_FIELDS:
+                setattr(state, name, data[name])
+        state.index = {key: i for i, key in enumerate(state.keys)}
+        return state
+
+    def save(self, path):
+        self._resync()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path, window=self.window, keys=self.keys, price_ring=self.price_ring,
+            return_ring=self.return_ring, last_time=self.last_time,
+            **{name: getattr(self, name) for name in _FLOAT_FIELDS + _INT_FIELDS},
+        )
+        os.replace(tmp_path, path)
+
+    def _resync(self):
+        """
+        Recompute the running sums from the ring buffers to shed floating-point drift.
+        """
+        for ring, count, total, total_sq in (
+            (self.price_ring, self.price_count, "price_sum", "price_sumsq"),
+            (self.return_ring, self.return_count, "return_sum", "return_sumsq"),
+        ):
+            filled = np.arange(self.window)[None, :] < np.minimum(count, self.window)[:, None]
+            values = np.where(filled, ring, 0.0)
+            setattr(self, total, values.sum(axis=1))
+            setattr(self, total_sq, (values ** 2).sum(axis=1))
+
+    def _add_series(self, keys):
+        new = [key for key in dict.fromkeys(keys) if key not in self.index]
+        if not new:
+            return
+        n = len(new)
+        for i, key in enumerate(new):
+            self.index[key] = len(self.keys) + i
+        self.keys = np.concatenate([self.keys, np.array(new, dtype=object)])
+        self.price_ring = np.vstack([self.price_ring, np.zeros((n, self.window))])
+        self.return_ring = np.vstack([self.return_ring, np.zeros((n, self.window))])
+        self.last_time = np.concatenate([self.last_time, np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")])
+        for name in _FLOAT_FIELDS:
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(n)]))
+        for name in _INT_FIELDS:
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(n, dtype=np.int64)]))
+
+    def _push(self, ring, pos_name, count_name, sum_name, sumsq_name, rows, values):
+        pos = getattr(self, pos_name)
+        count = getattr(self, count_name)
+        old = np.where(count[rows] >= self.window, ring[rows, pos[rows]], 0.0)
+        getattr(self, sum_name)[rows] += values - old
+        getattr(self, sumsq_name)[rows] += values ** 2 - old ** 2
+        ring[rows, pos[rows]] = values
+        pos[rows] = (pos[rows] + 1) % self.window
+        count[rows] += 1
+
+    def _step(self, rows, prices):
+        """
+        Apply one bar to the series at `rows` (each row at most once).
+        """
+        first = self.price_count[rows] == 0
+        previous = self.last_price[rows]
+
+        # Returns and RSI only exist from the second bar onwards.
+        has_previous = ~first
+        if has_previous.any():
+            r_rows = rows[has_previous]
+            r_prices = prices[has_previous]
+            change = r_prices - previous[has_previous]
+            self._push(self.return_ring, "return_pos", "return_count", "return_sum", "return_sumsq",
+                       r_rows, np.log(r_prices / previous[has_previous]))
+            periods = np.minimum(self.return_count[r_rows], RSI_PERIOD)
+            self.avg_gain[r_rows] += (np.maximum(change, 0.0) - self.avg_gain[r_rows]) / periods
+            self.avg_loss[r_rows] += (np.maximum(-change, 0.0) - self.avg_loss[r_rows]) / periods
+
+        self._push(self.price_ring, "price_pos", "price_count", "price_sum", "price_sumsq", rows, prices)
+        for name, span in (("ema_fast", EMA_FAST), ("ema_slow", EMA_SLOW)):
+            ema = getattr(self, name)
+            ema[rows] = np.where(first, prices, ema[rows] + 2.0 / (span + 1) * (prices - ema[rows]))
+        self.last_price[rows] = prices
+
+    def _snapshot(self, rows):
+        """
+        Return the current indicator values of the series at `rows`.
+        """
+        n = np.minimum(self.price_count[rows], self.window)
+        full = self.price_count[rows] >= self.window
+        mean = self.price_sum[rows] / np.maximum(n, 1)
+        std = np.sqrt(np.maximum(self.price_sumsq[rows] / np.maximum(n, 1) - mean ** 2, 0.0))
+
+        rn = np.minimum(self.return_count[rows], self.window)
+        r_mean = self.return_sum[rows] / np.maximum(rn, 1)
+        r_var = (self.return_sumsq[rows] - rn * r_mean ** 2) / np.maximum(rn - 1, 1)
+
+        gain, loss = self.avg_gain[rows], self.avg_loss[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+
+        return {
+            f"sma_{self.window}": np.where(full, mean, np.nan),
+            f"ema_{EMA_FAST}": self.ema_fast[rows].copy(),
+            f"ema_{EMA_SLOW}": self.ema_slow[rows].copy(),
+            f"rsi_{RSI_PERIOD}": np.where(self.return_count[rows] >= RSI_PERIOD, rsi, np.nan),
+            "bollinger_upper": np.where(full, mean + BOLLINGER_K * std, np.nan),
+            "bollinger_lower": np.where(full, mean - BOLLINGER_K * std, np.nan),
+            f"realized_vol_{self.window}": np.where(rn >= self.window, np.sqrt(np.maximum(r_var, 0.0)), np.nan),
+        }
+
+    def update(self, keys, times, prices):
+        """
+        Apply a batch of bars and return the indicator values after each one.
+
+        Bars at or before a series' last processed time are ignored. When a
+        series has several bars in the batch they are applied in time order,
+        one vectorized step per position.
+        """
+        batch = pd.DataFrame({"key": keys, "time": pd.to_datetime(times), "price": prices}).dropna()
+        batch = batch.sort_values("time", kind="stable").drop_duplicates(["key", "time"], keep="last")
+        self._add_series(batch["key"].tolist())
+
+        batch["row"] = batch["key"].map(self.index).astype(np.int64)
+        last_time = self.last_time[batch["row"].to_numpy()]
+        batch = batch[np.isnat(last_time) | (batch["time"].to_numpy() > last_time)]
+        if batch.empty:
+            return pd.DataFrame()
+
+        batch["step"] = batch.groupby("row").cumcount()
+        outputs = []
+        for _, bars in batch.groupby("step", sort=True):
+            rows = bars["row"].to_numpy()
+            self._step(rows, bars["price"].to_numpy(dtype=np.float64))
+            self.last_time[rows] = bars["time"].to_numpy()
+            values = self._snapshot(rows)
+            outputs.append(pd.DataFrame({"series_key": bars["key"].astype(str).to_numpy(),
+                                         "time": bars["time"].to_numpy(), **values}))
+        return pd.concat(outputs, ignore_index=True)
+
+
+@contextmanager
+def state_lock(path):
+    """
+    Hold an exclusive lock on a state file's sibling .lock file, so only one
+    process or thread at a time loads, updates and saves that state.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def update_indicators(engine, table_name, df, state_dir=DEFAULT_STATE_DIR, chunk_size=None):
+    """
+    Update the persisted indicator state of a price table with a loaded batch
+    and write the new indicator rows to technical_indicators.
+    """
+    if df.empty or table_name not in INDICATOR_SOURCES:
+        return 0
+    key_column, time_column, price_column = INDICATOR_SOURCES[table_name]
+    keys = df[key_column].to_numpy() if key_column else np.full(len(df), table_name, dtype=object)
+
+    path = os.path.join(state_dir, f"{table_name}.npz")
+    prices = pd.to_numeric(df[price_column], errors="coerce").to_numpy()
+    # Loads of the same table can overlap (the scheduler and a manual run, or
+    # a backfill); without the lock the last save would drop the other's bars.
+    with state_lock(path):
+        state = IndicatorState.load(path)
+        indicators = state.update(keys, df[time_column], prices)
+        if indicators.empty:
+            return 0
+
+        indicators.insert(0, "source", table_name)
+        kwargs = {"chunk_size": chunk_size} if chunk_size else {}
+        inserted, _ = bulk_upsert(engine, INDICATOR_TABLE, indicators, **kwargs)
+        # Save only after the rows are stored, so a failed load is recomputed next time.
+        state.save(path)
+    return inserted
@@ -0,0 +1,211 @@
+import cProfile
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text
+
+DEFAULT_TEXTFILE_DIR = os.environ.get(
+    "SIGNAL_METRICS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "metrics"),
+)
+
+RUNS_TABLE = "etl_runs"
+
+# Stages with their own etl_runs column. Time spent in a nested stage is not
+# counted again in its parent, e.g. "process" excludes "validate".
+STAGES = ["fetch", "process", "validate", "upsert", "after_load"]
+COUNTERS = [
+    "http_requests", "retries", "payload_bytes",
+    "rows_in", "rows_dropped", "rows_quarantined", "rows_stale", "rows_inserted", "rows_skipped",
+]
+
+_local = threading.local()
+
+
+class ETLRun:
+    """
+    Timings and counters of one ETL run of a source.
+
+    The run is attached to the thread that executes it; stage() and count()
+    are no-ops outside a run, so processors can be used without one.
+    """
+    def __init__(self, source, profile_dir=None):
+        self.source = source
+        self.profile_dir = profile_dir
+        self.started_at = datetime.now()
+        self.status = "ok"
+        self.seconds = 0.0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self, status=None):
+        self.seconds = time.perf_counter() - self._start
+        if status is not None:
+            self.status = status
+
+    def as_row(self):
+        return {
+            "source": self.source, "started_at": self.started_at, "status": self.status,
+            "total_seconds": self.seconds,
+            **{f"{name}_seconds": self.stages[name] for name in STAGES},
+            **{name: self.counters[name] for name in COUNTERS},
+        }
+
+
+def current_run():
+    return getattr(_local, "run", None)
+
+
+def count(name, value=1):
+    """
+    Add to a counter of the run active on this thread, if any.
+    """
+    run = current_run()
+    if run is not None:
+        run.count(name, value)
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a stage of the active run. Nested stages are subtracted from their
+    parent; with profiling on, each outermost stage is written as a .prof file.
+    """
+    run = current_run()
+    if run is None:
+        yield
+        return
+
+    stack = _local.__dict__.setdefault("stages", [])
+    profiler = None
+    if run.profile_dir and not stack:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    frame = [name, time.perf_counter(), 0.0]
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        elapsed = time.perf_counter() - frame[1]
+        run.add_stage(name, elapsed - frame[2])
+        if stack:
+            stack[-1][2] += elapsed
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(run.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(
+                run.profile_dir, f"{run.source}_{run.started_at:%Y%m%dT%H%M%S}_{name}.prof"
+            ))
+
+
+def bind(fn):
+    """
+    Wrap fn so worker threads it runs on count towards the caller's run.
+    """
+    run = current_run()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = current_run()
+        _local.run = run
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.run = previous
+    return wrapper
+
+
+def validation_stage(validate):
+    """
+    Decorator for validate_and_truncate: times it as the "validate" stage and
+    counts the rows it receives and drops.
+    """
+    @functools.wraps(validate)
+    def wrapper(self, df):
+        with stage("validate"):
+            result = validate(self, df)
+        count("rows_in", len(df))
+        count("rows_dropped", len(df) - len(result))
+        return result
+    return wrapper
+
+
+def record_run(engine, run):
+    """
+    Append a finished run to the etl_runs table.
+    """
+    row = run.as_row()
+    columns = ", ".join(row)
+    values = ", ".join(f":{name}" for name in row)
+    with engine.begin() as connection:
+        connection.execute(text(f"INSERT INTO {RUNS_TABLE} ({columns}) VALUES ({values})"), row)
+
+
+def write_textfile(run, directory=DEFAULT_TEXTFILE_DIR):
+    """
+    Write the run as Prometheus gauges for the node_exporter textfile
+    collector, one file per source so concurrent jobs never clash.
+    """
+    labels = f'source="{run.source}"'
+    lines = [
+        "# TYPE signal_etl_last_run_timestamp_seconds gauge",
+        f"signal_etl_last_run_timestamp_seconds{{{labels}}} {run.started_at.timestamp():.3f}",
+        "# TYPE signal_etl_last_run_success gauge",
+        f"signal_etl_last_run_success{{{labels}}} {int(run.status == 'ok')}",
+        "# TYPE signal_etl_run_seconds gauge",
+        f"signal_etl_run_seconds{{{labels}}} {run.seconds:.6f}",
+        "# TYPE signal_etl_stage_seconds gauge",
+    ]
+    lines += [f'signal_etl_stage_seconds{{{labels},stage="{name}"}} {run.stages[name]:.6f}' for name in STAGES]
+    for name in COUNTERS:
+        lines += [f"# TYPE signal_etl_{name} gauge", f"signal_etl_{name}{{{labels}}} {run.counters[name]}"]
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"signal_etl_{run.source}.prom")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def track_run(engine, source, profile_dir=None, textfile_dir=DEFAULT_TEXTFILE_DIR):
+    """
+    Attach a new ETLRun to this thread for the duration of the block, then
+    store it in etl_runs and the Prometheus textfile. The block sets
+    run.status for non-exception failures; exceptions mark it "error".
+    """
+    run = ETLRun(source, profile_dir)
+    previous = current_run()
+    _local.run = run
+    try:
+        yield run
+    except BaseException:
+        run.status = "error"
+        raise
+    finally:
+        _local.run = previous
+        run.finish()
+        try:
+            record_run(engine, run)
+        except Exception as e:
+            print(f"Error recording ETL run: {e}")
+        try:
+            write_textfile(run, textfile_dir)
+        except OSError as e:
+            print(f"Error writing ETL metrics: {e}")
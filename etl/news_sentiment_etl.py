@@ -1,109 +1,193 @@
-import requests
+from etl_processor import ETLProcessor
 import pandas as pd
-from datetime import datetime
-from sqlalchemy import create_engine, Table, MetaData
-from sqlalchemy.dialects.postgresql import insert
-
-
-class NewsSentimentETLProcessor:
-    def __init__(self, database_url, table_name):
-        self.database_url = database_url
-        self.table_name = table_name
-        self.engine = create_engine(database_url)
-
-    def fetch_data(self, url):
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import instrumentation
+import source_specs
+from bulk_loader import bulk_upsert_many
+
+TICKER_SENTIMENT_TABLE = "news_ticker_sentiment"
+TOPICS_TABLE = "news_topics"
+
+# Alpha Vantage returns at most this many articles per request.
+PAGE_LIMIT = 1000
+
+# Re-request a little before the watermark so late-indexed articles are not
+# missed; the url key dedupes the overlap.
+WATERMARK_OVERLAP = timedelta(hours=1)
+
+
+def flatten_ticker_sentiment(df):
+    """
+    Explode each article's ticker_sentiment array into one row per (url, ticker).
+    """
+    exploded = df[['url', 'time_published', 'ticker_sentiment']].explode('ticker_sentiment')
+    exploded = exploded[exploded['ticker_sentiment'].map(lambda item: isinstance(item, dict))]
+    details = pd.DataFrame.from_records(
+        exploded['ticker_sentiment'].tolist(),
+        columns=['ticker', 'relevance_score', 'ticker_sentiment_score', 'ticker_sentiment_label'],
+    )
+    flat = pd.DataFrame({
+        'url': exploded['url'].to_numpy(),
+        'ticker': details['ticker'],
+        'relevance': pd.to_numeric(details['relevance_score'], errors='coerce'),
+        'sentiment_score': pd.to_numeric(details['ticker_sentiment_score'], errors='coerce'),
+        'label': details['ticker_sentiment_label'],
+        'time_published': exploded['time_published'].to_numpy(),
+    })
+    return flat.dropna(subset=['ticker']).drop_duplicates(subset=['url', 'ticker'])
+
+
+def flatten_topics(df):
+    """
+    Explode each article's topics array into one row per (url, topic).
+    """
+    exploded = df[['url', 'time_published', 'topics']].explode('topics')
+    exploded = exploded[exploded['topics'].map(lambda item: isinstance(item, dict))]
+    details = pd.DataFrame.from_records(exploded['topics'].tolist(), columns=['topic', 'relevance_score'])
+    flat = pd.DataFrame({
+        'url': exploded['url'].to_numpy(),
+        'topic': details['topic'],
+        'relevance': pd.to_numeric(details['relevance_score'], errors='coerce'),
+        'time_published': exploded['time_published'].to_numpy(),
+    })
+    return flat.dropna(subset=['topic']).drop_duplicates(subset=['url', 'topic'])
+
+
+class NewsSentimentETLProcessor(ETLProcessor):
+    watermark_column = "time_published"
+    spec = source_specs.NEWS_SENTIMENT
+    backfill_chunk_days = 30
+
+    def __init__(self, database_url, table_name, max_workers=2, **kwargs):
+        super().__init__(database_url, table_name, **kwargs)
+        # Queries fetched at once; run_etl sizes it from the Alpha Vantage
+        # concurrency limit, and every page also holds the provider slot.
+        self.max_workers = max_workers
+
+    def incremental_request(self, url, parameters, state):
         """
-        Fetch data from the Alpha Vantage News Sentiment API.
+        Only ask for articles published since the last one loaded.
         """
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching data from API: {e}")
-            return None
+        if state is None or state.watermark is None:
+            return url, parameters
+        parameters = dict(parameters or {})
+        parameters['time_from'] = (state.watermark - WATERMARK_OVERLAP).strftime("%Y%m%dT%H%M")
+        return url, parameters
 
-    def process_data(self, raw_data):
+    def chunk_requests(self, url, parameters, start, end):
         """
-        Process raw news sentiment data into a DataFrame.
+        One request per chunk, limited to it with time_from and time_to.
         """
-        try:
-            # Extract the 'feed' data
-            feed_data = raw_data['feed']
-
-            # Convert to a DataFrame
-            df = pd.DataFrame(feed_data)
+        parameters = dict(parameters or {})
+        parameters['time_from'] = start.strftime("%Y%m%dT0000")
+        parameters['time_to'] = end.strftime("%Y%m%dT0000")
+        return [(url, parameters)]
 
-            # Add a pulled_on timestamp
-            df['pulled_on'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-            # Parse and format the 'time_published' field to match database format
-            df['time_published'] = pd.to_datetime(df['time_published'], format='%Y%m%dT%H%M%S')
-
-            # Ensure the numerical column is properly formatted
-            df['overall_sentiment_score'] = pd.to_numeric(df['overall_sentiment_score'], errors='coerce')
-
-            # Drop unnecessary fields or parse them if needed
-            # For example, flattening 'topics' or 'ticker_sentiment' could be done here if required
-
-            # Validate and truncate
-            return self.validate_and_truncate(df)
-        except KeyError as e:
-            print(f"Error processing data: Missing key {e}")
-            return pd.DataFrame()
-
-    def validate_and_truncate(self, df):
+    def filter_new_rows(self, df, state):
         """
-        Validate and truncate data to match database constraints.
+        Keep every article; the time_from request already limits the payload
+        and the url key dedupes the overlap.
         """
-        df = df.dropna(subset=['title', 'url', 'time_published', 'overall_sentiment_score'])
         return df
 
-    def upsert_data(self, df):
+    def _fetch_query(self, url, parameters, headers):
         """
-        Upsert data into the database table.
+        Page forward through one query's feed, oldest first. Returns None if
+        any page fails, since the pages already fetched are not a complete feed.
         """
-        if df.empty:
-            print("No data to insert.")
-            return
-
-        metadata = MetaData()
-        metadata.reflect(bind=self.engine)
-        table = Table(self.table_name, metadata, autoload_with=self.engine)
-
-        records = df.to_dict(orient="records")
+        parameters = {**parameters, 'sort': 'EARLIEST', 'limit': PAGE_LIMIT}
+        feed = []
+        while True:
+            page = super().fetch_data(url, parameters, headers)
+            if not isinstance(page, dict) or 'feed' not in page:
+                if page:
+                    print(f"No news feed for {parameters}: {page}")
+                return None
+            items = page['feed']
+            feed.extend(items)
+            if len(items) < PAGE_LIMIT:
+                return feed
+            last_published = max(item['time_published'] for item in items)[:13]
+            if last_published == parameters.get('time_from'):
+                return feed
+            parameters['time_from'] = last_published
+
+    def fetch_data(self, url, parameters=None, headers=None):
+        """
+        Fetch the news feed. 'tickers' and 'topics' parameters may be lists;
+        each entry becomes its own query, fetched concurrently and paged, and
+        the feeds are merged by url.
 
-        stmt = insert(table).values(records)
-        stmt = stmt.on_conflict_do_nothing()
+        All the queries share the source's one watermark, so if any of them
+        fails the whole fetch returns None and the watermark stays put; a
+        partial feed would move it past the failed query's articles.
+        """
+        parameters = dict(parameters or {})
+        tickers = parameters.pop('tickers', None)
+        topics = parameters.pop('topics', None)
+        tickers = [tickers] if isinstance(tickers, str) else tickers or []
+        topics = [topics] if isinstance(topics, str) else topics or []
+
+        queries = [{**parameters, 'tickers': ticker} for ticker in tickers]
+        queries += [{**parameters, 'topics': topic} for topic in topics]
+        if not queries:
+            queries = [parameters]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            feeds = list(executor.map(instrumentation.bind(lambda query: self._fetch_query(url, query, headers)), queries))
+
+        failed = [query for query, feed in zip(queries, feeds) if feed is None]
+        if failed:
+            print(f"{len(failed)} of {len(queries)} news queries failed; not loading this run.")
+            return None
 
-        with self.engine.connect() as connection:
-            try:
-                result = connection.execute(stmt)
-                connection.commit()  # Ensure changes are committed to the database
-                print(f"Upsert completed. {result.rowcount} new records inserted.")
-            except Exception as e:
-                print(f"Error during upsert: {e}")
+        articles = {}
+        for feed in feeds:
+            for item in feed:
+                articles.setdefault(item['url'], item)
+        if not articles:
+            return None
+        return {'feed': sorted(articles.values(), key=lambda item: item['time_published'])}
 
-    def run(self, url):
+    def upsert_data(self, df):
         """
-        Run the ETL pipeline: fetch, process, validate, and load data.
+        Upsert the articles and their per-ticker sentiment and topic rows in
+        one transaction, so no child row is stored without its article.
         """
-        raw_data = self.fetch_data(url)
-        if raw_data:
-            df = self.process_data(raw_data)
-            self.upsert_data(df)
+        if df.empty:
+            print("No data to insert.")
+            return 0, 0
+
+        frames = [(self.table_name, df), (TICKER_SENTIMENT_TABLE, flatten_ticker_sentiment(df)),
+                  (TOPICS_TABLE, flatten_topics(df))]
+        try:
+            results = bulk_upsert_many(self.engine, frames, chunk_size=self.chunk_size)
+        except Exception as e:
+            print(f"Error during upsert: {e}")
+            return None
+        for (table_name, _), (inserted, skipped) in zip(frames, results):
+            print(f"Upsert into {table_name} completed. {inserted} new records inserted, {skipped} skipped.")
+        return results[0]
 
 
 # Usage example
 def main():
     api_key = "SFRHBUTCXB3RDG5S"
-    url = f"https://www.alphavantage.co/query?function=NEWS_SENTIMENT&CRYPTO:BTC&apikey={api_key}"
+    url = "https://www.alphavantage.co/query"
+    parameters = {
+        "function": "NEWS_SENTIMENT",
+        "tickers": ["CRYPTO:BTC", "CRYPTO:ETH"],
+        "topics": ["blockchain", "financial_markets"],
+        "apikey": api_key,
+    }
 
     database_url = "postgresql+psycopg2://postgres@localhost:5432/signal"
     table_name = "news_sentiment"
 
     etl = NewsSentimentETLProcessor(database_url, table_name)
-    etl.run(url)
+    etl.run(url, parameters)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+
+from etl_metadata import payload_hash
+
+DEFAULT_ARCHIVE_DIR = os.environ.get(
+    "SIGNAL_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "archive"),
+)
+
+
+class PayloadArchive:
+    """
+    Compressed, content-addressed store of raw API payloads.
+
+    Each distinct payload is written once to objects/<hash[:2]>/<hash>.json.gz.
+    Every source keeps an append-only index of (pulled_at, hash) entries, so
+    repeated identical pulls cost one index line.
+    """
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.json.gz")
+
+    def _index_path(self, source):
+        return os.path.join(self.root, "index", f"{source}.jsonl")
+
+    def store(self, source, raw_data, pulled_at=None):
+        """
+        Archive a payload for a source and return its hash.
+        """
+        digest = payload_hash(raw_data)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(raw_data, f)
+            os.replace(tmp_path, path)
+
+        entry = {"pulled_at": (pulled_at or datetime.now()).isoformat(), "hash": digest}
+        index_path = self._index_path(source)
+        with self._lock:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            with open(index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        return digest
+
+    def entries(self, source, since=None, until=None):
+        """
+        Yield (pulled_at, hash) for a source's archived pulls, oldest first.
+        """
+        index_path = self._index_path(source)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                pulled_at = datetime.fromisoformat(entry["pulled_at"])
+                if (since is None or pulled_at >= since) and (until is None or pulled_at < until):
+                    yield pulled_at, entry["hash"]
+
+    def load(self, digest):
+        """
+        Return the payload stored under a hash.
+        """
+        with gzip.open(self._object_path(digest), "rt", encoding="utf-8") as f:
+            return json.load(f)
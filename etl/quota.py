@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import deque
+
+
+class QuotaTracker:
+    """
+    Sliding-window call counter for one provider key.
+
+    Calls are spaced at least 60 / per_minute seconds apart so a burst never
+    trips the per-minute limit, and the per-day limit caps the last 24 hours.
+    """
+    def __init__(self, per_minute=None, per_day=None):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.min_spacing = 60.0 / per_minute if per_minute else 0.0
+        self._calls = deque()
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+        self._acquire_lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._calls and now - self._calls[0] >= 86400:
+            self._calls.popleft()
+
+    def delay(self, calls=1, now=None):
+        """
+        Return how many seconds to wait before making `calls` more calls.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            wait = max(0.0, self._next_allowed - now)
+            if self.per_minute:
+                recent = [t for t in self._calls if now - t < 60]
+                excess = len(recent) + calls - self.per_minute
+                if excess > 0 and recent:
+                    wait = max(wait, 60 - (now - recent[min(excess, len(recent)) - 1]))
+            if self.per_day:
+                excess = len(self._calls) + calls - self.per_day
+                if excess > 0 and self._calls:
+                    wait = max(wait, 86400 - (now - self._calls[min(excess, len(self._calls)) - 1]))
+            return wait
+
+    def record(self, calls=1, now=None):
+        """
+        Record calls made now.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._calls.extend([now] * calls)
+            self._next_allowed = now + self.min_spacing * calls
+
+    def acquire(self, calls=1, max_wait=None):
+        """
+        Block until `calls` more calls are allowed, then record them. Safe to
+        call from several threads sharing the quota. Returns False without
+        waiting when the wait would exceed max_wait seconds.
+        """
+        while True:
+            with self._acquire_lock:
+                wait = self.delay(calls)
+                if wait <= 0:
+                    self.record(calls)
+                    return True
+            if max_wait is not None and wait > max_wait:
+                return False
+            time.sleep(wait)
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_quota(provider, per_minute=None, per_day=None):
+    """
+    Return the process-wide QuotaTracker of a provider key, created with the
+    given limits on first use, so every job on the key draws on one quota.
+    """
+    with _trackers_lock:
+        tracker = _trackers.get(provider)
+        if tracker is None:
+            tracker = _trackers[provider] = QuotaTracker(per_minute, per_day)
+        return tracker
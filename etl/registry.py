@@ -0,0 +1,135 @@
+import threading
+import time
+
+from sqlalchemy import create_engine, text, Table, MetaData
+from sqlalchemy.exc import ProgrammingError
+
+# How often (in seconds) the schema_version table is polled for changes.
+SCHEMA_VERSION_CHECK_INTERVAL = 60
+
+_lock = threading.Lock()
+_engines = {}
+_schemas = {}
+
+
+class UpsertStatement:
+    """
+    The SQL bulk_upsert runs for one table and column list, built once.
+    """
+    def __init__(self, table, columns, quote):
+        target = quote(table.name)
+        staging = quote(f"_staging_{table.name}")
+        column_list = ", ".join(quote(name) for name in columns)
+
+        self.table = table
+        self.columns = tuple(columns)
+        self._quote = quote
+        self.create_staging = f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {column_list} FROM {target} WITH NO DATA"
+        self.copy = f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+        self.insert = f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging} ON CONFLICT DO NOTHING"
+        self.truncate = f"TRUNCATE {staging}"
+
+    def counted_insert(self, column):
+        """
+        The insert, returning the number of inserted rows per value of column.
+        """
+        quoted = self._quote(column)
+        return f"WITH inserted AS ({self.insert} RETURNING {quoted}) SELECT {quoted}, count(*) FROM inserted GROUP BY {quoted}"
+
+
+class SchemaRegistry:
+    """
+    Caches reflected tables and upsert statements for one engine.
+
+    The cache is dropped whenever the version recorded in schema_version changes.
+    """
+    def __init__(self, engine, check_interval=SCHEMA_VERSION_CHECK_INTERVAL):
+        self.engine = engine
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._statements = {}
+        self._version = None
+        self._checked_at = None
+
+    def schema_version(self):
+        """
+        Return the current schema version, or None if it is not recorded.
+        """
+        with self.engine.connect() as connection:
+            try:
+                return connection.execute(text("SELECT max(version) FROM schema_version")).scalar()
+            except ProgrammingError:
+                return None
+
+    def _check_version(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        version = self.schema_version()
+        self._checked_at = now
+        if version != self._version:
+            self._tables.clear()
+            self._statements.clear()
+            self._version = version
+
+    def invalidate(self):
+        """
+        Drop every cached table and statement.
+        """
+        with self._lock:
+            self._tables.clear()
+            self._statements.clear()
+            self._checked_at = None
+
+    def get_table(self, table_name):
+        """
+        Return the reflected Table, reflecting it on first use only.
+        """
+        with self._lock:
+            self._check_version()
+            table = self._tables.get(table_name)
+            if table is None:
+                table = Table(table_name, MetaData(), autoload_with=self.engine)
+                self._tables[table_name] = table
+            return table
+
+    def get_upsert_statement(self, table_name, columns):
+        """
+        Return the cached UpsertStatement for a table and column list.
+        """
+        table = self.get_table(table_name)
+        key = (table_name, tuple(columns))
+        with self._lock:
+            statement = self._statements.get(key)
+            if statement is None:
+                unknown = [name for name in columns if name not in table.c]
+                if unknown:
+                    raise ValueError(f"Columns not in {table_name}: {', '.join(unknown)}")
+                statement = UpsertStatement(table, columns, self.engine.dialect.identifier_preparer.quote)
+                self._statements[key] = statement
+            return statement
+
+
+def get_engine(database_url):
+    """
+    Return the process-wide pooled Engine for a database URL.
+    """
+    with _lock:
+        engine = _engines.get(database_url)
+        if engine is None:
+            engine = create_engine(database_url, pool_pre_ping=True)
+            _engines[database_url] = engine
+        return engine
+
+
+def get_schema(engine):
+    """
+    Return the SchemaRegistry shared by everything using this engine.
+    """
+    with _lock:
+        registry = _schemas.get(engine)
+        if registry is None:
+            registry = SchemaRegistry(engine)
+            _schemas[engine] = registry
+        return registry
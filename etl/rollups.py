@@ -0,0 +1,109 @@
+import pandas as pd
+from sqlalchemy import text
+
+# Rollup granularities: table suffix -> (date_trunc unit, pandas floor frequency).
+GRANULARITIES = {
+    "hourly": ("hour", "h"),
+    "daily": ("day", "D"),
+}
+
+# Snapshot tables with OHLC rollups. Rollup tables are named
+# <prefix>_ohlc_hourly and <prefix>_ohlc_daily.
+ROLLUPS = {
+    "crypto_data": {
+        "prefix": "crypto",
+        "time_column": "last_updated",
+        "key_column": "id",
+        "key_type": "INT",
+        # Columns copied from the last snapshot in each bucket.
+        "carry_columns": ["symbol", "volume_24h"],
+    },
+    "gold_price_history": {
+        "prefix": "gold",
+        "time_column": "timestamp",
+        "key_column": None,
+        "key_type": None,
+        "carry_columns": [],
+    },
+}
+
+_statements = {}
+
+
+def _rollup_statement(table_name, granularity):
+    """
+    Build the INSERT ... SELECT that recomputes the given buckets from raw
+    snapshots and overwrites them in the rollup table.
+    """
+    cache_key = (table_name, granularity)
+    if cache_key in _statements:
+        return _statements[cache_key]
+
+    spec = ROLLUPS[table_name]
+    unit = GRANULARITIES[granularity][0]
+    time_column = spec["time_column"]
+    key_column = spec["key_column"]
+    key_columns = [key_column] if key_column else []
+    carry_columns = spec["carry_columns"]
+
+    if key_column:
+        buckets = f"unnest(CAST(:keys AS {spec['key_type']}[]), CAST(:buckets AS TIMESTAMP[])) AS touched ({key_column}, bucket)"
+        join = f"raw.{key_column} = touched.{key_column} AND "
+    else:
+        buckets = "unnest(CAST(:buckets AS TIMESTAMP[])) AS touched (bucket)"
+        join = ""
+
+    insert_columns = key_columns + ["bucket"] + carry_columns + ["open", "high", "low", "close", "samples"]
+    select_columns = [f"touched.{column}" for column in key_columns] + ["touched.bucket"]
+    select_columns += [f"(array_agg(raw.{column} ORDER BY raw.{time_column} DESC))[1]" for column in carry_columns]
+    select_columns += [
+        f"(array_agg(raw.price ORDER BY raw.{time_column}))[1]",
+        "max(raw.price)",
+        "min(raw.price)",
+        f"(array_agg(raw.price ORDER BY raw.{time_column} DESC))[1]",
+        "count(*)",
+    ]
+    conflict_columns = key_columns + ["bucket"]
+    updates = [column for column in insert_columns if column not in conflict_columns]
+
+    statement = text(
+        f"INSERT INTO {spec['prefix']}_ohlc_{granularity} ({', '.join(insert_columns)}) "
+        f"SELECT {', '.join(select_columns)} "
+        f"FROM {buckets} "
+        f"JOIN {table_name} AS raw ON {join}"
+        f"raw.{time_column} >= touched.bucket AND raw.{time_column} < touched.bucket + INTERVAL '1 {unit}' "
+        f"GROUP BY {', '.join(select_columns[:len(conflict_columns)])} "
+        f"ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET "
+        + ", ".join(f"{column} = EXCLUDED.{column}" for column in updates)
+    )
+    _statements[cache_key] = statement
+    return statement
+
+
+def update_rollups(engine, table_name, df):
+    """
+    Recompute the hourly and daily OHLC buckets touched by a loaded batch.
+
+    Only the (asset, bucket) pairs present in the batch are rebuilt from the
+    raw snapshots, so the cost follows the batch size, not the history.
+    Returns the number of buckets written per granularity.
+    """
+    if df.empty or table_name not in ROLLUPS:
+        return {}
+
+    spec = ROLLUPS[table_name]
+    times = pd.to_datetime(df[spec["time_column"]])
+    written = {}
+    with engine.begin() as connection:
+        for granularity, (_, frequency) in GRANULARITIES.items():
+            touched = pd.DataFrame({"bucket": times.dt.floor(frequency)})
+            if spec["key_column"]:
+                touched["key"] = df[spec["key_column"]].to_numpy()
+            touched = touched.drop_duplicates()
+
+            parameters = {"buckets": [bucket.to_pydatetime() for bucket in touched["bucket"]]}
+            if spec["key_column"]:
+                parameters["keys"] = [int(key) for key in touched["key"]]
+            result = connection.execute(_rollup_statement(table_name, granularity), parameters)
+            written[granularity] = result.rowcount
+    return written
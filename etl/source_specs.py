@@ -0,0 +1,251 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+def _to_float(values, column):
+    try:
+        # Numbers, numeric strings and None (as NaN) convert in one C loop.
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _to_int(values, column):
+    try:
+        return np.array(values, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        # Missing values need the nullable integer type.
+        return pd.array(pd.to_numeric(pd.Series(values, dtype=object), errors="coerce"), dtype="Int64")
+
+
+def _to_datetime(values, column):
+    # Parsed as UTC and stored naive, like every TIMESTAMP column of the schema.
+    values = np.array(values, dtype=object)
+    parsed = pd.to_datetime(values, format=column.format, unit=column.unit, utc=True, errors="coerce")
+    return parsed.tz_localize(None).to_numpy()
+
+
+def _to_string(values, column):
+    return pd.array(values, dtype="string")
+
+
+def _to_object(values, column):
+    # fromiter keeps nested lists as single objects instead of adding a dimension.
+    return np.fromiter(values, dtype=object, count=len(values))
+
+
+# dtype -> converter applied to the whole column at once.
+CONVERTERS = {
+    "float64": _to_float,
+    "int64": _to_int,
+    "datetime64": _to_datetime,
+    "string": _to_string,
+    "json": _to_object,  # Lists and dicts kept as objects for JSONB and ARRAY columns
+}
+
+
+class Column:
+    """
+    One output column: where it is read from in a record and its dtype.
+
+    path is the record key (the column name by default) or a tuple of keys
+    for nested fields. missing is a sentinel the provider sends for "no
+    observation"; records holding it are dropped as expected gaps rather than
+    failing validation. Database constraints are not repeated here; they are
+    checked against the table definition (see validation.py).
+    """
+    def __init__(self, name, path=None, dtype="float64", format=None, unit=None, missing=None):
+        if dtype not in CONVERTERS:
+            raise ValueError(f"Unknown dtype {dtype!r} for column {name}")
+        self.name = name
+        self.path = path if isinstance(path, tuple) else (path or name,)
+        self.dtype = dtype
+        self.format = format
+        self.unit = unit
+        self.missing = missing
+
+
+class SourceSpec:
+    """
+    Declarative description of how a source's payload maps to its table.
+
+    records is the payload key holding the records (a list, or a dict keyed
+    by `index` such as the dates of a time series), or None when the payload
+    is itself one record. Keys and required columns must not be null, and
+    duplicate keys keep the last row. loaded_at names a column stamped with
+    the processing time.
+
+    The spec is compiled once: columns are grouped by the nested record they
+    come from, and each column is gathered into one list and converted to a
+    typed NumPy array in a single call.
+    """
+    def __init__(self, records, columns, keys, required=(), index=None, loaded_at=None):
+        self.records = records
+        self.columns = list(columns)
+        self.index = index
+        self.keys = list(keys)
+        self.required = list(dict.fromkeys(self.keys + list(required)))
+        self.loaded_at = loaded_at
+
+        self._groups = {}
+        for column in self.columns:
+            self._groups.setdefault(column.path[:-1], []).append(column)
+        typed = ([index] if index else []) + self.columns
+        self.output_columns = [column.name for column in typed] + ([loaded_at] if loaded_at else [])
+
+    @staticmethod
+    def _descend(record, path):
+        for key in path:
+            record = record.get(key) if isinstance(record, dict) else None
+        return record if isinstance(record, dict) else {}
+
+    def _records(self, raw_data):
+        if self.records is None:
+            return None, [raw_data]
+        records = raw_data[self.records]
+        if self.index is not None:
+            return list(records), list(records.values())
+        return None, records
+
+    def transform(self, raw_data):
+        """
+        Build the typed DataFrame of a payload, before validation.
+        """
+        labels, records = self._records(raw_data)
+        data = {}
+        absent = None
+        if self.index is not None:
+            data[self.index.name] = CONVERTERS[self.index.dtype](labels, self.index)
+        for parent, columns in self._groups.items():
+            rows = records if not parent else [self._descend(record, parent) for record in records]
+            for column in columns:
+                key = column.path[-1]
+                values = [row.get(key) for row in rows]
+                if column.missing is not None:
+                    gaps = np.fromiter((value == column.missing for value in values), dtype=bool, count=len(values))
+                    absent = gaps if absent is None else absent | gaps
+                data[column.name] = CONVERTERS[column.dtype](values, column)
+        if self.loaded_at:
+            data[self.loaded_at] = np.full(len(records), np.datetime64(datetime.now(), "us"))
+        df = pd.DataFrame(data, columns=self.output_columns, copy=False)
+        if absent is not None and absent.any():
+            df = df[~absent].reset_index(drop=True)
+        return df
+
+    def deduplicate(self, df):
+        """
+        Drop rows whose keys repeat, keeping the last.
+        """
+        if len(df) > 1:
+            df = df.drop_duplicates(subset=self.keys, keep="last")
+        return df
+
+    def validate(self, df):
+        """
+        Drop incomplete rows, then duplicates. Used when the table's own
+        constraints cannot be loaded.
+        """
+        complete = np.ones(len(df), dtype=bool)
+        for name in self.required:
+            complete &= df[name].notna().to_numpy()
+        if not complete.all():
+            df = df[complete]
+        return self.deduplicate(df)
+
+
+def _usd_quote(field):
+    return ("quote", "USD", field)
+
+
+CRYPTO = SourceSpec(
+    records="data",
+    columns=[
+        Column("id", dtype="int64"),
+        Column("symbol", dtype="string"),
+        Column("name", dtype="string"),
+        Column("cmc_rank", dtype="int64"),
+        Column("circulating_supply"),
+        Column("max_supply"),
+        Column("price", _usd_quote("price")),
+        Column("volume_24h", _usd_quote("volume_24h")),
+        Column("market_cap", _usd_quote("market_cap")),
+        Column("market_cap_dominance", _usd_quote("market_cap_dominance")),
+        Column("percent_change_1h", _usd_quote("percent_change_1h")),
+        Column("percent_change_24h", _usd_quote("percent_change_24h")),
+        Column("percent_change_7d", _usd_quote("percent_change_7d")),
+        Column("last_updated", _usd_quote("last_updated"), dtype="datetime64"),
+    ],
+    keys=["id", "last_updated"],
+    required=["symbol"],
+    loaded_at="data_loaded_at",
+)
+
+GOLD = SourceSpec(
+    records=None,
+    columns=[
+        Column("timestamp", dtype="datetime64", unit="s"),
+        Column("prev_close_price"),
+        Column("open_price"),
+        Column("low_price"),
+        Column("high_price"),
+        Column("price"),
+        Column("ch"),
+        Column("chp"),
+        Column("ask"),
+        Column("bid"),
+    ],
+    keys=["timestamp"],
+    required=["price"],
+    loaded_at="pulled_at",
+)
+
+SP500 = SourceSpec(
+    records="Time Series (Daily)",
+    index=Column("date", dtype="datetime64", format="%Y-%m-%d"),
+    columns=[
+        Column("open", "1. open"),
+        Column("high", "2. high"),
+        Column("low", "3. low"),
+        Column("close", "4. close"),
+        Column("volume", "5. volume", dtype="int64"),
+    ],
+    keys=["date"],
+    required=["open", "high", "low", "close", "volume"],
+    loaded_at="pulled_on",
+)
+
+# TREASURY_YIELD and FEDERAL_FUNDS_RATE share one layout; holidays are sent
+# with a "." value and are skipped.
+ECONOMIC_SERIES = SourceSpec(
+    records="data",
+    columns=[
+        Column("date", dtype="datetime64", format="%Y-%m-%d"),
+        Column("value", missing="."),
+    ],
+    keys=["date"],
+    required=["value"],
+    loaded_at="pulled_on",
+)
+
+NEWS_SENTIMENT = SourceSpec(
+    records="feed",
+    columns=[
+        Column("title", dtype="string"),
+        Column("url", dtype="string"),
+        Column("time_published", dtype="datetime64", format="%Y%m%dT%H%M%S"),
+        Column("authors", dtype="json"),
+        Column("summary", dtype="string"),
+        Column("banner_image", dtype="string"),
+        Column("source", dtype="string"),
+        Column("category_within_source", dtype="string"),
+        Column("source_domain", dtype="string"),
+        Column("topics", dtype="json"),
+        Column("overall_sentiment_score"),
+        Column("overall_sentiment_label", dtype="string"),
+        Column("ticker_sentiment", dtype="json"),
+    ],
+    keys=["url"],
+    required=["title", "time_published", "overall_sentiment_score"],
+    loaded_at="pulled_on",
+)
@@ -1,103 +1,35 @@
-import requests
-import pandas as pd
-from datetime import datetime
-from sqlalchemy import create_engine, Table, MetaData
-from sqlalchemy.dialects.postgresql import insert
+from etl_processor import ETLProcessor
+from datetime import datetime, timedelta
 
+import source_specs
+from indicators import update_indicators
 
-class SP500ETLProcessor:
-    def __init__(self, database_url, table_name):
-        self.database_url = database_url
-        self.table_name = table_name
-        self.engine = create_engine(database_url)
+# outputsize=compact returns the latest 100 trading days (about 140 calendar
+# days), so it is enough while the watermark is newer than this.
+COMPACT_WINDOW = timedelta(days=120)
 
-    def fetch_data(self, url):
-        """
-        Fetch data from the Alpha Vantage API.
-        """
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching data from API: {e}")
-            return None
-
-    def process_data(self, raw_data):
-        """
-        Process raw S&P 500 data into a DataFrame.
-        """
-        try:
-            time_series = raw_data['Time Series (Daily)']
-            df = pd.DataFrame.from_dict(time_series, orient='index')
-
-            # Rename columns to match database schema
-            df.rename(columns={
-                '1. open': 'open',
-                '2. high': 'high',
-                '3. low': 'low',
-                '4. close': 'close',
-                '5. volume': 'volume'
-            }, inplace=True)
-
-            # Convert index to datetime and reset index
-            df.index = pd.to_datetime(df.index)
-            df.reset_index(inplace=True)
-            df.rename(columns={'index': 'date'}, inplace=True)
-
-            # Ensure numerical columns are of the correct type
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
 
-            # Add a pulled_on timestamp
-            df['pulled_on'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+class SP500ETLProcessor(ETLProcessor):
+    watermark_column = "date"
+    spec = source_specs.SP500
 
-            return self.validate_and_truncate(df)
-        except KeyError as e:
-            print(f"Error processing data: Missing key {e}")
-            return pd.DataFrame()
-
-    def validate_and_truncate(self, df):
+    def incremental_request(self, url, parameters, state):
         """
-        Validate and truncate data to match database constraints.
+        Request the full history until it is loaded, then the compact payload.
         """
-        df = df.dropna()  # Drop rows with missing values
-        df['date'] = df['date'].dt.strftime("%Y-%m-%d")  # Format date
-        return df
+        recent = state is not None and state.watermark is not None and state.watermark >= datetime.now() - COMPACT_WINDOW
+        parameters = dict(parameters or {})
+        parameters["outputsize"] = "compact" if recent else "full"
+        return url, parameters
 
-    def upsert_data(self, df):
+    def after_load(self, df):
         """
-        Upsert data into the database table.
+        Update the technical indicators with the new daily bars.
         """
-        if df.empty:
-            print("No data to insert.")
-            return
-
-        metadata = MetaData()
-        metadata.reflect(bind=self.engine)
-        table = Table(self.table_name, metadata, autoload_with=self.engine)
-
-        records = df.to_dict(orient="records")
-
-        stmt = insert(table).values(records)
-        stmt = stmt.on_conflict_do_nothing()
-
-        with self.engine.connect() as connection:
-            try:
-                result = connection.execute(stmt)
-                connection.commit()  # Ensure changes are committed to the database
-                print(f"Upsert completed. {result.rowcount} new records inserted.")
-            except Exception as e:
-                print(f"Error during upsert: {e}")
-
-    def run(self, url):
-        """
-        Run the ETL pipeline: fetch, process, validate, and load data.
-        """
-        raw_data = self.fetch_data(url)
-        if raw_data:
-            df = self.process_data(raw_data)
-            self.upsert_data(df)
+        try:
+            update_indicators(self.engine, self.table_name, df, chunk_size=self.chunk_size)
+        except Exception as e:
+            print(f"Error updating technical indicators: {e}")
 
 
 # Usage example
@@ -0,0 +1,260 @@
+from sp500_etl import SP500ETLProcessor
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import instrumentation
+from bulk_loader import bulk_upsert
+
+CONSTITUENTS_TABLE = "sp500_constituents"
+
+# Accepted CSV headers for each sp500_constituents column.
+CSV_COLUMNS = {
+    "symbol": ["Symbol", "symbol", "Ticker", "ticker"],
+    "name": ["Security", "Name", "name", "Company"],
+    "sector": ["GICS Sector", "Sector", "sector"],
+}
+
+# Symbols whose new bars are accumulated before one bulk load.
+LOAD_BATCH_SYMBOLS = 50
+
+# Symbols still queued when the quota would block longer than this are left
+# for the next run; the stalest symbols are always requested first.
+MAX_QUOTA_WAIT = 120
+DEFERRED = "deferred"
+
+# A symbol whose fetch failed (an unknown ticker, an error payload) is queued
+# after the others for FAILURE_BACKOFF, doubling with every further failure
+# up to MAX_FAILURE_BACKOFF, so it cannot hold the head of the queue.
+FAILURE_BACKOFF = timedelta(hours=6)
+MAX_FAILURE_BACKOFF = timedelta(days=7)
+
+
+def backing_off(state, now):
+    """
+    Return True while a symbol's last failed fetch is within its backoff.
+    """
+    if state is None or not state.failures or state.failed_at is None:
+        return False
+    backoff = min(MAX_FAILURE_BACKOFF, FAILURE_BACKOFF * 2 ** (state.failures - 1))
+    return now - state.failed_at < backoff
+
+
+def read_constituents(source):
+    """
+    Read the index members from a CSV with a symbol column and optional name
+    and GICS sector columns. Returns a symbol, name, sector DataFrame.
+    """
+    csv = pd.read_csv(source, dtype=str)
+    renames = {}
+    for column, headers in CSV_COLUMNS.items():
+        header = next((header for header in headers if header in csv.columns), None)
+        if header is not None:
+            renames[header] = column
+    if "symbol" not in renames.values():
+        raise ValueError(f"No symbol column in {source}")
+
+    members = csv[list(renames)].rename(columns=renames).reindex(columns=list(CSV_COLUMNS))
+    members["symbol"] = members["symbol"].str.strip().str.upper()
+    members["name"] = members["name"].str[:100]
+    members["sector"] = members["sector"].str[:50]
+    return members.dropna(subset=["symbol"]).drop_duplicates(subset=["symbol"])
+
+
+class SPIndexETLProcessor(SP500ETLProcessor):
+    """
+    Daily TIME_SERIES_DAILY bars of every S&P 500 member, keyed by (symbol, date).
+    The members are read from the constituents CSV path or URL
+    (settings.SP500_CONSTITUENTS for the scheduled job).
+
+    Every symbol keeps its own watermark in etl_metadata under
+    "<table>:<symbol>", so it switches to outputsize=compact once its history
+    is loaded. Symbols go through a bounded fetch queue served by max_workers
+    threads that share the provider quota, and the new bars are bulk loaded
+    LOAD_BATCH_SYMBOLS symbols at a time. Once the quota is exhausted for
+    longer than MAX_QUOTA_WAIT, or once max_calls symbols were requested in
+    a run, the remaining symbols are deferred. Failed symbols are counted in
+    etl_metadata and queued last while they back off.
+
+    Each symbol costs one call, so with the free 25 calls/day Alpha Vantage
+    key the first pass over ~500 members takes weeks; raise
+    ALPHA_VANTAGE_CALLS_PER_DAY (and SP500_CONSTITUENTS_CALLS_PER_RUN) on a
+    premium key to load them in minutes.
+    """
+    def __init__(self, database_url, table_name="sp500_constituent_bars", constituents=None, quota=None,
+                 max_workers=2, max_calls=None, **kwargs):
+        super().__init__(database_url, table_name, **kwargs)
+        self.constituents = constituents
+        self.quota = quota
+        self.max_workers = max_workers
+        self.max_calls = max_calls
+
+    def symbol_source(self, symbol):
+        return f"{self.table_name}:{symbol}"
+
+    def transform(self, raw_data):
+        """
+        Turn one symbol's payload into bars; the symbol comes from its Meta
+        Data and is validated (and quarantined if too long) with the bars.
+        """
+        df = super().transform(raw_data)
+        symbol = (raw_data.get("Meta Data") or {}).get("2. Symbol")
+        if not symbol:
+            df = df.iloc[0:0]
+        df.insert(0, "symbol", (symbol or "").upper())
+        return df
+
+    def load_constituents(self):
+        """
+        Add new index members to sp500_constituents and return every symbol.
+        """
+        if not self.constituents:
+            raise ValueError("No constituents CSV configured")
+        members = read_constituents(self.constituents)
+        inserted, _ = bulk_upsert(self.engine, CONSTITUENTS_TABLE, members, chunk_size=self.chunk_size)
+        print(f"{len(members)} constituents, {inserted} new.")
+        return members["symbol"].tolist()
+
+    def _fetch_symbol(self, url, parameters, headers, symbol, state):
+        url, parameters = self.incremental_request(url, {**(parameters or {}), "symbol": symbol}, state)
+        if self.quota is not None and not self.quota.acquire(max_wait=MAX_QUOTA_WAIT):
+            return symbol, DEFERRED
+        with instrumentation.stage("fetch"):
+            raw_data = self.fetch_data(url, parameters, headers)
+        if not raw_data:
+            return symbol, None
+        if "Meta Data" not in raw_data:
+            print(f"No bars for {symbol}: {raw_data.get('Error Message') or raw_data.get('Information') or raw_data}")
+            return symbol, None
+        self.archive.store(self.table_name, raw_data)
+        with instrumentation.stage("process"):
+            df = self.process_data(raw_data, state)
+        return symbol, df
+
+    def fetch_symbols(self, url, parameters=None, headers=None, symbols=None):
+        """
+        Yield (symbol, new bars, None on failure or DEFERRED) for every
+        symbol, stalest first and recently failed last, keeping at most
+        2 * max_workers fetched symbols in memory. Symbols beyond the run's
+        max_calls budget are deferred without a request.
+        """
+        states = self.metadata.get_prefixed(self.symbol_source(""))
+        states = {symbol: states.get(self.symbol_source(symbol)) for symbol in symbols}
+        # Never-loaded symbols first, then the oldest watermarks; symbols
+        # backing off after a failure go last.
+        now = datetime.now()
+        stalest = sorted(symbols, key=lambda symbol: (backing_off(states[symbol], now),
+                                                      getattr(states[symbol], "watermark", None) or datetime.min))
+        if self.max_calls is not None:
+            for symbol in stalest[self.max_calls:]:
+                yield symbol, DEFERRED
+            stalest = stalest[:self.max_calls]
+        fetch = instrumentation.bind(self._fetch_symbol)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for symbol in stalest:
+                state = states[symbol]
+                pending.append(executor.submit(fetch, url, parameters, headers, symbol, state))
+                if len(pending) >= 2 * self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def upsert_data(self, df):
+        """
+        Upsert a batch of bars. Returns (inserted, skipped, {symbol: inserted}),
+        or None on failure.
+        """
+        if df.empty:
+            print("No data to insert.")
+            return 0, 0, {}
+
+        try:
+            result = bulk_upsert(self.engine, self.table_name, df, chunk_size=self.chunk_size, count_by="symbol")
+            print(f"Upsert completed. {result[0]} new records inserted, {result[1]} skipped.")
+            return result
+        except Exception as e:
+            print(f"Error during upsert: {e}")
+            return None
+
+    def _record_load(self, df, result, digest):
+        super()._record_load(df, result, digest)
+        # Advance each symbol's watermark only once its bars are stored.
+        inserted = result[2]
+        for symbol, bars in df.groupby("symbol", sort=False):
+            self.metadata.record(self.symbol_source(symbol), pd.Timestamp(bars["date"].max()).to_pydatetime(),
+                                 inserted.get(symbol, 0))
+
+    def _load_batch(self, frames):
+        return self.load_frame(pd.concat(frames, ignore_index=True))
+
+    def load_symbols(self, url, parameters=None, headers=None, symbols=None):
+        """
+        Fetch and load the new bars of the given symbols (all constituents by
+        default). Returns (inserted, skipped), or None if every fetch or any
+        load failed.
+        """
+        symbols = symbols or self.load_constituents()
+        inserted = skipped = failed = deferred = 0
+        frames = []
+        for symbol, df in self.fetch_symbols(url, parameters, headers, symbols):
+            if df is None:
+                failed += 1
+                self.metadata.record_failure(self.symbol_source(symbol))
+                continue
+            if df is DEFERRED:
+                deferred += 1
+                continue
+            if not df.empty:
+                frames.append(df)
+            if len(frames) >= LOAD_BATCH_SYMBOLS:
+                result = self._load_batch(frames)
+                if result is None:
+                    return None
+                inserted, skipped = inserted + result[0], skipped + result[1]
+                frames = []
+        if frames:
+            result = self._load_batch(frames)
+            if result is None:
+                return None
+            inserted, skipped = inserted + result[0], skipped + result[1]
+
+        if failed or deferred:
+            print(f"{failed} of {len(symbols)} symbols failed and {deferred} were deferred for the quota or the "
+                  "run's call budget; "
+                  "deferred symbols are requested first on the next run, failed ones after a backoff.")
+        if failed == len(symbols):
+            return None
+        return inserted, skipped
+
+    def run(self, url=None, parameters=None, headers=None, replay=False, profile_dir=None, symbols=None):
+        """
+        Load the new bars of every constituent, or rebuild the table from the
+        payload archive with replay=True.
+        """
+        if replay:
+            return super().run(replay=True, profile_dir=profile_dir)
+        with instrumentation.track_run(self.engine, self.table_name, profile_dir) as run:
+            result = self.load_symbols(url, parameters, headers, symbols)
+            if result is None:
+                run.status = "load_failed"
+            return result
+
+
+# Usage example
+def main():
+    api_key = "SFRHBUTCXB3RDG5S"
+    url = "https://www.alphavantage.co/query"
+    parameters = {"function": "TIME_SERIES_DAILY", "apikey": api_key}
+
+    database_url = "postgresql+psycopg2://postgres@localhost:5432/signal"
+
+    etl = SPIndexETLProcessor(database_url,
+                              constituents="https://datahub.io/core/s-and-p-500-companies/r/constituents.csv")
+    etl.run(url, parameters)
+
+
+if __name__ == "__main__":
+    main()
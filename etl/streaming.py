@@ -0,0 +1,261 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Write-behind flush triggers: whichever of rows or seconds is reached first.
+DEFAULT_FLUSH_ROWS = 5000
+DEFAULT_FLUSH_SECONDS = 30.0
+# Rows held for the database before the oldest ticks are dropped from the
+# write queue (they stay in the ring buffer).
+DEFAULT_MAX_PENDING_ROWS = 200000
+# Flushes a frame takes part in before it is quarantined (or dropped when
+# the quarantine cannot be written either).
+DEFAULT_MAX_FLUSH_ATTEMPTS = 10
+
+
+class TickBuffer:
+    """
+    Ring buffer of the latest processed ticks of one stream, for readers.
+
+    Each tick is the DataFrame one poll produced; the oldest tick is dropped
+    once capacity is reached.
+    """
+    def __init__(self, capacity=1000):
+        self._ticks = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def append(self, captured_at, df):
+        with self._lock:
+            self._ticks.append((captured_at, df))
+
+    def latest(self):
+        """
+        Return (captured_at, DataFrame) of the newest tick, or None.
+        """
+        with self._lock:
+            return self._ticks[-1] if self._ticks else None
+
+    def window(self, ticks=None):
+        """
+        Return the rows of the last `ticks` ticks (all buffered by default) as one DataFrame.
+        """
+        with self._lock:
+            selected = list(self._ticks)[-ticks:] if ticks else list(self._ticks)
+        frames = [df for _, df in selected]
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ticks)
+
+
+class WriteBehindQueue:
+    """
+    Background writer that loads queued ticks in micro-batches.
+
+    put() never blocks: frames are appended to an in-memory queue that a
+    writer thread flushes through processor.load_frame once flush_rows rows
+    are pending or flush_seconds have passed, so one COPY upsert, rollup and
+    indicator update covers many ticks. The frames of a failed flush are
+    retried with the next one. A frame that has failed max_flush_attempts
+    flushes is moved to etl_quarantine with the reason "flush_failed", or
+    dropped if that fails too. Beyond max_pending_rows the oldest frames are
+    dropped.
+    """
+    def __init__(self, processor, flush_rows=DEFAULT_FLUSH_ROWS, flush_seconds=DEFAULT_FLUSH_SECONDS,
+                 max_pending_rows=DEFAULT_MAX_PENDING_ROWS, max_flush_attempts=DEFAULT_MAX_FLUSH_ATTEMPTS):
+        self.processor = processor
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_pending_rows = max_pending_rows
+        self.max_flush_attempts = max_flush_attempts
+        self.stats = {"flushes": 0, "failed_flushes": 0, "rows_written": 0, "rows_quarantined": 0,
+                      "rows_dropped": 0}
+        self._pending = deque()
+        self._pending_rows = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{processor.table_name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def put(self, df):
+        if df.empty:
+            return
+        with self._condition:
+            # Pending entries are (frame, failed flushes so far).
+            self._pending.append((df, 0))
+            self._pending_rows += len(df)
+            while self._pending_rows > self.max_pending_rows and len(self._pending) > 1:
+                dropped, _ = self._pending.popleft()
+                self._pending_rows -= len(dropped)
+                self.stats["rows_dropped"] += len(dropped)
+            if self._pending_rows >= self.flush_rows:
+                self._condition.notify()
+
+    def _take(self):
+        frames = list(self._pending)
+        self._pending.clear()
+        self._pending_rows = 0
+        return frames
+
+    def _flush(self, frames):
+        df = pd.concat([frame for frame, _ in frames], ignore_index=True)
+        try:
+            result = self.processor.load_frame(df)
+        except Exception as e:
+            print(f"Error flushing {self.processor.table_name}: {e}")
+            result = None
+        if result is not None:
+            with self._condition:
+                self.stats["flushes"] += 1
+                self.stats["rows_written"] += len(df)
+            return
+
+        retry = [(frame, attempts + 1) for frame, attempts in frames if attempts + 1 < self.max_flush_attempts]
+        expired = [frame for frame, attempts in frames if attempts + 1 >= self.max_flush_attempts]
+        with self._condition:
+            self.stats["failed_flushes"] += 1
+            # Requeue ahead of newer ticks; put() trims them if the database stays down.
+            self._pending.extendleft(reversed(retry))
+            self._pending_rows += sum(len(frame) for frame, _ in retry)
+        if expired:
+            self._give_up(pd.concat(expired, ignore_index=True))
+
+    def _give_up(self, df):
+        """
+        Quarantine the rows of frames that kept failing to load.
+        """
+        try:
+            self.processor.quarantine_rows(df.assign(reasons=[["flush_failed"]] * len(df)))
+            outcome = "rows_quarantined"
+        except Exception as e:
+            print(f"Error quarantining {len(df)} unflushed rows of {self.processor.table_name}, dropping them: {e}")
+            outcome = "rows_dropped"
+        with self._condition:
+            self.stats[outcome] += len(df)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_seconds
+                while not self._stopped and self._pending_rows < self.flush_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(timeout=remaining)
+                stopped = self._stopped
+                frames = self._take()
+            if frames:
+                self._flush(frames)
+            if stopped:
+                return
+
+    def stop(self, timeout=None):
+        """
+        Flush what is pending and stop the writer thread.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+
+class StreamPoller:
+    """
+    Polls one endpoint every `interval` seconds on a fixed schedule.
+
+    Ticks are due at start + k * interval and run on a small worker pool, so
+    a slow response never delays the next tick; a tick is skipped (and
+    counted as missed) when max_in_flight polls are still running or the
+    provider quota has no room before the next tick. Each tick is processed
+    with the processor's spec and kept whole in the ring buffer; only rows
+    not seen in the previous tick go to the write-behind queue.
+    """
+    def __init__(self, processor, url, parameters=None, headers=None, interval=10.0, buffer=None, writer=None,
+                 quota=None, calls=1, max_in_flight=2):
+        self.processor = processor
+        self.url = url
+        self.parameters = parameters
+        self.headers = headers
+        self.interval = interval
+        self.buffer = buffer or TickBuffer()
+        self.writer = writer or WriteBehindQueue(processor)
+        self.quota = quota
+        self.calls = calls
+        self.max_in_flight = max_in_flight
+        self.stats = {"ticks": 0, "missed": 0, "failed": 0, "rows": 0, "late_seconds": 0.0}
+        self._keys = processor.spec.keys
+        self._seen = set()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _new_rows(self, df):
+        keys = set(df[self._keys].itertuples(index=False, name=None))
+        with self._lock:
+            seen, self._seen = self._seen, keys
+        if not seen:
+            return df
+        fresh = [key not in seen for key in df[self._keys].itertuples(index=False, name=None)]
+        return df[fresh]
+
+    def _tick(self, captured_at):
+        try:
+            if self.quota is not None and not self.quota.acquire(self.calls, max_wait=self.interval / 2):
+                with self._lock:
+                    self.stats["missed"] += 1
+                return
+            raw_data = self.processor.fetch_data(self.url, self.parameters, self.headers)
+            if not raw_data:
+                with self._lock:
+                    self.stats["failed"] += 1
+                return
+            processed = self.processor.process_data(raw_data)
+            df = self._new_rows(processed)
+            self.buffer.append(captured_at, processed)
+            self.writer.put(df)
+            with self._lock:
+                self.stats["ticks"] += 1
+                self.stats["rows"] += len(df)
+        except Exception as e:
+            print(f"Error polling {self.processor.table_name}: {e}")
+            with self._lock:
+                self.stats["failed"] += 1
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def run(self):
+        """
+        Poll until stop() is called, then flush the write-behind queue.
+        """
+        self.writer.start()
+        started = time.monotonic()
+        tick = 0
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            while not self._stopped.is_set():
+                due = started + tick * self.interval
+                wait = due - time.monotonic()
+                if wait > 0 and self._stopped.wait(wait):
+                    break
+                with self._lock:
+                    self.stats["late_seconds"] = max(self.stats["late_seconds"], -wait)
+                    busy = self._in_flight >= self.max_in_flight
+                    if busy:
+                        self.stats["missed"] += 1
+                    else:
+                        self._in_flight += 1
+                if not busy:
+                    executor.submit(self._tick, pd.Timestamp.now())
+                # Resume on the schedule after a stall instead of bursting to catch up.
+                tick = max(tick + 1, int((time.monotonic() - started) // self.interval) + 1)
+        self.writer.stop()
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import PrimaryKeyConstraint, UniqueConstraint
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.types import BigInteger, Float, Integer, Numeric, SmallInteger, String
+
+from bulk_loader import bulk_upsert
+from etl_metadata import payload_hash
+from registry import SCHEMA_VERSION_CHECK_INTERVAL, get_schema
+
+QUARANTINE_TABLE = "etl_quarantine"
+
+# Exclusive magnitude limits of the integer column types.
+INTEGER_LIMITS = [(SmallInteger, 2 ** 15), (BigInteger, 2 ** 63), (Integer, 2 ** 31)]
+
+_lock = threading.Lock()
+_validators = {}
+
+
+class TableValidator:
+    """
+    Constraints of one table, derived once from its reflected definition:
+    NOT NULL and key columns, NUMERIC precision and scale, integer ranges and
+    text lengths, plus the extra required columns of the source's spec.
+
+    check() tests a whole batch with one vectorized mask per constraint.
+    Failing rows are returned separately with reason codes such as
+    "null:price", "overflow:chp" or "too_long:symbol". Over-long text in
+    non-key columns is truncated rather than rejected.
+    """
+    def __init__(self, table, required=()):
+        self.table = table
+        keys = {column.name for constraint in table.constraints
+                if isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint))
+                for column in constraint.columns}
+        # Columns with a server default (SERIAL ids, load timestamps) may be left out.
+        self.not_null = [column.name for column in table.columns
+                         if (not column.nullable and column.server_default is None) or column.name in required]
+        self.numeric = []
+        self.integer = []
+        self.lengths = []
+        self.key_lengths = []
+        for column in table.columns:
+            column_type = column.type
+            if isinstance(column_type, Numeric) and not isinstance(column_type, Float):
+                if column_type.precision is not None:
+                    scale = column_type.scale or 0
+                    self.numeric.append((column.name, scale, 10.0 ** (column_type.precision - scale)))
+                else:
+                    self.numeric.append((column.name, None, np.inf))
+            elif isinstance(column_type, Integer):
+                limit = next(limit for kind, limit in INTEGER_LIMITS if isinstance(column_type, kind))
+                self.integer.append((column.name, limit))
+            elif isinstance(column_type, String) and column_type.length:
+                target = self.key_lengths if column.name in keys else self.lengths
+                target.append((column.name, column_type.length))
+
+    def check(self, df):
+        """
+        Return (valid rows, rejected rows with a "reasons" list column).
+        Over-long non-key text is truncated in place.
+        """
+        for name, length in self.lengths:
+            if name in df:
+                df[name] = df[name].str[:length]
+
+        failures = {}
+        for name in self.not_null:
+            if name in df:
+                failures[f"null:{name}"] = df[name].isna().to_numpy()
+        for name, scale, limit in self.numeric:
+            if name in df:
+                values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+                rounded = np.abs(np.round(values, scale)) if scale is not None else np.abs(values)
+                with np.errstate(invalid="ignore"):
+                    failures[f"overflow:{name}"] = (rounded >= limit) | np.isinf(values)
+        for name, limit in self.integer:
+            if name in df:
+                values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+                with np.errstate(invalid="ignore"):
+                    failures[f"overflow:{name}"] = np.abs(values) >= limit
+        for name, length in self.key_lengths:
+            if name in df:
+                failures[f"too_long:{name}"] = (df[name].str.len() > length).to_numpy(dtype=bool, na_value=False)
+
+        failed = np.zeros(len(df), dtype=bool)
+        for mask in failures.values():
+            failed |= mask
+        if not failed.any():
+            return df, df.iloc[0:0].assign(reasons=None)
+
+        reasons = [[] for _ in range(int(failed.sum()))]
+        for reason, mask in failures.items():
+            for i in np.flatnonzero(mask[failed]):
+                reasons[i].append(reason)
+        rejected = df[failed].assign(reasons=reasons)
+        return df[~failed], rejected
+
+
+def get_validator(engine, table_name, required=()):
+    """
+    Return the TableValidator of a table, rebuilt when the schema registry
+    reflects the table again. Returns None when the table cannot be reflected
+    (retried after SCHEMA_VERSION_CHECK_INTERVAL).
+    """
+    key = (engine, table_name, tuple(required))
+    now = time.monotonic()
+    with _lock:
+        cached = _validators.get(key)
+    if cached is not None and cached[0] is None and now - cached[1] < SCHEMA_VERSION_CHECK_INTERVAL:
+        return None
+
+    try:
+        table = get_schema(engine).get_table(table_name)
+    except SQLAlchemyError:
+        with _lock:
+            _validators[key] = (None, now)
+        return None
+
+    if cached is not None and cached[0] is not None and cached[0].table is table:
+        return cached[0]
+    validator = TableValidator(table, required)
+    with _lock:
+        _validators[key] = (validator, now)
+    return validator
+
+
+def quarantine(engine, source, rejected, exclude=()):
+    """
+    Store rejected rows in etl_quarantine with their reason codes. Rows are
+    keyed by a hash of the record without the `exclude` columns (load
+    timestamps), so a row rejected again on a later run is stored once.
+    Returns the number of new rows stored.
+    """
+    if rejected.empty:
+        return 0
+    records = json.loads(rejected.drop(columns="reasons").to_json(orient="records", date_format="iso",
+                                                                  default_handler=str))
+    hashes = [payload_hash({name: value for name, value in record.items() if name not in exclude})
+              for record in records]
+    rows = pd.DataFrame({"source": source, "record_hash": hashes, "reasons": rejected["reasons"].tolist(),
+                         "record": records}).drop_duplicates(subset=["record_hash"])
+    inserted, _ = bulk_upsert(engine, QUARANTINE_TABLE, rows)
+    return inserted
@@ -0,0 +1,445 @@
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "etl"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "models"))
+
+from config import settings
+from data_access import get_data_access
+from preprocessing import REVISION_DAYS, FeatureStore
+
+DEFAULT_CORRELATION_DIR = os.environ.get("SIGNAL_CORRELATION_DIR", os.path.join(ROOT_DIR, "data", "correlation"))
+
+WINDOWS = [20, 60, 250]      # rolling windows, in days
+EWMA_LAMBDAS = [0.94, 0.97]  # RiskMetrics decay factors
+# Pairwise observations needed in a window before a correlation is reported.
+MIN_PERIODS_FRACTION = 0.5
+# Power iterations per top eigenvalue, warm-started from the previous day's vector.
+POWER_ITERATIONS = 8
+
+RETURN_SUFFIX = "_ret_1d"
+
+# Pairwise sums kept per rolling window, stacked in this order.
+_WINDOW_FIELDS = ["count", "sum", "sumsq", "cross"]
+
+
+def read_returns(store, data, after=None, constituents=False):
+    """
+    Daily log returns after `after` as a date x asset DataFrame: every 1-day
+    return column of the feature store and, with constituents=True, the
+    close-to-close returns of each S&P 500 member (NaN on days without a bar).
+    """
+    dates, features, columns = store.load()
+    start = 0 if after is None else int(np.searchsorted(dates, np.datetime64(after, "D"), side="right"))
+    selected = [i for i, name in enumerate(columns) if name.endswith(RETURN_SUFFIX)]
+    returns = pd.DataFrame(np.asarray(features[start:, selected]), index=pd.DatetimeIndex(dates[start:]),
+                           columns=[columns[i][:-len(RETURN_SUFFIX)] for i in selected])
+    if not constituents or returns.empty:
+        return returns
+
+    # Re-read a few days before the first new date so its previous close is known.
+    first = returns.index[0].to_pydatetime() - timedelta(days=10)
+    bars = data.constituent_bars(start=first, format="numpy")
+    closes = pd.DataFrame({"date": bars["date"].astype("datetime64[ns]"), "symbol": bars["symbol"],
+                           "close": bars["close"]}).pivot(index="date", columns="symbol", values="close")
+    member_returns = np.log(closes).apply(lambda column: column.dropna().diff())
+    member_returns.columns = [f"stock_{symbol}_close" for symbol in member_returns.columns]
+    return returns.join(member_returns.reindex(returns.index))
+
+
+class CorrelationState:
+    """
+    Rolling and EWMA covariance and correlation matrices over many assets,
+    updated one day at a time.
+
+    Each rolling window keeps pairwise-complete sums (observation counts, sum
+    of x, sum of x^2 and sum of x_i * x_j over the days both assets have a
+    return) as N x N matrices. A new day adds the outer products of its
+    return vector and subtracts those of the day leaving the window, so each
+    day costs O(N^2) instead of O(N^2 * W). The last max(WINDOWS) +
+    revision_days days are kept in a ring buffer for the subtraction, to
+    recompute the sums on save and to undo the last revision_days days when
+    the feature store revises them. EWMA matrices use the zero-mean
+    RiskMetrics recursion with a bias correction per pair. Assets seen for
+    the first time are added with empty history.
+    """
+    def __init__(self, windows=WINDOWS, lambdas=EWMA_LAMBDAS, revision_days=REVISION_DAYS):
+        self.windows = list(windows)
+        self.lambdas = list(lambdas)
+        self.capacity = max(self.windows) + revision_days
+        self.assets = np.array([], dtype=object)
+        self.index = {}
+        self.ring = np.empty((self.capacity, 0))
+        self.pos = 0
+        self.days = 0
+        self.last_date = None
+        self.sums = {window: np.zeros((len(_WINDOW_FIELDS), 0, 0)) for window in self.windows}
+        self.ewma = {lam: (np.zeros((0, 0)), np.zeros((0, 0))) for lam in self.lambdas}
+        self.eigenvectors = {}
+        self.regime_dates = np.array([], dtype="datetime64[D]")
+        self.regime_columns = [f"{name}_{key}" for key in self.keys() for name in ("avg_corr", "top_eigen_share")]
+        self.regime_values = np.empty((0, len(self.regime_columns)))
+
+    def keys(self):
+        """
+        Names of the maintained matrices: "w<window>" and "ewma<lambda>".
+        """
+        return [f"w{window}" for window in self.windows] + [f"ewma{lam:g}" for lam in self.lambdas]
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path, allow_pickle=True) as data:
+            state = cls([int(w) for w in data["windows"]], [float(lam) for lam in data["lambdas"]])
+            state.assets = data["assets"]
+            state.ring = data["ring"]
+            state.capacity = len(state.ring)
+            state.pos = int(data["pos"])
+            state.days = int(data["days"])
+            state.last_date = data["last_date"][0] if data["last_date"].size else None
+            for window in state.windows:
+                state.sums[window] = data[f"w{window}"]
+            for lam in state.lambdas:
+                state.ewma[lam] = (data[f"ewma{lam:g}_cov"], data[f"ewma{lam:g}_weight"])
+            state.eigenvectors = {key[len("eigen_"):]: data[key] for key in data.files if key.startswith("eigen_")}
+            state.regime_dates = data["regime_dates"]
+            state.regime_values = data["regime_values"]
+        state.index = {asset: i for i, asset in enumerate(state.assets)}
+        return state
+
+    def save(self, path):
+        self._resync()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {f"w{window}": self.sums[window] for window in self.windows}
+        for lam, (cov, weight) in self.ewma.items():
+            arrays[f"ewma{lam:g}_cov"], arrays[f"ewma{lam:g}_weight"] = cov, weight
+        arrays.update({f"eigen_{key}": vector for key, vector in self.eigenvectors.items()})
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path, windows=self.windows, lambdas=self.lambdas, assets=self.assets, ring=self.ring,
+            pos=self.pos, days=self.days,
+            last_date=np.array([] if self.last_date is None else [self.last_date], dtype="datetime64[D]"),
+            regime_dates=self.regime_dates, regime_values=self.regime_values, **arrays,
+        )
+        os.replace(tmp_path, path)
+
+    def _recent(self, window):
+        """
+        The last min(days, window) ring rows, oldest first.
+        """
+        n = min(self.days, window)
+        rows = (self.pos - n + np.arange(n)) % self.capacity
+        return self.ring[rows]
+
+    def _resync(self):
+        """
+        Recompute the window sums from the ring buffer to shed floating-point drift.
+        """
+        for window in self.windows:
+            recent = self._recent(window)
+            valid = (~np.isnan(recent)).astype(np.float64)
+            values = np.nan_to_num(recent)
+            self.sums[window] = np.stack([valid.T @ valid, values.T @ valid, (values ** 2).T @ valid,
+                                          values.T @ values])
+
+    def _add_assets(self, assets):
+        new = [asset for asset in assets if asset not in self.index]
+        if not new:
+            return
+        n, total = len(new), len(self.assets) + len(new)
+        for i, asset in enumerate(new):
+            self.index[asset] = len(self.assets) + i
+        self.assets = np.concatenate([self.assets, np.array(new, dtype=object)])
+        self.ring = np.hstack([self.ring, np.full((self.capacity, n), np.nan)])
+
+        def grow(matrix):
+            grown = np.zeros(matrix.shape[:-2] + (total, total))
+            grown[..., :matrix.shape[-2], :matrix.shape[-1]] = matrix
+            return grown
+
+        for window in self.windows:
+            self.sums[window] = grow(self.sums[window])
+        self.ewma = {lam: (grow(cov), grow(weight)) for lam, (cov, weight) in self.ewma.items()}
+        self.eigenvectors = {key: np.concatenate([vector, np.zeros(n)]) for key, vector in self.eigenvectors.items()}
+
+    def _step(self, x):
+        """
+        Apply one day's return vector (NaN where an asset has no return).
+        """
+        valid = ~np.isnan(x)
+        m = valid.astype(np.float64)
+        x0 = np.where(valid, x, 0.0)
+        # Every window field is a product of one left and one right factor, in _WINDOW_FIELDS order.
+        left = np.stack([m, x0, x0 * x0, x0])
+        right = np.stack([m, m, m, x0])
+        for window in self.windows:
+            sums = self.sums[window]
+            if self.days >= window:
+                old = self.ring[(self.pos - window) % self.capacity]
+                old_m = (~np.isnan(old)).astype(np.float64)
+                old0 = np.nan_to_num(old)
+                # Add the new day and drop the oldest as one rank-2 update per field.
+                old_left = np.stack([old_m, old0, old0 * old0, old0])
+                old_right = np.stack([old_m, old_m, old_m, old0])
+                sums += np.stack([left, -old_left], axis=2) @ np.stack([right, old_right], axis=1)
+            else:
+                sums += left[:, :, None] * right[:, None, :]
+
+        # Pairs without a return today keep their EWMA unchanged.
+        outer = np.outer(x0, x0)
+        both = np.outer(m, m)
+        for lam, (cov, weight) in self.ewma.items():
+            step = both * (1.0 - lam)
+            cov += step * (outer - cov)
+            weight += step * (1.0 - weight)
+
+        self.ring[self.pos] = x
+        self.pos = (self.pos + 1) % self.capacity
+        self.days += 1
+
+    def _unstep(self):
+        """
+        Undo the last _step: subtract the newest day, add back the days it
+        pushed out of the windows and invert the EWMA recursion.
+        """
+        self.pos = (self.pos - 1) % self.capacity
+        self.days -= 1
+        x = self.ring[self.pos]
+        valid = ~np.isnan(x)
+        m = valid.astype(np.float64)
+        x0 = np.where(valid, x, 0.0)
+        left = np.stack([m, x0, x0 * x0, x0])
+        right = np.stack([m, m, m, x0])
+        for window in self.windows:
+            sums = self.sums[window]
+            sums -= left[:, :, None] * right[:, None, :]
+            if self.days >= window:
+                old = self.ring[(self.pos - window) % self.capacity]
+                old_m = (~np.isnan(old)).astype(np.float64)
+                old0 = np.nan_to_num(old)
+                old_left = np.stack([old_m, old0, old0 * old0, old0])
+                old_right = np.stack([old_m, old_m, old_m, old0])
+                sums += old_left[:, :, None] * old_right[:, None, :]
+
+        outer = np.outer(x0, x0)
+        both = np.outer(m, m)
+        for lam, (cov, weight) in self.ewma.items():
+            step = both * (1.0 - lam)
+            cov -= step * outer
+            cov /= 1.0 - step
+            weight -= step
+            weight /= 1.0 - step
+        self.ring[self.pos] = np.nan
+
+    def rollback(self, since):
+        """
+        Undo the applied days from `since` on, newest first, as far as the
+        ring buffer still holds the days they pushed out of the largest
+        window. Returns the number of days undone.
+        """
+        count = len(self.regime_dates) - int(np.searchsorted(self.regime_dates, np.datetime64(since, "D")))
+        count = min(count, self.days, self.capacity - max(self.windows))
+        for _ in range(count):
+            self._unstep()
+        if count:
+            self.regime_dates = self.regime_dates[:-count]
+            self.regime_values = self.regime_values[:-count]
+            self.last_date = self.regime_dates[-1] if len(self.regime_dates) else None
+        return count
+
+    def matrices(self, key, covariance=True):
+        """
+        Return (covariance, correlation) of one maintained matrix; pairs
+        without enough observations are NaN. With covariance=False only the
+        correlation is computed and None is returned in its place.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if key.startswith("ewma"):
+                cov, weight = self.ewma[float(key[len("ewma"):])]
+                cov = np.where(weight > 0, cov / weight, np.nan)
+                std = np.sqrt(np.diag(cov))
+                return (cov if covariance else None), cov / np.outer(std, std)
+
+            window = int(key[1:])
+            n, total, total_sq, cross = self.sums[window]
+            too_few = n < max(2, int(np.ceil(window * MIN_PERIODS_FRACTION)))
+            # Pairwise-complete moments: total[i, j] sums x_i over the days both i and j have a return.
+            centered = total * total.T
+            centered /= n
+            np.subtract(cross, centered, out=centered)
+            var = total * total
+            var /= n
+            np.subtract(total_sq, var, out=var)
+            cov = None
+            if covariance:
+                cov = centered / (n - 1)
+                cov[too_few] = np.nan
+            corr = var * var.T
+            np.sqrt(corr, out=corr)
+            np.divide(centered, corr, out=corr)
+            corr[too_few] = np.nan
+        return cov, np.clip(corr, -1.0, 1.0, out=corr)
+
+    def _top_eigen_share(self, key, corr):
+        """
+        Share of the total variance on the first principal component of a
+        correlation matrix (missing pairs count as uncorrelated), by power
+        iteration from the previous day's eigenvector. corr is overwritten.
+        """
+        present = ~np.isnan(np.diag(corr))
+        if present.sum() < 2:
+            return np.nan
+        matrix = np.nan_to_num(corr, copy=False)
+        # Assets without enough history have all-zero rows and columns.
+        matrix[np.diag_indices_from(matrix)] = present
+        vector = self.eigenvectors.get(key)
+        if vector is None or not np.any(vector):
+            vector = present.astype(np.float64)
+        for _ in range(POWER_ITERATIONS):
+            vector = matrix @ vector
+            vector /= np.linalg.norm(vector)
+        self.eigenvectors[key] = vector
+        return float(vector @ matrix @ vector) / present.sum()
+
+    def regime(self):
+        """
+        Cross-asset regime features of the current day: the average pairwise
+        correlation and the top eigenvalue share of every maintained matrix.
+        """
+        features = []
+        for key in self.keys():
+            _, corr = self.matrices(key, covariance=False)
+            diagonal = np.diag(corr)
+            pairs = np.isfinite(corr).sum() - np.isfinite(diagonal).sum()
+            average = (np.nansum(corr) - np.nansum(diagonal)) / pairs if pairs else np.nan
+            features += [average, self._top_eigen_share(key, corr)]
+        return np.array(features)
+
+    def update(self, returns):
+        """
+        Apply the days of a date x asset return DataFrame in order. Days
+        already applied from the first date of `returns` on are rolled back
+        first, so revised returns replace the old ones; older days are
+        ignored. Returns the number of days applied.
+        """
+        if self.last_date is not None and not returns.empty:
+            self.rollback(returns.index[0])
+        if self.last_date is not None:
+            returns = returns[returns.index > pd.Timestamp(self.last_date)]
+        if returns.empty:
+            return 0
+        self._add_assets(list(returns.columns))
+        columns = np.array([self.index[asset] for asset in returns.columns])
+        rows = np.full((len(returns), len(self.assets)), np.nan)
+        rows[:, columns] = returns.to_numpy(dtype=np.float64)
+
+        regime = np.empty((len(rows), len(self.regime_columns)))
+        for i, x in enumerate(rows):
+            self._step(x)
+            regime[i] = self.regime()
+        dates = returns.index.to_numpy().astype("datetime64[D]")
+        self.regime_dates = np.concatenate([self.regime_dates, dates])
+        self.regime_values = np.vstack([self.regime_values, regime])
+        self.last_date = dates[-1]
+        return len(rows)
+
+    def regime_frame(self):
+        return pd.DataFrame(self.regime_values, index=pd.DatetimeIndex(self.regime_dates), columns=self.regime_columns)
+
+
+class CorrelationEngine:
+    """
+    Keeps the correlation state in step with the feature store.
+
+    update() applies the days added since the last run, re-applying the last
+    REVISION_DAYS days the feature store may have revised, saves the state
+    and writes a snapshot of every matrix for the newest day to
+    snapshots/<date>.npz (float32), so past matrices can be looked up without
+    recomputing them. The daily regime features are kept in the state file.
+    """
+    def __init__(self, path=DEFAULT_CORRELATION_DIR, store=None, database_url=settings.DATABASE_URL,
+                 constituents=False):
+        self.path = path
+        self.store = store or FeatureStore(database_url=database_url)
+        self.database_url = database_url
+        self.constituents = constituents
+        self.state_path = os.path.join(path, "state.npz")
+        self.snapshot_dir = os.path.join(path, "snapshots")
+        self.state = CorrelationState.load(self.state_path)
+
+    def update(self):
+        """
+        Apply the new and revised feature store days. Returns the number of
+        days applied.
+        """
+        data = get_data_access(self.database_url) if self.constituents else None
+        after = None
+        if self.state.last_date is not None:
+            after = self.state.last_date - np.timedelta64(REVISION_DAYS, "D")
+        returns = read_returns(self.store, data, after, self.constituents)
+        applied = self.state.update(returns)
+        if applied:
+            self.save_snapshot()
+            self.state.save(self.state_path)
+        return applied
+
+    def save_snapshot(self):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        arrays = {}
+        for key in self.state.keys():
+            cov, corr = self.state.matrices(key)
+            arrays[f"{key}_cov"], arrays[f"{key}_corr"] = cov.astype(np.float32), corr.astype(np.float32)
+        path = os.path.join(self.snapshot_dir, f"{self.state.last_date}.npz")
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, assets=self.state.assets.astype(str), **arrays)
+        os.replace(tmp_path, path)
+
+    def snapshot_dates(self):
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        return sorted(name[:-len(".npz")] for name in os.listdir(self.snapshot_dir)
+                      if name.endswith(".npz") and not name.endswith(".tmp.npz"))
+
+    def load_snapshot(self, day=None):
+        """
+        Return (date, assets, {"<key>_cov" / "<key>_corr": matrix}) of the
+        latest snapshot on or before `day` (the newest by default), or None.
+        """
+        dates = [d for d in self.snapshot_dates() if day is None or d <= str(pd.Timestamp(day).date())]
+        if not dates:
+            return None
+        with np.load(os.path.join(self.snapshot_dir, f"{dates[-1]}.npz")) as data:
+            return dates[-1], data["assets"].tolist(), {name: data[name] for name in data.files if name != "assets"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update rolling cross-asset covariance and correlation matrices.")
+    parser.add_argument("--constituents", action="store_true", help="Include every S&P 500 member's returns.")
+    parser.add_argument("--update-store", action="store_true", help="Update the feature store first.")
+    args = parser.parse_args()
+
+    engine = CorrelationEngine(constituents=args.constituents)
+    if args.update_store:
+        engine.store.update()
+    started = time.perf_counter()
+    applied = engine.update()
+    elapsed = time.perf_counter() - started
+    print(f"Applied {applied} days over {len(engine.state.assets)} assets in {elapsed:.2f}s.")
+    regime = engine.state.regime_frame()
+    if not regime.empty:
+        print(f"Regime as of {regime.index[-1].date()}:")
+        for name, value in regime.iloc[-1].items():
+            print(f"  {name:<28} {value:+.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import text
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow is optional; reads then return NumPy arrays.
+    pa = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "etl"))
+
+from config import settings
+from registry import get_engine
+
+# Rows fetched per round trip from the server-side cursor.
+FETCH_SIZE = 10000
+# How often (in seconds) etl_metadata is polled for new loads.
+WATERMARK_CHECK_INTERVAL = 30
+DEFAULT_CACHE_BYTES = int(os.environ.get("SIGNAL_READ_CACHE_MB", 256)) * 2 ** 20
+
+# Bounds used for an open start or end of a range.
+MIN_TIME = datetime(1900, 1, 1)
+MAX_TIME = datetime(9999, 12, 31)
+
+_DATE = "datetime64[D]"
+_TIMESTAMP = "datetime64[us]"
+_OHLC = {"open": "float64", "high": "float64", "low": "float64", "close": "float64"}
+
+
+class RangeQuery:
+    """
+    Typed range read of one table.
+
+    columns maps every selected column to the NumPy dtype it is returned as.
+    Rows are bounded by time_column in [start, end) and, when key_column is
+    set, restricted to a list of keys. source is the etl_metadata entry whose
+    loads change the table (the snapshot table for rollups).
+    """
+    def __init__(self, table, time_column, columns, source=None, key_column=None):
+        self.table = table
+        self.time_column = time_column
+        self.columns = columns
+        self.source = source or table
+        self.key_column = key_column
+
+        sql = (f"SELECT {', '.join(columns)} FROM {table} "
+               f"WHERE {time_column} >= :start AND {time_column} < :end")
+        self.sql = text(f"{sql} ORDER BY {time_column}")
+        if key_column:
+            self.keyed_sql = text(f"{sql} AND {key_column} = ANY(:keys) ORDER BY {key_column}, {time_column}")
+
+
+def _crypto_ohlc(table):
+    columns = {"bucket": _TIMESTAMP, "id": "int64", "symbol": "object", **_OHLC, "volume_24h": "float64"}
+    return RangeQuery(table, "bucket", columns, source="crypto_data", key_column="symbol")
+
+
+def _gold_ohlc(table):
+    return RangeQuery(table, "bucket", {"bucket": _TIMESTAMP, **_OHLC}, source="gold_price_history")
+
+
+def _economic_series(table):
+    return RangeQuery(table, "date", {"date": _DATE, "value": "float64"})
+
+
+QUERIES = {
+    "crypto_ohlc_hourly": _crypto_ohlc("crypto_ohlc_hourly"),
+    "crypto_ohlc_daily": _crypto_ohlc("crypto_ohlc_daily"),
+    "gold_ohlc_hourly": _gold_ohlc("gold_ohlc_hourly"),
+    "gold_ohlc_daily": _gold_ohlc("gold_ohlc_daily"),
+    "sp500_index_data": RangeQuery("sp500_index_data", "date", {"date": _DATE, **_OHLC, "volume": "int64"}),
+    "sp500_constituent_bars": RangeQuery(
+        "sp500_constituent_bars", "date", {"date": _DATE, "symbol": "object", **_OHLC, "volume": "int64"},
+        key_column="symbol",
+    ),
+    "treasury_yields": _economic_series("treasury_yields"),
+    "federal_funds_rate": _economic_series("federal_funds_rate"),
+    "news_sentiment": RangeQuery(
+        "news_sentiment", "time_published",
+        {"time_published": _TIMESTAMP, "url": "object", "source": "object",
+         "overall_sentiment_score": "float64", "overall_sentiment_label": "object"},
+    ),
+}
+
+
+def _to_arrays(rows, columns):
+    """
+    Transpose fetched rows into one typed array per column. NUMERIC values
+    become floats and NULLs become NaN or NaT.
+    """
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return {name: np.array(column, dtype=dtype) for (name, dtype), column in zip(columns.items(), values)}
+
+
+def _nbytes(result):
+    if pa is not None and isinstance(result, pa.Table):
+        return result.nbytes
+    # Object columns hold pointers; count a short string behind each too.
+    return sum(64 * len(array) if array.dtype == object else array.nbytes for array in result.values())
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by the bytes it holds.
+    """
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def discard(self, predicate):
+        """
+        Drop every entry whose key matches predicate.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self.bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+class DataAccess:
+    """
+    Shared read layer over the loaded tables.
+
+    Reads stream through a server-side cursor in FETCH_SIZE row chunks and
+    return a pyarrow Table (or, without pyarrow or with format="numpy", a dict
+    of read-only NumPy arrays). Results are kept in an LRU cache keyed by the
+    query and the version of its source in etl_metadata; etl_metadata is
+    polled at most every check_interval seconds, and entries of a source are
+    dropped as soon as a new load of it is seen.
+    """
+    def __init__(self, database_url=settings.DATABASE_URL, cache_bytes=DEFAULT_CACHE_BYTES,
+                 check_interval=WATERMARK_CHECK_INTERVAL, fetch_size=FETCH_SIZE):
+        self.engine = get_engine(database_url)
+        self.cache = LRUCache(cache_bytes)
+        self.check_interval = check_interval
+        self.fetch_size = fetch_size
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._checked_at = None
+
+    def _read_versions(self):
+        with self.engine.connect() as connection:
+            rows = connection.execute(text("SELECT source, watermark, total_rows, updated_at FROM etl_metadata"))
+            return {row[0]: tuple(row[1:]) for row in rows}
+
+    def source_version(self, source):
+        """
+        Return the cached etl_metadata state of a source, refreshing it when
+        it is older than check_interval.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                versions = self._read_versions()
+                changed = {name for name in set(versions) | set(self._versions)
+                           if versions.get(name) != self._versions.get(name)}
+                if changed and self._checked_at is not None:
+                    self.cache.discard(lambda key: key[0] in changed)
+                self._versions = versions
+                self._checked_at = now
+            return self._versions.get(source)
+
+    def invalidate(self):
+        """
+        Drop every cached result and re-read etl_metadata on the next read.
+        """
+        with self._lock:
+            self._checked_at = None
+        self.cache.clear()
+
+    def read_chunks(self, name, start=None, end=None, keys=None):
+        """
+        Yield the rows of a range read as dicts of NumPy arrays, one per
+        fetched chunk, without caching them.
+        """
+        query = QUERIES[name]
+        params = {"start": start or MIN_TIME, "end": end or MAX_TIME}
+        sql = query.sql
+        if keys is not None:
+            if not query.key_column:
+                raise ValueError(f"{name} cannot be filtered by key")
+            sql, params["keys"] = query.keyed_sql, list(keys)
+
+        with self.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, max_row_buffer=self.fetch_size).execute(sql, params)
+            for rows in result.partitions(self.fetch_size):
+                yield _to_arrays(rows, query.columns)
+
+    def read(self, name, start=None, end=None, keys=None, format=None):
+        """
+        Return the rows of `name` (a QUERIES entry) with time in [start, end),
+        restricted to `keys` of its key column if given. format is "arrow" or
+        "numpy"; the default is Arrow when pyarrow is installed.
+        """
+        format = format or ("arrow" if pa is not None else "numpy")
+        if format == "arrow" and pa is None:
+            raise ImportError("pyarrow is required for format='arrow'")
+        query = QUERIES[name]
+        key = (query.source, name, start, end, tuple(keys) if keys is not None else None, format,
+               self.source_version(query.source))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        chunks = list(self.read_chunks(name, start, end, keys))
+        if chunks:
+            arrays = {column: np.concatenate([chunk[column] for chunk in chunks]) for column in query.columns}
+        else:
+            arrays = _to_arrays([], query.columns)
+        if format == "arrow":
+            result = pa.table({column: pa.array(array) for column, array in arrays.items()})
+        else:
+            for array in arrays.values():
+                array.flags.writeable = False
+            result = arrays
+        self.cache.put(key, result, _nbytes(result))
+        return result
+
+    def crypto_prices(self, symbols=None, start=None, end=None, interval="daily", format=None):
+        """
+        OHLC buckets of the given crypto symbols (all by default).
+        """
+        return self.read(f"crypto_ohlc_{interval}", start, end, symbols, format)
+
+    def gold_prices(self, start=None, end=None, interval="daily", format=None):
+        """
+        OHLC buckets of the gold spot price.
+        """
+        return self.read(f"gold_ohlc_{interval}", start, end, format=format)
+
+    def constituent_bars(self, symbols=None, start=None, end=None, format=None):
+        """
+        Daily bars of the given S&P 500 members (all by default).
+        """
+        return self.read("sp500_constituent_bars", start, end, symbols, format)
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_data_access(database_url=settings.DATABASE_URL):
+    """
+    Return the process-wide DataAccess for a database URL, so every reader
+    shares one cache.
+    """
+    with _readers_lock:
+        reader = _readers.get(database_url)
+        if reader is None:
+            reader = _readers[database_url] = DataAccess(database_url)
+        return reader
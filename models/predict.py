@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "models"))
+
+from preprocessing import FeatureStore
+from train_model import DEFAULT_MODEL_PATH
+
+RETURN_SUFFIX = "_ret_1d"
+
+
+class PredictionService:
+    """
+    Keeps the trained model and the latest feature row in memory and scores
+    every tracked asset with one matrix product.
+
+    refresh() is cheap when nothing changed: it only compares the model file's
+    mtime and the feature store's row count, and reads just the newest row
+    when the store has grown.
+    """
+    def __init__(self, store=None, model_path=DEFAULT_MODEL_PATH):
+        self.store = store or FeatureStore()
+        self.model_path = model_path
+        self._lock = threading.Lock()
+        self._model_mtime = None
+        self._rows = None
+        self.model = None
+        self.latest_date = None
+        self.latest_features = None
+        self.refresh()
+
+    def _load_model(self):
+        with np.load(self.model_path) as data:
+            model = {name: data[name] for name in data.files}
+        model["targets"] = [str(name) for name in model["targets"]]
+        model["assets"] = [name[:-len(RETURN_SUFFIX)] for name in model["targets"]]
+        model["asset_index"] = {asset: i for i, asset in enumerate(model["assets"])}
+        # Fold standardization into the weights: (x - mean) / std @ W = x @ W' + b.
+        model["scaled_weights"] = model["weights"] / model["std"][:, None]
+        model["bias"] = model["y_mean"] - (model["mean"] / model["std"]) @ model["weights"]
+        return model
+
+    def refresh(self, update_store=False):
+        """
+        Reload the model if it was retrained and the latest feature row if the
+        store has grown. With update_store=True the store is updated first.
+        """
+        if update_store:
+            self.store.update()
+
+        model_mtime = os.path.getmtime(self.model_path)
+        meta = self.store.read_meta()
+        with self._lock:
+            if model_mtime != self._model_mtime:
+                self.model = self._load_model()
+                self._model_mtime = model_mtime
+                self._rows = None
+            if meta is not None and meta["rows"] != self._rows:
+                dates, features, columns = self.store.load()
+                by_name = dict(zip(columns, features[-1]))
+                self.latest_features = np.array([by_name.get(str(name), np.nan) for name in self.model["columns"]])
+                self.latest_date = str(dates[-1])
+                self._rows = meta["rows"]
+
+    def predict(self, assets=None):
+        """
+        Return the predicted next-day log return for the requested assets (all by default).
+        """
+        with self._lock:
+            model = self.model
+            x = np.nan_to_num(self.latest_features - model["mean"]) + model["mean"]
+            predictions = x @ model["scaled_weights"] + model["bias"]
+            latest_date = self.latest_date
+
+        if assets:
+            unknown = [asset for asset in assets if asset not in model["asset_index"]]
+            if unknown:
+                raise KeyError(f"Unknown assets: {', '.join(unknown)}")
+            selected = {asset: float(predictions[model["asset_index"][asset]]) for asset in assets}
+        else:
+            selected = dict(zip(model["assets"], predictions.tolist()))
+        return {"as_of": latest_date, "predictions": selected}
+
+
+def make_handler(service):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/health":
+                self._send(200, {"status": "ok", "as_of": service.latest_date})
+            elif url.path == "/predict":
+                assets = [a for value in parse_qs(url.query).get("assets", []) for a in value.split(",") if a]
+                try:
+                    self._send(200, service.predict(assets or None))
+                except KeyError as e:
+                    self._send(404, {"error": str(e)})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return PredictionHandler
+
+
+def serve(service, host="127.0.0.1", port=8050, refresh_interval=300):
+    """
+    Serve predictions over HTTP, refreshing the model and features in the background.
+    """
+    def refresh_loop():
+        while True:
+            time.sleep(refresh_interval)
+            try:
+                service.refresh(update_store=True)
+            except Exception as e:
+                print(f"Error refreshing predictions: {e}")
+
+    threading.Thread(target=refresh_loop, daemon=True).start()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serving predictions on http://{host}:{port}/predict")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score tracked assets with the trained model.")
+    parser.add_argument("assets", nargs="*", help="Assets to score (default: all).")
+    parser.add_argument("--serve", action="store_true", help="Run the local HTTP endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--refresh-interval", type=int, default=300, help="Seconds between refreshes when serving.")
+    args = parser.parse_args()
+
+    service = PredictionService()
+    if args.serve:
+        serve(service, args.host, args.port, args.refresh_interval)
+        return
+
+    started = time.perf_counter()
+    result = service.predict(args.assets or None)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for asset, value in sorted(result["predictions"].items(), key=lambda item: -item[1]):
+        print(f"{asset:<30} {value:+.6f}")
+    print(f"Scored {len(result['predictions'])} assets as of {result['as_of']} in {elapsed_ms:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "etl"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "models"))
+
+from config import settings
+from data_access import get_data_access
+
+DEFAULT_STORE_DIR = os.environ.get("SIGNAL_FEATURE_DIR", os.path.join(ROOT_DIR, "data", "features"))
+
+# Days of history re-read before the last materialized date, so forward
+# fills and lag/return windows are seeded correctly on incremental runs.
+LOOKBACK_DAYS = 90
+
+# Trailing rows recomputed on every update, so late or revised source rows
+# (a day's news still being indexed, a restated yield) reach the store.
+REVISION_DAYS = 7
+
+RETURN_LAGS = [1, 2, 5]
+TOP_CRYPTO = 20
+
+# Daily series: name -> (data_access query, time column, value column).
+DAILY_SERIES = {
+    "sp500_close": ("sp500_index_data", "date", "close"),
+    "sp500_volume": ("sp500_index_data", "date", "volume"),
+    "gold_close": ("gold_ohlc_daily", "bucket", "close"),
+    "treasury_10y": ("treasury_yields", "date", "value"),
+    "fed_funds_rate": ("federal_funds_rate", "date", "value"),
+    "news_sentiment": ("news_sentiment", "time_published", "overall_sentiment_score"),  # Daily mean
+}
+
+CRYPTO_UNIVERSE_SQL = (
+    "SELECT symbol FROM ("
+    "  SELECT DISTINCT ON (id) id, symbol, cmc_rank FROM crypto_data"
+    "  WHERE last_updated >= now() - INTERVAL '2 days' ORDER BY id, last_updated DESC"
+    ") latest ORDER BY cmc_rank LIMIT :limit"
+)
+
+# Series whose returns are features; the rest get first differences.
+PRICE_SERIES = ["sp500_close", "gold_close"]
+RATE_SERIES = ["treasury_10y", "fed_funds_rate"]
+
+
+def _daily(times, values, how="last"):
+    series = pd.Series(values.astype("float64"), index=pd.DatetimeIndex(times).normalize())
+    return series.groupby(level=0).mean() if how == "mean" else series.groupby(level=0).last()
+
+
+def _read_series(data, start, crypto_symbols):
+    """
+    Read every source as a date-indexed Series through the shared read layer.
+    """
+    start = datetime.combine(start, datetime.min.time())
+    series = {}
+    for name, (query, time_column, value_column) in DAILY_SERIES.items():
+        arrays = data.read(query, start, format="numpy")
+        how = "mean" if name == "news_sentiment" else "last"
+        series[name] = _daily(arrays[time_column], arrays[value_column], how)
+
+    if crypto_symbols:
+        arrays = data.crypto_prices(list(crypto_symbols), start, format="numpy")
+        for symbol in crypto_symbols:
+            selected = arrays["symbol"] == symbol
+            if selected.any():
+                series[f"crypto_{symbol}_close"] = _daily(arrays["bucket"][selected], arrays["close"][selected])
+    return series
+
+
+def build_features(series, calendar):
+    """
+    Align every series on a daily calendar as of each date (levels forward
+    filled) and add return, lag and difference features. Returns and
+    differences are taken between consecutive observations and set only on
+    the dates a series was observed, so a filled weekend or holiday is NaN
+    rather than a zero move, and lags count observations, not calendar days.
+    """
+    aligned = pd.DataFrame(index=calendar)
+    for name, values in series.items():
+        aligned[name] = values.sort_index().reindex(calendar, method="ffill")
+
+    features = aligned.copy()
+    price_columns = PRICE_SERIES + [name for name in aligned if name.startswith("crypto_")]
+    for name in price_columns:
+        if name not in aligned:
+            continue
+        log_price = np.log(series[name].sort_index().dropna())
+        log_return = log_price.diff()
+        features[f"{name}_ret_1d"] = log_return.reindex(calendar)
+        features[f"{name}_ret_5d"] = log_price.diff(5).reindex(calendar)
+        for lag in RETURN_LAGS:
+            features[f"{name}_ret_1d_lag{lag}"] = log_return.shift(lag).reindex(calendar)
+    for name in RATE_SERIES:
+        features[f"{name}_diff_1d"] = series[name].sort_index().dropna().diff().reindex(calendar)
+    features["news_sentiment_7d"] = aligned["news_sentiment"].rolling(7, min_periods=1).mean()
+    return features.astype("float64")
+
+
+class FeatureStore:
+    """
+    Daily cross-asset feature matrix materialized as memory-mappable files.
+
+    features.f64 holds float64 rows (one per date, row-major), dates.i8 the
+    matching datetime64[D] values, and meta.json the column names and row
+    count. Incremental updates rewrite the last REVISION_DAYS rows in place
+    and append the dates after them.
+    """
+    def __init__(self, path=DEFAULT_STORE_DIR, database_url=settings.DATABASE_URL, top_crypto=TOP_CRYPTO):
+        self.path = path
+        self.database_url = database_url
+        self.top_crypto = top_crypto
+        self.features_path = os.path.join(path, "features.f64")
+        self.dates_path = os.path.join(path, "dates.i8")
+        self.meta_path = os.path.join(path, "meta.json")
+
+    def read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self, meta):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _truncate_to(self, meta):
+        """
+        Drop bytes beyond the committed row count, left by an interrupted append.
+        """
+        for file_path, row_bytes in ((self.features_path, 8 * len(meta["columns"])), (self.dates_path, 8)):
+            if os.path.exists(file_path) and os.path.getsize(file_path) > meta["rows"] * row_bytes:
+                with open(file_path, "r+b") as f:
+                    f.truncate(meta["rows"] * row_bytes)
+
+    def load(self):
+        """
+        Return (dates, features, columns); features is a read-only memmap.
+        """
+        meta = self.read_meta()
+        if meta is None or meta["rows"] == 0:
+            return np.array([], dtype="datetime64[D]"), np.empty((0, 0)), []
+        shape = (meta["rows"], len(meta["columns"]))
+        features = np.memmap(self.features_path, dtype=np.float64, mode="r", shape=shape)
+        dates = np.memmap(self.dates_path, dtype=np.int64, mode="r", shape=(meta["rows"],)).view("datetime64[D]")
+        return dates, features, meta["columns"]
+
+    def update(self, until=None):
+        """
+        Recompute the feature rows of the last REVISION_DAYS stored dates and
+        append rows for every complete day after them. Returns the number of
+        rows appended.
+        """
+        until = until or date.today() - timedelta(days=1)
+        meta = self.read_meta()
+        kept = 0
+        if meta is not None:
+            self._truncate_to(meta)
+            last_date = date.fromisoformat(meta["last_date"])
+            until = max(until, last_date)
+            revise_from = last_date - timedelta(days=REVISION_DAYS - 1)
+            kept = int(np.searchsorted(self.load()[0], np.datetime64(revise_from, "D")))
+            start = revise_from - timedelta(days=LOOKBACK_DAYS)
+        else:
+            revise_from = None
+            start = date(1900, 1, 1)
+
+        data = get_data_access(self.database_url)
+        if meta:
+            crypto_symbols = meta["crypto_symbols"]
+        else:
+            with data.engine.connect() as connection:
+                crypto_symbols = [
+                    row[0] for row in connection.execute(text(CRYPTO_UNIVERSE_SQL), {"limit": self.top_crypto})
+                ]
+        series = _read_series(data, start, crypto_symbols)
+
+        observed = [values.index.min() for values in series.values() if not values.empty]
+        if not observed:
+            return 0
+        calendar = pd.date_range(max(min(observed), pd.Timestamp(start)), pd.Timestamp(until), freq="D")
+        features = build_features(series, calendar)
+        if revise_from is not None:
+            features = features[features.index >= pd.Timestamp(revise_from)]
+            features = features.reindex(columns=meta["columns"])
+        if features.empty:
+            return 0
+
+        # Rows from `kept` on are overwritten in place; meta.json still
+        # describes the old rows until the new ones are written, and a rewrite
+        # interrupted halfway leaves recomputed values for the same dates.
+        os.makedirs(self.path, exist_ok=True)
+        for file_path, row_bytes, values in (
+            (self.features_path, 8 * features.shape[1], features.to_numpy(dtype=np.float64)),
+            (self.dates_path, 8, features.index.to_numpy().astype("datetime64[D]").astype(np.int64)),
+        ):
+            with open(file_path, "r+b" if os.path.exists(file_path) else "wb") as f:
+                f.seek(kept * row_bytes)
+                f.write(np.ascontiguousarray(values).tobytes())
+                f.truncate()
+
+        rows = kept + len(features)
+        self._write_meta({
+            "columns": list(features.columns),
+            "crypto_symbols": list(crypto_symbols),
+            "rows": rows,
+            "last_date": features.index[-1].date().isoformat(),
+        })
+        return rows - (meta["rows"] if meta else 0)
+
+
+def main():
+    store = FeatureStore()
+    appended = store.update()
+    meta = store.read_meta()
+    print(f"Appended {appended} rows; feature store has {meta['rows'] if meta else 0} rows.")
+
+
+if __name__ == "__main__":
+    main()
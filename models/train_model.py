@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "models"))
+
+from preprocessing import FeatureStore
+
+DEFAULT_MODEL_PATH = os.environ.get("SIGNAL_MODEL_PATH", os.path.join(ROOT_DIR, "data", "models", "ridge.npz"))
+
+DEFAULT_ALPHAS = [0.1, 1.0, 10.0, 100.0, 1000.0]
+TRAIN_SIZE = 750     # days in each rolling training window
+TEST_SIZE = 60       # days scored after each training window
+
+# Feature matrix shared by the worker processes, opened once per worker.
+_features = None
+
+
+def _init_worker(features_path, shape):
+    global _features
+    _features = np.memmap(features_path, dtype=np.float64, mode="r", shape=tuple(shape))
+
+
+def target_columns(columns):
+    """
+    Indices of the columns predicted one day ahead: every 1-day return.
+    """
+    return [i for i, name in enumerate(columns) if name.endswith("_ret_1d")]
+
+
+def split_xy(features, start, stop, target_idx):
+    """
+    Features for days [start, stop) and the next day's returns as targets.
+    """
+    return features[start:stop], features[start + 1:stop + 1][:, target_idx]
+
+
+def fit_ridge(X, Y, alpha):
+    """
+    Closed-form multi-target ridge regression on standardized features.
+    Missing features are imputed with the training mean and missing targets
+    with the training mean return.
+    """
+    mean = np.nanmean(X, axis=0)
+    std = np.nanstd(X, axis=0)
+    mean = np.where(np.isnan(mean), 0.0, mean)
+    std = np.where(np.isnan(std) | (std == 0), 1.0, std)
+    Xs = np.nan_to_num((X - mean) / std)
+
+    y_mean = np.nan_to_num(np.nanmean(Y, axis=0))
+    Yc = np.where(np.isnan(Y), 0.0, Y - y_mean)
+    gram = Xs.T @ Xs + alpha * np.eye(Xs.shape[1])
+    weights = np.linalg.solve(gram, Xs.T @ Yc)
+    return {"weights": weights, "mean": mean, "std": std, "y_mean": y_mean, "alpha": alpha}
+
+
+def predict(model, X):
+    Xs = np.nan_to_num((X - model["mean"]) / model["std"])
+    return Xs @ model["weights"] + model["y_mean"]
+
+
+def score(Y_true, Y_pred):
+    mask = ~np.isnan(Y_true)
+    errors = (Y_pred - np.nan_to_num(Y_true))[mask]
+    hits = (np.sign(Y_pred) == np.sign(np.nan_to_num(Y_true)))[mask]
+    return {
+        "mse": float(np.mean(errors ** 2)) if errors.size else float("nan"),
+        "hit_rate": float(np.mean(hits)) if hits.size else float("nan"),
+    }
+
+
+def _run_fold(task):
+    """
+    Train and score one (fold, alpha) candidate against the shared features.
+    """
+    fold, train_start, test_start, test_stop, alpha, target_idx = task
+    started = time.perf_counter()
+    X_train, Y_train = split_xy(_features, train_start, test_start, target_idx)
+    model = fit_ridge(X_train, Y_train, alpha)
+    fit_seconds = time.perf_counter() - started
+
+    X_test, Y_test = split_xy(_features, test_start, test_stop, target_idx)
+    metrics = score(Y_test, predict(model, X_test))
+    return {
+        "fold": fold, "alpha": alpha, "train_start": train_start, "test_start": test_start,
+        "test_stop": test_stop, "fit_seconds": fit_seconds,
+        "seconds": time.perf_counter() - started, **metrics,
+    }
+
+
+def walk_forward_folds(rows, train_size=TRAIN_SIZE, test_size=TEST_SIZE):
+    """
+    (train_start, test_start, test_stop) for rolling windows over the rows.
+    The last row has no next-day target, so it is never scored.
+    """
+    folds = []
+    test_start = train_size
+    while test_start + 1 < rows:
+        test_stop = min(test_start + test_size, rows - 1)
+        folds.append((test_start - train_size, test_start, test_stop))
+        test_start = test_stop
+    return folds
+
+
+def run_walk_forward(store, alphas=DEFAULT_ALPHAS, train_size=TRAIN_SIZE, test_size=TEST_SIZE, max_workers=None):
+    """
+    Fan every (fold, alpha) candidate out over a process pool. Workers
+    memory-map the feature store instead of receiving pickled data.
+    Returns (per-candidate results, best alpha).
+    """
+    meta = store.read_meta()
+    if meta is None:
+        raise ValueError("Feature store is empty; run preprocessing first.")
+    shape = (meta["rows"], len(meta["columns"]))
+    target_idx = target_columns(meta["columns"])
+
+    tasks = [
+        (fold, train_start, test_start, test_stop, alpha, target_idx)
+        for fold, (train_start, test_start, test_stop) in enumerate(walk_forward_folds(shape[0], train_size, test_size))
+        for alpha in alphas
+    ]
+    if not tasks:
+        raise ValueError(f"Need more than {train_size} rows for walk-forward validation, have {shape[0]}.")
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                             initializer=_init_worker, initargs=(store.features_path, shape)) as executor:
+        results = list(executor.map(_run_fold, tasks))
+
+    mean_mse = {alpha: np.nanmean([r["mse"] for r in results if r["alpha"] == alpha]) for alpha in alphas}
+    return results, min(mean_mse, key=mean_mse.get)
+
+
+def train_final_model(store, alpha, train_size=TRAIN_SIZE, path=DEFAULT_MODEL_PATH):
+    """
+    Fit the chosen alpha on the latest training window and save it.
+    """
+    _, features, columns = store.load()
+    target_idx = target_columns(columns)
+    start = max(0, len(features) - 1 - train_size)
+    X, Y = split_xy(features, start, len(features) - 1, target_idx)
+    model = fit_ridge(X, Y, alpha)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(
+        path, weights=model["weights"], mean=model["mean"], std=model["std"], y_mean=model["y_mean"],
+        alpha=alpha, columns=np.array(columns), targets=np.array([columns[i] for i in target_idx]),
+        trained_rows=len(features),
+    )
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward ridge training over the feature store.")
+    parser.add_argument("--alphas", type=float, nargs="+", default=DEFAULT_ALPHAS)
+    parser.add_argument("--train-size", type=int, default=TRAIN_SIZE)
+    parser.add_argument("--test-size", type=int, default=TEST_SIZE)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores).")
+    parser.add_argument("--report", help="Write the per-fold results to this JSON file.")
+    args = parser.parse_args()
+
+    store = FeatureStore()
+    started = time.perf_counter()
+    results, best_alpha = run_walk_forward(store, args.alphas, args.train_size, args.test_size, args.workers)
+    for r in sorted(results, key=lambda r: (r["fold"], r["alpha"])):
+        print(f"fold {r['fold']:>3} alpha {r['alpha']:>8g} mse {r['mse']:.6g} "
+              f"hit {r['hit_rate']:.3f} fit {r['fit_seconds']:.3f}s total {r['seconds']:.3f}s")
+    print(f"{len(results)} candidates in {time.perf_counter() - started:.2f}s; best alpha {best_alpha:g}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"best_alpha": best_alpha, "results": results}, f, indent=2)
+
+    train_final_model(store, best_alpha, args.train_size)
+    print(f"Saved model to {DEFAULT_MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "etl"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+
+from config import settings
+import instrumentation
+from quota import get_quota
+from run_etl import build_jobs
+
+CHECKPOINT_TABLE = "etl_backfill_chunks"
+
+
+def date_chunks(start, end, days):
+    """
+    Split the dates [start, end) into consecutive ranges of at most `days` days.
+    """
+    while start < end:
+        chunk_end = min(start + timedelta(days=days), end)
+        yield start, chunk_end
+        start = chunk_end
+
+
+class BackfillCheckpoints:
+    """
+    Backfill chunks per source and their outcome, kept in etl_backfill_chunks
+    so an interrupted backfill resumes with the chunks it had not finished.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+
+    def completed(self, source, start, end):
+        """
+        Return the (chunk_start, chunk_end) pairs already loaded within [start, end).
+        """
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    f"SELECT chunk_start, chunk_end FROM {CHECKPOINT_TABLE} "
+                    "WHERE source = :source AND status = 'done' AND chunk_start >= :start AND chunk_end <= :end"
+                ),
+                {"source": source, "start": start, "end": end},
+            ).all()
+        return {(row.chunk_start, row.chunk_end) for row in rows}
+
+    def record(self, source, chunk, status, rows_inserted=0):
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"INSERT INTO {CHECKPOINT_TABLE} (source, chunk_start, chunk_end, status, rows_inserted, updated_at) "
+                    "VALUES (:source, :chunk_start, :chunk_end, :status, :rows_inserted, CURRENT_TIMESTAMP) "
+                    "ON CONFLICT (source, chunk_start, chunk_end) DO UPDATE SET "
+                    "status = EXCLUDED.status, rows_inserted = EXCLUDED.rows_inserted, "
+                    "updated_at = EXCLUDED.updated_at"
+                ),
+                {"source": source, "chunk_start": chunk[0], "chunk_end": chunk[1], "status": status,
+                 "rows_inserted": rows_inserted},
+            )
+
+
+class Backfill:
+    """
+    Load a job's history over a date range, one chunk at a time.
+
+    Chunks flow through a generator pipeline: worker threads fetch and process
+    up to `workers` chunks at once, waiting on the provider's quota before
+    every request, and at most 2 * workers processed chunks are held in
+    memory. The caller's thread loads them in date order, each chunk with one
+    upsert transaction, and checkpoints it, so a rerun over the same range
+    skips what was already loaded.
+
+    Sources whose API has no date range (see ETLProcessor.chunk_requests)
+    are fetched once in full and the processed history is split into chunks.
+    """
+    def __init__(self, job, database_url=settings.DATABASE_URL, chunk_days=None, workers=None, quota=None):
+        if job.per_symbol:
+            raise ValueError(f"{job.name} already loads each new symbol's full history when it runs")
+        self.job = job
+        self.processor = job.processor_cls(database_url, job.table_name, **job.options)
+        if self.processor.watermark_column is None:
+            raise ValueError(f"{job.name} has no time column to backfill by")
+        self.chunk_days = chunk_days or self.processor.backfill_chunk_days
+        self.workers = workers or settings.PROVIDER_CONCURRENCY.get(job.provider, 1)
+        if quota is None:
+            quota = get_quota(job.provider, *settings.PROVIDER_QUOTAS.get(job.provider, (None, None)))
+        self.quota = quota
+        self.checkpoints = BackfillCheckpoints(self.processor.engine)
+
+    def _fetch(self, url, parameters):
+        self.quota.acquire(self.job.calls)
+        with instrumentation.stage("fetch"):
+            raw_data = self.processor.fetch_data(url, parameters, self.job.headers)
+        if raw_data:
+            self.processor.archive.store(self.job.table_name, raw_data)
+        return raw_data
+
+    def _within(self, df, start, end):
+        times = pd.to_datetime(df[self.processor.watermark_column])
+        return df[(times >= pd.Timestamp(start)) & (times < pd.Timestamp(end))]
+
+    def _extract_chunk(self, chunk):
+        """
+        Fetch and process one chunk on a worker thread. The frame is None if
+        any of its requests failed.
+        """
+        frames = []
+        for url, parameters in self.processor.chunk_requests(self.job.url, self.job.parameters, *chunk):
+            raw_data = self._fetch(url, parameters)
+            if not raw_data:
+                return chunk, None
+            with instrumentation.stage("process"):
+                frames.append(self.processor.process_data(raw_data))
+        df = pd.concat(frames, ignore_index=True)
+        return chunk, self._within(df, *chunk)
+
+    def _split_history(self, chunks):
+        url, parameters = self.processor.incremental_request(self.job.url, self.job.parameters, None)
+        raw_data = self._fetch(url, parameters)
+        if not raw_data:
+            for chunk in chunks:
+                yield chunk, None
+            return
+
+        with instrumentation.stage("process"):
+            df = self.processor.process_data(raw_data)
+            del raw_data
+            times = pd.to_datetime(df[self.processor.watermark_column]).to_numpy()
+            order = np.argsort(times, kind="stable")
+            df, times = df.iloc[order], times[order]
+        for start, end in chunks:
+            lo, hi = np.searchsorted(times, [np.datetime64(start), np.datetime64(end)])
+            yield (start, end), df.iloc[lo:hi]
+
+    def chunk_frames(self, chunks):
+        """
+        Yield (chunk, processed frame or None) for each chunk, in order.
+        """
+        if self.processor.chunk_requests(self.job.url, self.job.parameters, *chunks[0]) is None:
+            yield from self._split_history(chunks)
+            return
+
+        extract = instrumentation.bind(self._extract_chunk)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(extract, chunk))
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def run(self, start, end, profile_dir=None):
+        """
+        Backfill the dates [start, end) and return a summary of the chunks.
+        Failed chunks are checkpointed as such and retried by the next run.
+        """
+        source = self.job.table_name
+        all_chunks = list(date_chunks(start, end, self.chunk_days))
+        done = self.checkpoints.completed(source, start, end)
+        chunks = [chunk for chunk in all_chunks if chunk not in done]
+        summary = {"job": self.job.name, "chunks": len(all_chunks), "resumed": len(all_chunks) - len(chunks),
+                   "loaded": 0, "failed": 0, "inserted": 0}
+        if not chunks:
+            print(f"{self.job.name}: every chunk from {start} to {end} is already loaded.")
+            return summary
+
+        with instrumentation.track_run(self.processor.engine, source, profile_dir) as run:
+            for chunk, df in self.chunk_frames(chunks):
+                if df is None:
+                    result = None
+                elif df.empty:
+                    result = 0, 0
+                else:
+                    result = self.processor.load_frame(df)
+
+                if result is None:
+                    self.checkpoints.record(source, chunk, "failed")
+                    summary["failed"] += 1
+                    print(f"{self.job.name}: chunk {chunk[0]} to {chunk[1]} failed; it is retried on the next run.")
+                else:
+                    self.checkpoints.record(source, chunk, "done", result[0])
+                    summary["loaded"] += 1
+                    summary["inserted"] += result[0]
+                    print(f"{self.job.name}: chunk {chunk[0]} to {chunk[1]} loaded, {result[0]} new rows.")
+            if summary["failed"]:
+                run.status = "load_failed"
+        return summary
+
+
+def main():
+    jobs = {job.name: job for job in build_jobs()}
+    parser = argparse.ArgumentParser(
+        description="Backfill a job's history in date chunks. Rerun with the same range and "
+                    "--chunk-days to resume an interrupted backfill."
+    )
+    parser.add_argument("job", choices=sorted(jobs))
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First date (YYYY-MM-DD).")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today(),
+                        help="Day after the last date (default: today).")
+    parser.add_argument("--chunk-days", type=int, help="Days per chunk (default: per source).")
+    parser.add_argument("--workers", type=int,
+                        help="Chunks fetched in parallel (default: the provider's concurrency limit).")
+    parser.add_argument("--profile", metavar="DIR", help="Write a cProfile .prof file per stage to this directory.")
+    args = parser.parse_args()
+
+    if args.start >= args.end:
+        parser.error("--start must be before --end")
+    try:
+        backfill = Backfill(jobs[args.job], chunk_days=args.chunk_days, workers=args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    summary = backfill.run(args.start, args.end, profile_dir=args.profile)
+    print(f"{summary['job']}: {summary['loaded']} chunks loaded, {summary['resumed']} already done, "
+          f"{summary['failed']} failed, {summary['inserted']} new rows in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
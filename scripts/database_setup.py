@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+
+from sqlalchemy import text
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "etl"))
+
+from config import settings
+from registry import get_engine
+
+SCHEMA_PATH = os.path.join(ROOT_DIR, "database", "schema.sql")
+
+# Append-only snapshot tables partitioned by month.
+PARTITIONED_TABLES = ["crypto_data", "gold_price_history"]
+
+
+def create_schema(engine, schema_path=SCHEMA_PATH):
+    """
+    Create every table, index and maintenance function from schema.sql.
+    """
+    with open(schema_path, encoding="utf-8") as f:
+        sql = f.read()
+    connection = engine.raw_connection()
+    try:
+        connection.cursor().execute(sql)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def maintain_partitions(engine, months_ahead=3, keep_months=None, drop_detached=False):
+    """
+    Create upcoming monthly partitions and, if keep_months is set, detach the
+    partitions older than that. Returns the names of detached partitions.
+    """
+    detached = []
+    with engine.begin() as connection:
+        for table in PARTITIONED_TABLES:
+            connection.execute(
+                text("SELECT create_monthly_partitions(:table, :months_ahead)"),
+                {"table": table, "months_ahead": months_ahead},
+            )
+            if keep_months is not None:
+                detached += connection.execute(
+                    text("SELECT detach_old_partitions(:table, :keep_months, :drop_detached)"),
+                    {"table": table, "keep_months": keep_months, "drop_detached": drop_detached},
+                ).scalars().all()
+    return detached
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or maintain the Signal database.")
+    parser.add_argument("--create", action="store_true", help="Create the schema from database/schema.sql.")
+    parser.add_argument("--months-ahead", type=int, default=3, help="Monthly partitions to create ahead.")
+    parser.add_argument("--keep-months", type=int, help="Detach partitions older than this many months.")
+    parser.add_argument("--drop", action="store_true", help="Drop detached partitions instead of keeping them.")
+    args = parser.parse_args()
+
+    engine = get_engine(settings.DATABASE_URL)
+    if args.create:
+        create_schema(engine)
+        print("Schema created.")
+
+    detached = maintain_partitions(engine, args.months_ahead, args.keep_months, args.drop)
+    for name in detached:
+        print(f"Detached {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+# First day of every simulated daily history.
+HISTORY_START = date(2000, 1, 1)
+
+# Simulated crypto prices start here, the top coin at CRYPTO_START_PRICE.
+CRYPTO_HISTORY_START = date(2020, 1, 1)
+CRYPTO_START_PRICE = 50000.0
+
+# Largest page each provider serves.
+CMC_MAX_PAGE_SIZE = 5000
+NEWS_MAX_LIMIT = 1000
+COMPACT_BARS = 100
+
+# Quotas enforced by default: (calls per minute, calls per day), as on the free plans.
+DEFAULT_QUOTAS = {
+    "alpha_vantage": (5, 25),
+    "coinmarketcap": (30, 333),
+    "goldapi": (10, None),
+}
+
+CRYPTO_SYMBOLS = ["BTC", "ETH", "USDT", "BNB", "SOL", "XRP", "USDC", "ADA", "DOGE", "TRX"]
+GICS_SECTORS = [
+    "Communication Services", "Consumer Discretionary", "Consumer Staples", "Energy", "Financials",
+    "Health Care", "Industrials", "Information Technology", "Materials", "Real Estate", "Utilities",
+]
+ERROR_STATUSES = [500, 502, 503, 504]
+
+AV_NOTE = ("Thank you for using Alpha Vantage! Our standard API rate limit is {per_minute} requests per "
+           "minute. Please subscribe to any of the premium plans to instantly remove all rate limits.")
+AV_INFORMATION = ("Thank you for using Alpha Vantage! Our standard API rate limit is {per_day} requests per "
+                  "day. Please subscribe to any of the premium plans to instantly remove all daily rate limits.")
+
+
+def _seed(*parts):
+    return zlib.crc32("|".join(map(str, parts)).encode("utf-8"))
+
+
+@lru_cache(maxsize=2048)
+def _daily_path(key, today, start_price, volatility, drift=0.0):
+    """
+    Deterministic daily closes of one series from HISTORY_START to today, so
+    repeated requests agree and reloads only add the new days.
+    """
+    days = (today - HISTORY_START).days + 1
+    rng = np.random.default_rng(_seed("daily", key))
+    steps = rng.normal(drift, volatility, days)
+    closes = start_price * np.exp(np.cumsum(steps))
+    closes.flags.writeable = False
+    return closes
+
+
+@lru_cache(maxsize=2)
+def _crypto_levels(today, count):
+    """
+    Yesterday's and today's log-price levels of every listed coin, walked
+    from CRYPTO_HISTORY_START with one draw per day so they are deterministic
+    and continuous from day to day.
+    """
+    previous = level = np.zeros(count)
+    for i in range((today - CRYPTO_HISTORY_START).days + 1):
+        rng = np.random.default_rng(_seed("crypto", CRYPTO_HISTORY_START + timedelta(days=i)))
+        previous, level = level, level + rng.normal(0.0, 0.03, count)
+    return previous, level
+
+
+@lru_cache(maxsize=4)
+def _crypto_quotes(today, bucket, count):
+    """
+    Prices and 1h / 24h percent changes of every coin in one tick bucket.
+    """
+    previous, level = _crypto_levels(today, count)
+    base = np.log(CRYPTO_START_PRICE / np.arange(1, count + 1) ** 1.5)
+    tick = np.random.default_rng(_seed("tick", "crypto", bucket)).normal(0.0, 0.002, count)
+    prices = np.exp(base + level + tick)
+    return prices, 100 * np.expm1(tick), 100 * np.expm1(level - previous + tick)
+
+
+def _noise(key, bucket, scale):
+    return float(np.random.default_rng(_seed("tick", key, bucket)).normal(0.0, scale))
+
+
+class RollingLimit:
+    """
+    Per-minute and per-day call limits of one simulated API key, counted
+    over sliding windows like the providers do.
+    """
+    def __init__(self, per_minute=None, per_day=None):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self._minute = deque()
+        self._day = deque()
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        Count one call. Returns None when it is allowed, otherwise "minute"
+        or "day" for the limit it exceeds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._minute and now - self._minute[0] >= 60:
+                self._minute.popleft()
+            while self._day and now - self._day[0] >= 86400:
+                self._day.popleft()
+            if self.per_day and len(self._day) >= self.per_day:
+                return "day"
+            if self.per_minute and len(self._minute) >= self.per_minute:
+                return "minute"
+            self._minute.append(now)
+            self._day.append(now)
+            return None
+
+
+class ProviderSimulator:
+    """
+    Local stand-in for the CoinMarketCap, GoldAPI and Alpha Vantage endpoints.
+
+    Responses have the providers' shapes and are generated deterministically
+    from the request, so repeated runs load the same history. Every request
+    waits a log-normal latency (median latency_ms, tail set by
+    latency_sigma), fails with a 5xx status with probability error_rate, and
+    is counted against the provider's quota; throttled calls get the
+    provider's own answer (an Alpha Vantage "Note" or "Information" body, a
+    CoinMarketCap or GoldAPI 429).
+    """
+    def __init__(self, latency_ms=50.0, latency_sigma=0.5, error_rate=0.0, quotas=None, crypto_count=5000,
+                 constituent_count=500, news_per_hour=2, tick_seconds=60, seed=0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.limits = {provider: RollingLimit(*limits) for provider, limits in (quotas or {}).items()}
+        self.crypto_count = crypto_count
+        self.constituent_count = constituent_count
+        self.news_per_hour = news_per_hour
+        self.tick_seconds = tick_seconds
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def _count(self, *keys):
+        with self._lock:
+            for key in keys:
+                self.stats[key] += 1
+
+    def _draw(self):
+        with self._lock:
+            return self._random.lognormvariate(0.0, self.latency_sigma), self._random.random()
+
+    def _bucket(self, now):
+        return int(now.timestamp() // self.tick_seconds)
+
+    def constituents(self):
+        """
+        Index members: a few real tickers, then generated ones.
+        """
+        real = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "BRK.B", "LLY", "AVGO", "JPM"]
+        symbols = real[:self.constituent_count]
+        symbols += [f"SIM{i:03d}" for i in range(self.constituent_count - len(symbols))]
+        return [(symbol, f"{symbol} Simulated Inc.", GICS_SECTORS[_seed(symbol) % len(GICS_SECTORS)])
+                for symbol in symbols]
+
+    # CoinMarketCap
+
+    def crypto_listings(self, query, now):
+        try:
+            start = int(query.get("start", 1))
+            limit = int(query.get("limit", 100))
+        except ValueError:
+            return 400, {"status": {"error_code": 400, "error_message": "Invalid value for \"start\" or \"limit\""}}
+        if start < 1 or not 1 <= limit <= CMC_MAX_PAGE_SIZE:
+            return 400, {"status": {"error_code": 400,
+                                    "error_message": f"\"limit\" must be between 1 and {CMC_MAX_PAGE_SIZE}"}}
+
+        bucket = self._bucket(now)
+        last_updated = datetime.fromtimestamp(bucket * self.tick_seconds, timezone.utc)
+        stamp = last_updated.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        prices, change_1h, change_24h = _crypto_quotes(last_updated.date(), bucket, self.crypto_count)
+        data = []
+        for rank in range(start, min(start + limit, self.crypto_count + 1)):
+            symbol = CRYPTO_SYMBOLS[rank - 1] if rank <= len(CRYPTO_SYMBOLS) else f"SIM{rank}"
+            price = float(prices[rank - 1])
+            supply = 1e9 / CRYPTO_START_PRICE * rank ** 1.5
+            data.append({
+                "id": rank, "name": f"{symbol} Coin", "symbol": symbol, "slug": symbol.lower(), "cmc_rank": rank,
+                "circulating_supply": supply, "total_supply": supply, "max_supply": 2 * supply,
+                "last_updated": stamp,
+                "quote": {"USD": {
+                    "price": price, "volume_24h": 0.05 * price * supply, "market_cap": price * supply,
+                    "market_cap_dominance": 50.0 / rank, "percent_change_1h": float(change_1h[rank - 1]),
+                    "percent_change_24h": float(change_24h[rank - 1]),
+                    "percent_change_7d": float(change_24h[rank - 1]) * 2.6, "last_updated": stamp,
+                }},
+            })
+        status = {"timestamp": now.strftime("%Y-%m-%dT%H:%M:%S.000Z"), "error_code": 0, "error_message": None,
+                  "elapsed": 10, "credit_count": 1 + len(data) // 200, "total_count": self.crypto_count}
+        return 200, {"status": status, "data": data}
+
+    # GoldAPI
+
+    def gold_price(self, day, now):
+        today = now.date()
+        if day is not None:
+            if not HISTORY_START <= day <= today:
+                return 400, {"error": "Invalid date"}
+            closes = _daily_path("gold", today, 280.0, 0.01, 0.0003)
+            index = (day - HISTORY_START).days
+            price = float(closes[index])
+            timestamp = int(datetime.combine(day, datetime.min.time(), timezone.utc).timestamp()) + 86399
+        else:
+            bucket = self._bucket(now)
+            closes = _daily_path("gold", today, 280.0, 0.01, 0.0003)
+            index = len(closes) - 1
+            price = float(closes[-1] * np.exp(_noise("gold", bucket, 0.001)))
+            timestamp = bucket * self.tick_seconds
+        previous = float(closes[index - 1]) if index else price
+        spread = 0.0002 * price
+        return 200, {
+            "timestamp": timestamp, "metal": "XAU", "currency": "USD", "exchange": "FOREXCOM", "symbol": "FOREXCOM:XAUUSD",
+            "prev_close_price": previous, "open_price": previous, "low_price": min(previous, price) * 0.997,
+            "high_price": max(previous, price) * 1.003, "open_time": timestamp - timestamp % 86400, "price": price,
+            "ch": price - previous, "chp": 100 * (price - previous) / previous, "ask": price + spread,
+            "bid": price - spread, "price_gram_24k": price / 31.1035,
+        }
+
+    # Alpha Vantage
+
+    def time_series_daily(self, query, now):
+        symbol = query.get("symbol", "").upper()
+        if not symbol:
+            return 200, {"Error Message": "Invalid API call. Please retry or visit the documentation for TIME_SERIES_DAILY."}
+        today = now.date()
+        closes = _daily_path(f"stock:{symbol}", today, 20.0 + _seed(symbol) % 400, 0.015)
+        trading = np.is_busday(np.datetime64(HISTORY_START, "D") + np.arange(len(closes)))
+        indices = np.flatnonzero(trading)[::-1]
+        compact = query.get("outputsize", "compact") != "full"
+        if compact:
+            indices = indices[:COMPACT_BARS]
+
+        series = {}
+        for i in indices.tolist():
+            close = closes[i]
+            previous = closes[i - 1] if i else close
+            spread = abs(_noise(symbol, i, 0.01)) * close
+            series[str(HISTORY_START + timedelta(days=i))] = {
+                "1. open": f"{previous:.4f}", "2. high": f"{max(previous, close) + spread:.4f}",
+                "3. low": f"{min(previous, close) - spread:.4f}", "4. close": f"{close:.4f}",
+                "5. volume": str(1000000 + _seed(symbol, i) % 50000000),
+            }
+        meta = {
+            "1. Information": "Daily Prices (open, high, low, close) and Volumes", "2. Symbol": symbol,
+            "3. Last Refreshed": next(iter(series), str(today)), "4. Output Size": "Compact" if compact else "Full size",
+            "5. Time Zone": "US/Eastern",
+        }
+        return 200, {"Meta Data": meta, "Time Series (Daily)": series}
+
+    def economic_series(self, function, name, unit, start_value, volatility, now):
+        today = now.date()
+        values = _daily_path(function, today, start_value, volatility)
+        data = []
+        for i in range(len(values) - 1, -1, -1):
+            day = HISTORY_START + timedelta(days=i)
+            if day.weekday() >= 5:
+                continue
+            # Market holidays are published with a "." value.
+            value = "." if _seed(function, i) % 50 == 0 else f"{values[i]:.2f}"
+            data.append({"date": str(day), "value": value})
+        return 200, {"name": name, "interval": "daily", "unit": unit, "data": data}
+
+    def news_sentiment(self, query, now):
+        try:
+            time_from = datetime.strptime(query["time_from"][:13], "%Y%m%dT%H%M") if "time_from" in query else None
+            time_to = datetime.strptime(query["time_to"][:13], "%Y%m%dT%H%M") if "time_to" in query else None
+            limit = int(query.get("limit", 50))
+        except ValueError:
+            return 200, {"Information": "Invalid inputs. Please refer to the API documentation for NEWS_SENTIMENT."}
+        limit = min(limit, NEWS_MAX_LIMIT)
+        now = now.replace(tzinfo=None)
+        time_to = min(time_to or now, now)
+        time_from = time_from or time_to - timedelta(days=3)
+        subject = query.get("tickers") or query.get("topics") or "market"
+        tickers = [ticker for ticker in query.get("tickers", "").split(",") if ticker] or ["CRYPTO:BTC"]
+        topics = [topic for topic in query.get("topics", "").split(",") if topic] or ["financial_markets"]
+
+        hours = int((time_to - time_from).total_seconds() // 3600) + 1
+        first_hour = time_from.replace(minute=0, second=0, microsecond=0)
+        order = range(hours) if query.get("sort") == "EARLIEST" else range(hours - 1, -1, -1)
+        feed = []
+        for hour in order:
+            for i in range(self.news_per_hour):
+                published = first_hour + timedelta(hours=hour, minutes=(_seed(subject, hour, i) % 60))
+                if not time_from <= published <= time_to:
+                    continue
+                # Half the articles are shared across queries, as wire stories are.
+                key = f"{published:%Y%m%d%H}-{i}" if i % 2 == 0 else f"{subject}-{published:%Y%m%d%H}-{i}"
+                score = round(_noise(key, "score", 0.3), 6)
+                label = "Bullish" if score >= 0.35 else "Somewhat-Bullish" if score >= 0.15 else (
+                    "Bearish" if score <= -0.35 else "Somewhat-Bearish" if score <= -0.15 else "Neutral")
+                feed.append({
+                    "title": f"Simulated story {key}", "url": f"https://news.example.com/{key}",
+                    "time_published": published.strftime("%Y%m%dT%H%M%S"), "authors": ["Signal Simulator"],
+                    "summary": f"Generated article about {subject}.", "banner_image": None,
+                    "source": "Simulated Wire", "category_within_source": "n/a", "source_domain": "news.example.com",
+                    "topics": [{"topic": topic, "relevance_score": "0.5"} for topic in topics],
+                    "overall_sentiment_score": score, "overall_sentiment_label": label,
+                    "ticker_sentiment": [{"ticker": ticker, "relevance_score": "0.6",
+                                          "ticker_sentiment_score": f"{score:.6f}", "ticker_sentiment_label": label}
+                                         for ticker in tickers],
+                })
+                if len(feed) >= limit:
+                    break
+            if len(feed) >= limit:
+                break
+        return 200, {"items": str(len(feed)), "sentiment_score_definition": "x <= -0.35: Bearish; ...",
+                     "relevance_score_definition": "0 < x <= 1", "feed": feed}
+
+    def alpha_vantage(self, query, now):
+        function = query.get("function")
+        if function == "TIME_SERIES_DAILY":
+            return self.time_series_daily(query, now)
+        if function == "TREASURY_YIELD":
+            maturity = query.get("maturity", "10year")
+            return self.economic_series(f"TREASURY_YIELD:{maturity}", f"Daily Treasury Yield ({maturity})",
+                                        "percent", 4.0, 0.003, now)
+        if function == "FEDERAL_FUNDS_RATE":
+            return self.economic_series(function, "Effective Federal Funds Rate", "percent", 3.0, 0.003, now)
+        if function == "NEWS_SENTIMENT":
+            return self.news_sentiment(query, now)
+        return 200, {"Error Message": "This API function does not exist."}
+
+    # Dispatch
+
+    def _route(self, path, query, headers):
+        """
+        Return (provider, handler) for a request, or (None, error response).
+        """
+        if path == "/v1/cryptocurrency/listings/latest":
+            if not headers.get("X-CMC_PRO_API_KEY"):
+                return None, (401, {"status": {"error_code": 1002, "error_message": "API key missing."}})
+            return "coinmarketcap", lambda now: self.crypto_listings(query, now)
+        if path == "/api/XAU/USD" or path.startswith("/api/XAU/USD/"):
+            if not headers.get("x-access-token"):
+                return None, (403, {"error": "No API Key provided"})
+            suffix = path[len("/api/XAU/USD/"):]
+            try:
+                day = datetime.strptime(suffix, "%Y%m%d").date() if suffix else None
+            except ValueError:
+                return None, (400, {"error": "Invalid date format"})
+            return "goldapi", lambda now: self.gold_price(day, now)
+        if path == "/query":
+            if not query.get("apikey"):
+                return None, (200, {"Error Message": "the parameter apikey is invalid or missing."})
+            return "alpha_vantage", lambda now: self.alpha_vantage(query, now)
+        return None, (404, {"error": "not found"})
+
+    def _throttled(self, provider, limit):
+        if provider == "alpha_vantage":
+            quota = self.limits[provider]
+            if limit == "day":
+                return 200, {"Information": AV_INFORMATION.format(per_day=quota.per_day)}
+            return 200, {"Note": AV_NOTE.format(per_minute=quota.per_minute)}
+        if provider == "coinmarketcap":
+            code, message = (1009, "daily") if limit == "day" else (1008, "minute")
+            return 429, {"status": {"error_code": code,
+                                    "error_message": f"You've exceeded your API Key's HTTP request rate limit ({message})."}}
+        return 429, {"error": "You have exceeded your request limit."}
+
+    def handle(self, path, query, headers):
+        """
+        Answer one GET request: returns (status, JSON body or CSV text, extra headers).
+        """
+        latency, draw = self._draw()
+        time.sleep(self.latency_ms / 1000.0 * latency)
+        if path == "/constituents.csv":
+            rows = [f'{symbol},"{name}",{sector}' for symbol, name, sector in self.constituents()]
+            return 200, "Symbol,Security,GICS Sector\n" + "\n".join(rows) + "\n", {}
+
+        provider, handler = self._route(path, query, headers)
+        if provider is None:
+            status, body = handler
+            self._count("requests", f"status_{status}")
+            return status, body, {}
+        self._count("requests", f"{provider}_requests")
+
+        if draw < self.error_rate:
+            status = ERROR_STATUSES[int(draw / self.error_rate * len(ERROR_STATUSES))]
+            self._count(f"{provider}_errors", f"status_{status}")
+            return status, {"error": "Simulated upstream failure"}, {"Retry-After": "1"}
+        limit = self.limits.get(provider)
+        exceeded = limit.check() if limit is not None else None
+        if exceeded:
+            self._count(f"{provider}_throttled", f"{provider}_throttled_{exceeded}")
+            status, body = self._throttled(provider, exceeded)
+            return status, body, ({"Retry-After": "60"} if status == 429 else {})
+
+        status, body = handler(datetime.now(timezone.utc))
+        self._count(f"status_{status}")
+        return status, body, {}
+
+
+def make_handler(simulator):
+    class SimulatorHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; with Nagle's algorithm the
+        # body of a keep-alive response waits for the client's delayed ACK
+        # (~40ms), which would swamp the simulated latency.
+        disable_nagle_algorithm = True
+
+        def _send(self, status, body, headers=None):
+            if isinstance(body, str):
+                payload, content_type = body.encode("utf-8"), "text/csv"
+            else:
+                payload, content_type = json.dumps(body).encode("utf-8"), "application/json"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/stats":
+                with simulator._lock:
+                    self._send(200, dict(simulator.stats))
+                return
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            self._send(*simulator.handle(url.path.rstrip("/") or "/", query, self.headers))
+
+        def log_message(self, format, *args):
+            pass
+
+    return SimulatorHandler
+
+
+def serve(simulator, host="127.0.0.1", port=8060):
+    """
+    Serve the simulated providers until interrupted, then print the request counts.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(simulator))
+    server.daemon_threads = True
+    print(f"Simulating providers on http://{host}:{port}; run the ETL with "
+          f"PROVIDER_SIMULATOR_URL=http://{host}:{port} (and raise the *_CALLS_PER_MINUTE / *_CALLS_PER_DAY "
+          "client quotas to match the simulated ones).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for key, value in sorted(simulator.stats.items()):
+            print(f"{key:<32} {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for the CoinMarketCap, GoldAPI and "
+                                                 "Alpha Vantage endpoints.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8060)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Median response latency.")
+    parser.add_argument("--latency-sigma", type=float, default=0.5,
+                        help="Log-normal sigma of the latency; larger values give a longer tail.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 5xx.")
+    parser.add_argument("--crypto-count", type=int, default=5000, help="Listings reported by CoinMarketCap.")
+    parser.add_argument("--constituents", type=int, default=500, help="Symbols in /constituents.csv.")
+    parser.add_argument("--news-per-hour", type=int, default=2, help="Articles per query and hour.")
+    parser.add_argument("--tick-seconds", type=int, default=60, help="How often live prices change.")
+    parser.add_argument("--no-quota", action="store_true", help="Do not enforce provider quotas.")
+    for provider, (per_minute, per_day) in DEFAULT_QUOTAS.items():
+        option = provider.replace("_", "-")
+        parser.add_argument(f"--{option}-per-minute", type=int, default=per_minute)
+        parser.add_argument(f"--{option}-per-day", type=int, default=per_day)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the latency and error draws.")
+    args = parser.parse_args()
+
+    quotas = None if args.no_quota else {
+        provider: (getattr(args, f"{provider}_per_minute"), getattr(args, f"{provider}_per_day"))
+        for provider in DEFAULT_QUOTAS
+    }
+    simulator = ProviderSimulator(args.latency_ms, args.latency_sigma, args.error_rate, quotas, args.crypto_count,
+                                  args.constituents, args.news_per_hour, args.tick_seconds, args.seed)
+    serve(simulator, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "etl"))
+
+from config import settings
+from crypto_etl import CryptoETLProcessor
+from federal_funds_rate_etl import FederalFundsRateETLProcessor
+from gold_etl import GoldETLProcessor
+import instrumentation
+from news_sentiment_etl import NewsSentimentETLProcessor
+from quota import get_quota
+from sp500_etl import SP500ETLProcessor
+from sp_index_etl import SPIndexETLProcessor
+from treasury_yield_etl import TreasuryYieldETLProcessor
+
+# A job whose quota would block longer than this is skipped for the run.
+MAX_QUOTA_WAIT = 120
+
+
+class ETLJob:
+    def __init__(self, name, provider, processor_cls, table_name, url, parameters=None, headers=None, calls=1,
+                 options=None, per_symbol=False):
+        self.name = name
+        self.provider = provider
+        self.processor_cls = processor_cls
+        self.table_name = table_name
+        self.url = url
+        self.parameters = parameters
+        self.headers = headers
+        # API calls one run is expected to make, for quota accounting.
+        self.calls = calls
+        # Extra processor constructor arguments.
+        self.options = options or {}
+        # Per-symbol jobs queue and pace their own requests (see SPIndexETLProcessor).
+        self.per_symbol = per_symbol
+
+
+def build_jobs():
+    """
+    Register every ETL processor with the request it runs.
+    """
+    av_key = settings.ALPHA_VANTAGE_API_KEY
+    av_url = f"{settings.ALPHA_VANTAGE_BASE_URL}/query"
+
+    return [
+        ETLJob(
+            "crypto", "coinmarketcap", CryptoETLProcessor, "crypto_data",
+            f"{settings.COINMARKETCAP_BASE_URL}/v1/cryptocurrency/listings/latest",
+            parameters={"convert": "USD"},
+            headers={"Accepts": "application/json", "X-CMC_PRO_API_KEY": settings.COINMARKETCAP_API_KEY},
+            calls=10,
+            options={"max_workers": settings.PROVIDER_CONCURRENCY["coinmarketcap"]},
+        ),
+        ETLJob(
+            "gold", "goldapi", GoldETLProcessor, "gold_price_history",
+            f"{settings.GOLD_API_BASE_URL}/api/XAU/USD",
+            headers={"x-access-token": settings.GOLD_API_KEY, "Content-Type": "application/json"},
+        ),
+        ETLJob(
+            "sp500", "alpha_vantage", SP500ETLProcessor, "sp500_index_data",
+            f"{av_url}?function=TIME_SERIES_DAILY&symbol=VOO&apikey={av_key}",
+        ),
+        ETLJob(
+            "treasury_yield", "alpha_vantage", TreasuryYieldETLProcessor, "treasury_yields",
+            f"{av_url}?function=TREASURY_YIELD&interval=daily&maturity=10year&apikey={av_key}",
+        ),
+        ETLJob(
+            "federal_funds_rate", "alpha_vantage", FederalFundsRateETLProcessor, "federal_funds_rate",
+            f"{av_url}?function=FEDERAL_FUNDS_RATE&interval=daily&apikey={av_key}",
+        ),
+        ETLJob(
+            "news_sentiment", "alpha_vantage", NewsSentimentETLProcessor, "news_sentiment",
+            av_url,
+            parameters={
+                "function": "NEWS_SENTIMENT", "tickers": settings.NEWS_TICKERS,
+                "topics": settings.NEWS_TOPICS, "apikey": av_key,
+            },
+            calls=len(settings.NEWS_TICKERS) + len(settings.NEWS_TOPICS),
+            options={"max_workers": settings.PROVIDER_CONCURRENCY["alpha_vantage"]},
+        ),
+        ETLJob(
+            "sp500_constituents", "alpha_vantage", SPIndexETLProcessor, "sp500_constituent_bars",
+            av_url,
+            parameters={"function": "TIME_SERIES_DAILY", "apikey": av_key},
+            # Every symbol's request draws on the shared quota as it is made, at most
+            # max_calls of them per run.
+            calls=0,
+            options={
+                "constituents": settings.SP500_CONSTITUENTS,
+                "quota": get_quota("alpha_vantage", *settings.PROVIDER_QUOTAS["alpha_vantage"]),
+                "max_workers": settings.PROVIDER_CONCURRENCY["alpha_vantage"],
+                "max_calls": settings.SP500_CONSTITUENTS_CALLS_PER_RUN,
+            },
+            per_symbol=True,
+        ),
+    ]
+
+
+class ETLRunner:
+    def __init__(self, jobs, database_url=settings.DATABASE_URL, provider_limits=None, profile_dir=None,
+                 quotas=None):
+        self.jobs = {job.name: job for job in jobs}
+        self.database_url = database_url
+        self.profile_dir = profile_dir
+        limits = provider_limits or settings.PROVIDER_CONCURRENCY
+        self._semaphores = {
+            job.provider: threading.BoundedSemaphore(limits.get(job.provider, 1))
+            for job in jobs
+        }
+        quotas = quotas or settings.PROVIDER_QUOTAS
+        self._quotas = {provider: get_quota(provider, *limits) for provider, limits in quotas.items()}
+
+    def run_job(self, job, replay=False):
+        """
+        Run one job. Each request holds the provider slot only while it is in
+        flight, so processing and loading overlap with other jobs' requests to
+        the same provider, and the job's calls are drawn from the provider's
+        shared quota first. With replay=True the job is rebuilt from the
+        payload archive instead.
+        """
+        start = time.perf_counter()
+        processor = job.processor_cls(self.database_url, job.table_name, slot=self._semaphores[job.provider],
+                                      **job.options)
+        with instrumentation.track_run(processor.engine, job.table_name, self.profile_dir) as run:
+            quota = self._quotas.get(job.provider)
+            if replay:
+                result = self._result(job, processor.replay(), start)
+            elif job.per_symbol:
+                result = self._result(job, processor.load_symbols(job.url, job.parameters, job.headers), start)
+            elif quota is not None and job.calls and not quota.acquire(job.calls, max_wait=MAX_QUOTA_WAIT):
+                result = {"job": job.name, "status": "quota_exhausted", "seconds": time.perf_counter() - start}
+            else:
+                raw_data = processor.extract(job.url, job.parameters, job.headers)
+                if not raw_data:
+                    result = {"job": job.name, "status": "fetch_failed", "seconds": time.perf_counter() - start}
+                else:
+                    result = self._result(job, processor.load(raw_data), start)
+            run.status = result["status"]
+            return result
+
+    def _result(self, job, load_result, start):
+        if load_result is None:
+            return {"job": job.name, "status": "load_failed", "seconds": time.perf_counter() - start}
+
+        inserted, skipped = load_result
+        return {
+            "job": job.name, "status": "ok", "rows": inserted + skipped, "inserted": inserted,
+            "skipped": skipped, "seconds": time.perf_counter() - start,
+        }
+
+    def run(self, names=None, replay=False):
+        """
+        Run the selected jobs (all by default) concurrently and return their results.
+        """
+        selected = [self.jobs[name] for name in (names or self.jobs)]
+        results = []
+        with ThreadPoolExecutor(max_workers=len(selected) or 1) as executor:
+            futures = {executor.submit(self.run_job, job, replay): job for job in selected}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error running {job.name}: {e}")
+                    result = {"job": job.name, "status": "error", "error": str(e)}
+                results.append(result)
+        return results
+
+
+def main():
+    jobs = build_jobs()
+    parser = argparse.ArgumentParser(description="Run the Signal ETL jobs concurrently.")
+    parser.add_argument("jobs", nargs="*", help="Jobs to run (default: all).")
+    parser.add_argument("--replay", action="store_true",
+                        help="Rebuild tables from the payload archive instead of calling the APIs.")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="Write a cProfile .prof file per job and stage to this directory.")
+    args = parser.parse_args()
+
+    unknown = set(args.jobs) - {job.name for job in jobs}
+    if unknown:
+        parser.error(f"unknown job(s): {', '.join(sorted(unknown))}")
+
+    runner = ETLRunner(jobs, profile_dir=args.profile)
+    start = time.perf_counter()
+    results = runner.run(args.jobs or None, replay=args.replay)
+    for result in sorted(results, key=lambda r: r["job"]):
+        seconds = result.get("seconds")
+        timing = f"{seconds:.2f}s" if seconds is not None else "-"
+        print(f"{result['job']:<20} {result['status']:<13} rows={result.get('rows', 0):<6} "
+              f"inserted={result.get('inserted', 0):<6} {timing}")
+    print(f"Refresh cycle finished in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import heapq
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "etl"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+
+from config import settings
+from database_setup import maintain_partitions
+from etl_metadata import ETLMetadataStore
+from quota import get_quota
+from registry import get_engine
+from run_etl import ETLRunner, build_jobs
+
+# Queue entry of the partition maintenance task, run alongside the jobs.
+PARTITION_MAINTENANCE = "partition_maintenance"
+
+
+class Scheduler:
+    """
+    Long-running scheduler that runs every job on its own cadence.
+
+    The process keeps its pooled engine and HTTP sessions for its whole
+    lifetime. Jobs that were due while the scheduler was down run once at
+    start-up; the daily sources re-fetch enough history to cover the gap.
+    The monthly partitions of the snapshot tables are created months_ahead
+    months in advance at start-up and every partition_interval seconds, so
+    rows never pile up in the DEFAULT partitions.
+    """
+    def __init__(self, runner, schedule=None, quotas=None, jitter=0.05, max_workers=None,
+                 partition_interval=settings.PARTITION_MAINTENANCE_INTERVAL,
+                 months_ahead=settings.PARTITION_MONTHS_AHEAD):
+        self.runner = runner
+        self.schedule = schedule or settings.SCHEDULE
+        self.partition_interval = partition_interval
+        self.months_ahead = months_ahead
+        quotas = quotas or settings.PROVIDER_QUOTAS
+        self.quotas = {provider: get_quota(provider, *limits) for provider, limits in quotas.items()}
+        self.jitter = jitter
+        self.max_workers = max_workers or len(runner.jobs) + 1
+        self.metadata = ETLMetadataStore(get_engine(runner.database_url))
+        self._queue = []
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+
+    def _last_run(self, job):
+        """
+        Return when the job last loaded data, as a timestamp. Per-symbol jobs
+        record each symbol under "<table>:<symbol>", so the latest of those
+        counts.
+        """
+        try:
+            if job.per_symbol:
+                states = self.metadata.get_prefixed(f"{job.table_name}:").values()
+            else:
+                states = [self.metadata.get(job.table_name)]
+        except Exception as e:
+            print(f"Could not read last run for {job.name}: {e}")
+            return None
+        updated = [state.updated_at for state in states if state and state.updated_at]
+        return max(updated).timestamp() if updated else None
+
+    def _push(self, due, name):
+        with self._condition:
+            heapq.heappush(self._queue, (due, name))
+            self._condition.notify()
+
+    def _next_due(self, name, after):
+        interval = self.schedule[name]
+        return after + interval + random.uniform(0, self.jitter * interval)
+
+    def _run(self, job):
+        try:
+            result = self.runner.run_job(job)
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {job.name}: {result['status']} "
+                  f"inserted={result.get('inserted', 0)} in {result['seconds']:.2f}s")
+        except Exception as e:
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {job.name}: error {e}")
+        finally:
+            self._push(self._next_due(job.name, time.time()), job.name)
+
+    def _maintain_partitions(self):
+        try:
+            maintain_partitions(self.metadata.engine, self.months_ahead)
+        except Exception as e:
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} partition maintenance: error {e}")
+        finally:
+            self._push(time.time() + self.partition_interval, PARTITION_MAINTENANCE)
+
+    def start(self, names=None):
+        """
+        Queue the selected jobs, catching up any that are overdue, and the
+        partition maintenance.
+        """
+        now = time.time()
+        if self.partition_interval:
+            self._push(now, PARTITION_MAINTENANCE)
+        for name in names or self.schedule:
+            job = self.runner.jobs[name]
+            last_run = self._last_run(job)
+            due = now if last_run is None else max(now, last_run + self.schedule[name])
+            self._push(due, name)
+
+    def stop(self):
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify()
+
+    def run_forever(self, names=None):
+        """
+        Run jobs as they come due until stop() is called.
+        """
+        self.start(names)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self._stopped.is_set():
+                with self._condition:
+                    if not self._queue:
+                        self._condition.wait()
+                        continue
+                    due, name = self._queue[0]
+                    wait = due - time.time()
+                    if wait > 0:
+                        self._condition.wait(timeout=wait)
+                        continue
+                    heapq.heappop(self._queue)
+
+                if name == PARTITION_MAINTENANCE:
+                    executor.submit(self._maintain_partitions)
+                    continue
+                job = self.runner.jobs[name]
+                quota = self.quotas.get(job.provider)
+                if quota is not None:
+                    # The runner draws the calls from the same quota; a job
+                    # that would wait for it is requeued instead of holding a worker.
+                    delay = quota.delay(job.calls)
+                    if delay > 0:
+                        self._push(time.time() + delay, name)
+                        continue
+                executor.submit(self._run, job)
+
+
+def main():
+    jobs = build_jobs()
+    parser = argparse.ArgumentParser(description="Run the Signal ETL jobs on their schedules.")
+    parser.add_argument("jobs", nargs="*", help="Jobs to schedule (default: all).")
+    args = parser.parse_args()
+
+    unknown = set(args.jobs) - {job.name for job in jobs}
+    if unknown:
+        parser.error(f"unknown job(s): {', '.join(sorted(unknown))}")
+
+    scheduler = Scheduler(ETLRunner(jobs))
+    try:
+        scheduler.run_forever(args.jobs or None)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "etl"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+
+from config import settings
+from quota import get_quota
+from run_etl import build_jobs
+from streaming import StreamPoller, WriteBehindQueue
+
+
+# Streams polling less often than this are not the sub-minute feed the mode is for.
+SUB_MINUTE = 60
+
+
+def effective_interval(interval, per_minute=None, per_day=None, calls=1):
+    """
+    Seconds between polls: the configured interval, or longer if the
+    provider's per-minute or per-day quota cannot sustain it.
+    """
+    return max(interval, 60 * calls / per_minute if per_minute else 0, 86400 * calls / per_day if per_day else 0)
+
+
+def build_pollers(names, database_url=settings.DATABASE_URL, intervals=None):
+    """
+    Create a StreamPoller for each streamed job from its run_etl definition,
+    printing the interval it polls at and warning when that is not sub-minute.
+    """
+    intervals = intervals or settings.STREAM_INTERVALS
+    jobs = {job.name: job for job in build_jobs()}
+    pollers = []
+    for name in names:
+        job = jobs[name]
+        per_minute, per_day = settings.PROVIDER_QUOTAS.get(job.provider, (None, None))
+        interval = effective_interval(intervals[name], per_minute, per_day)
+        print(f"{name}: polling every {interval:.1f}s")
+        if interval > SUB_MINUTE:
+            print(f"Warning: {name} polls every {interval:.0f}s, not sub-minute. The interval is bounded by "
+                  f"{name.upper()}_STREAM_INTERVAL and the {job.provider} quota ({per_minute}/minute, "
+                  f"{per_day}/day, STREAM_QUOTA_SHARE={settings.STREAM_QUOTA_SHARE:g} of it by default).")
+        processor = job.processor_cls(database_url, job.table_name, **job.options)
+        parameters = dict(job.parameters or {})
+        if name == "crypto":
+            # One listings page per tick instead of the full universe.
+            parameters["limit"] = settings.STREAM_CRYPTO_LIMIT
+        writer = WriteBehindQueue(processor, settings.STREAM_FLUSH_ROWS, settings.STREAM_FLUSH_SECONDS)
+        quota = get_quota(job.provider, *settings.PROVIDER_QUOTAS.get(job.provider, (None, None)))
+        pollers.append(StreamPoller(processor, job.url, parameters, job.headers, interval,
+                                    writer=writer, quota=quota))
+    return pollers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll gold and crypto prices continuously with write-behind loading.")
+    parser.add_argument("jobs", nargs="*", help=f"Jobs to stream: {', '.join(settings.STREAM_INTERVALS)} (default: all).")
+    parser.add_argument("--stats-interval", type=float, default=60, help="Seconds between status lines.")
+    args = parser.parse_args()
+
+    unknown = set(args.jobs) - set(settings.STREAM_INTERVALS)
+    if unknown:
+        parser.error(f"unknown job(s): {', '.join(sorted(unknown))}")
+
+    pollers = build_pollers(args.jobs or list(settings.STREAM_INTERVALS))
+    threads = [threading.Thread(target=poller.run, name=f"poll-{poller.processor.table_name}") for poller in pollers]
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            for poller in pollers:
+                stats = {**poller.stats, **poller.writer.stats}
+                print(f"{poller.processor.table_name:<20} " + " ".join(f"{k}={v:.2f}" if isinstance(v, float)
+                                                                          else f"{k}={v}" for k, v in stats.items()))
+    except KeyboardInterrupt:
+        print("Stopping; flushing pending ticks...")
+        for poller in pollers:
+            poller.stop()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()
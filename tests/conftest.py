@@ -0,0 +1,85 @@
+import glob
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "etl"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "models"))
+
+BENCHMARK_RESULTS_DIR = os.environ.get(
+    "SIGNAL_BENCH_RESULTS_DIR", os.path.join(ROOT_DIR, "tests", "benchmarks", "results")
+)
+
+# Changes in rows/sec smaller than this are reported as noise.
+REGRESSION_THRESHOLD = 0.10
+# Stages faster than this are too short to compare between runs.
+MIN_COMPARED_SECONDS = 0.05
+
+_results_key = pytest.StashKey()
+
+
+def pytest_configure(config):
+    config.stash[_results_key] = []
+
+
+@pytest.fixture(scope="session")
+def benchmark_results(request):
+    """
+    Collects benchmark records; they are saved and compared at the end of the session.
+    """
+    return request.config.stash[_results_key]
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _previous_results():
+    paths = sorted(glob.glob(os.path.join(BENCHMARK_RESULTS_DIR, "*.json")))
+    if not paths:
+        return None, {}
+    with open(paths[-1], encoding="utf-8") as f:
+        previous = json.load(f)
+    return previous, {(r["source"], r["scale"], r["stage"]): r for r in previous["results"]}
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    results = config.stash[_results_key]
+    if not results:
+        return
+
+    previous, baseline = _previous_results()
+    revision = _git_revision()
+    run = {"created_at": datetime.now().isoformat(timespec="seconds"), "revision": revision, "results": results}
+    os.makedirs(BENCHMARK_RESULTS_DIR, exist_ok=True)
+    path = os.path.join(BENCHMARK_RESULTS_DIR, f"{datetime.now():%Y%m%dT%H%M%S}_{revision}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+
+    write = terminalreporter.write_line
+    terminalreporter.section("ETL benchmarks")
+    if previous:
+        write(f"compared with {previous['revision']} ({previous['created_at']})")
+    for r in results:
+        line = (f"{r['source']:<20} x{r['scale']:<5} {r['stage']:<22} {r['rows']:>9} rows "
+                f"{r['rows_per_sec']:>12,.0f} rows/s {r['peak_mb']:>9.1f} MB peak")
+        before = baseline.get((r["source"], r["scale"], r["stage"]))
+        if before and before["rows_per_sec"]:
+            change = r["rows_per_sec"] / before["rows_per_sec"] - 1
+            short = min(r["seconds"], before["seconds"]) < MIN_COMPARED_SECONDS
+            flag = "  REGRESSION" if change < -REGRESSION_THRESHOLD and not short else ""
+            line += f" {change:+7.1%}{flag}"
+        write(line)
+    write(f"saved to {os.path.relpath(path, ROOT_DIR)}")
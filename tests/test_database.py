@@ -0,0 +1,210 @@
+"""
+Database tests. The ones marked with the `database` fixture need
+SIGNAL_TEST_DATABASE_URL pointing at a disposable PostgreSQL database: its
+public schema is dropped and recreated from database/schema.sql.
+"""
+import os
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from sqlalchemy import text
+
+import instrumentation
+import scheduler
+import stream
+from backfill import Backfill, BackfillCheckpoints, date_chunks
+from database_setup import create_schema
+from etl_metadata import SourceState
+from registry import get_engine
+from run_etl import ETLJob, ETLRunner
+
+
+@pytest.fixture(scope="module")
+def database():
+    database_url = os.environ.get("SIGNAL_TEST_DATABASE_URL")
+    if not database_url:
+        pytest.skip("SIGNAL_TEST_DATABASE_URL is not set")
+    engine = get_engine(database_url)
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE"))
+        connection.execute(text("CREATE SCHEMA public"))
+    create_schema(engine)
+    return engine
+
+
+def _month(offset):
+    today = date.today().replace(day=1)
+    month = today.month - 1 + offset
+    return today.replace(year=today.year + month // 12, month=month % 12 + 1)
+
+
+def test_create_monthly_partitions_moves_default_rows(database):
+    month = _month(5)
+    partition = f"gold_price_history_{month:%Y_%m}"
+    with database.begin() as connection:
+        connection.execute(
+            text("INSERT INTO gold_price_history (timestamp, price, pulled_at) VALUES (:at, 2300, :at)"),
+            {"at": month.replace(day=2)},
+        )
+        connection.execute(text("SELECT create_monthly_partitions('gold_price_history', 6)"))
+
+    with database.connect() as connection:
+        assert connection.execute(text(f"SELECT count(*) FROM {partition}")).scalar() == 1
+        assert connection.execute(text("SELECT count(*) FROM gold_price_history_default")).scalar() == 0
+        default = connection.execute(text(
+            "SELECT partdefid::regclass::text FROM pg_partitioned_table "
+            "WHERE partrelid = 'gold_price_history'::regclass"
+        )).scalar()
+    assert default == "gold_price_history_default"
+
+
+def test_scheduler_maintains_partitions_ahead(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scheduler, "maintain_partitions", lambda engine, months_ahead: calls.append(months_ahead))
+    runner = ETLRunner([], database_url="sqlite://")
+    instance = scheduler.Scheduler(runner, quotas={}, partition_interval=3600, months_ahead=2)
+    instance.schedule = {}
+
+    instance.start()
+    assert [name for _, name in instance._queue] == [scheduler.PARTITION_MAINTENANCE]
+    due, _ = instance._queue.pop()
+    instance._maintain_partitions()
+    assert calls == [2]
+    next_due, name = instance._queue[0]
+    assert name == scheduler.PARTITION_MAINTENANCE
+    assert next_due >= due + 3600
+
+
+class PrefixedMetadata:
+    def __init__(self, states):
+        self.states = states
+
+    def get(self, source):
+        return self.states.get(source)
+
+    def get_prefixed(self, prefix):
+        return {source: state for source, state in self.states.items() if source.startswith(prefix)}
+
+
+def test_scheduler_last_run_of_per_symbol_jobs():
+    def state(source, updated_at):
+        return SourceState(source, None, 1, 1, None, updated_at)
+
+    constituents = ETLJob("sp500_constituents", "alpha_vantage", None, "sp500_constituent_bars", "", per_symbol=True)
+    index = ETLJob("sp500", "alpha_vantage", None, "sp500_index_data", "")
+    instance = scheduler.Scheduler(ETLRunner([constituents, index], database_url="sqlite://"), quotas={})
+    instance.metadata = PrefixedMetadata({
+        "sp500_constituent_bars:AAPL": state("sp500_constituent_bars:AAPL", datetime(2024, 3, 4, 22)),
+        "sp500_constituent_bars:MSFT": state("sp500_constituent_bars:MSFT", datetime(2024, 3, 5, 22)),
+        # A symbol that has only ever failed has no successful load time.
+        "sp500_constituent_bars:XYZ": state("sp500_constituent_bars:XYZ", None),
+    })
+
+    assert instance._last_run(constituents) == datetime(2024, 3, 5, 22).timestamp()
+    assert instance._last_run(index) is None
+
+
+def test_date_chunks_cover_the_range():
+    assert list(date_chunks(date(2024, 1, 1), date(2024, 3, 5), 30)) == [
+        (date(2024, 1, 1), date(2024, 1, 31)),
+        (date(2024, 1, 31), date(2024, 3, 1)),
+        (date(2024, 3, 1), date(2024, 3, 5)),
+    ]
+    assert list(date_chunks(date(2024, 1, 1), date(2024, 1, 1), 30)) == []
+
+
+class MemoryCheckpoints:
+    def __init__(self):
+        self.chunks = {}
+
+    def completed(self, source, start, end):
+        return {chunk for (chunk_source, chunk), status in self.chunks.items()
+                if chunk_source == source and status == "done" and chunk[0] >= start and chunk[1] <= end}
+
+    def record(self, source, chunk, status, rows_inserted=0):
+        self.chunks[(source, chunk)] = status
+
+
+class ChunkedProcessor:
+    """
+    Stand-in processor with one request per chunk and a row per day.
+    """
+    watermark_column = "date"
+    backfill_chunk_days = 10
+    failing = set()
+
+    def __init__(self, database_url, table_name):
+        self.engine = get_engine(database_url)
+        self.archive = SimpleNamespace(store=lambda table_name, raw_data: None)
+        self.requested = []
+
+    def chunk_requests(self, url, parameters, start, end):
+        return [(url, {"start": start, "end": end})]
+
+    def fetch_data(self, url, parameters, headers=None):
+        self.requested.append(parameters["start"])
+        if parameters["start"] in self.failing:
+            return None
+        days = (parameters["end"] - parameters["start"]).days
+        return {"dates": [parameters["start"] + timedelta(days=i) for i in range(days)]}
+
+    def process_data(self, raw_data):
+        return pd.DataFrame({"date": raw_data["dates"]})
+
+    def load_frame(self, df):
+        return len(df), 0
+
+
+def test_backfill_resumes_from_its_checkpoints(monkeypatch):
+    monkeypatch.setattr(instrumentation, "write_textfile", lambda run, directory=None: None)
+    job = ETLJob("backfill_test", "backfill_test_provider", ChunkedProcessor, "backfill_test", "http://localhost")
+    backfill = Backfill(job, database_url="sqlite://", workers=2,
+                        quota=SimpleNamespace(acquire=lambda calls=1, max_wait=None: True))
+    backfill.checkpoints = MemoryCheckpoints()
+    ChunkedProcessor.failing = {date(2024, 1, 11)}
+
+    summary = backfill.run(date(2024, 1, 1), date(2024, 2, 5))
+    assert backfill.processor.requested == [date(2024, 1, 1), date(2024, 1, 11), date(2024, 1, 21),
+                                            date(2024, 1, 31)]
+    assert {key: summary[key] for key in ("chunks", "resumed", "loaded", "failed", "inserted")} == {
+        "chunks": 4, "resumed": 0, "loaded": 3, "failed": 1, "inserted": 25,
+    }
+
+    # The rerun only fetches the chunk that failed.
+    ChunkedProcessor.failing = set()
+    backfill.processor.requested = []
+    summary = backfill.run(date(2024, 1, 1), date(2024, 2, 5))
+    assert backfill.processor.requested == [date(2024, 1, 11)]
+    assert (summary["resumed"], summary["loaded"], summary["failed"], summary["inserted"]) == (3, 1, 0, 10)
+
+    assert backfill.run(date(2024, 1, 1), date(2024, 2, 5))["resumed"] == 4
+
+
+def test_backfill_checkpoints_round_trip(database):
+    checkpoints = BackfillCheckpoints(database)
+    january, february = (date(2024, 1, 1), date(2024, 2, 1)), (date(2024, 2, 1), date(2024, 3, 1))
+    checkpoints.record("gold_price_history", january, "done", 31)
+    checkpoints.record("gold_price_history", february, "failed")
+    assert checkpoints.completed("gold_price_history", date(2024, 1, 1), date(2024, 3, 1)) == {january}
+
+    checkpoints.record("gold_price_history", february, "done", 29)
+    assert checkpoints.completed("gold_price_history", date(2024, 1, 1), date(2024, 3, 1)) == {january, february}
+    assert checkpoints.completed("gold_price_history", date(2024, 2, 1), date(2024, 3, 1)) == {february}
+
+
+def test_stream_reports_its_effective_interval(capsys):
+    assert stream.effective_interval(10, per_minute=10) == 10
+    assert stream.effective_interval(1, per_minute=10) == 6
+    assert stream.effective_interval(10, per_minute=30, per_day=333) == pytest.approx(259.5, abs=0.1)
+
+    gold, crypto = stream.build_pollers(["gold", "crypto"], database_url="sqlite://",
+                                        intervals={"gold": 1, "crypto": 30})
+    output = capsys.readouterr().out
+    assert gold.interval == 6 and "gold: polling every 6.0s" in output
+    # The CoinMarketCap daily quota cannot sustain a sub-minute crypto stream.
+    assert crypto.interval > 60
+    assert "Warning: crypto polls every" in output and "Warning: gold" not in output
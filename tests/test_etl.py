@@ -0,0 +1,726 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import numpy as np
+import requests
+from sqlalchemy import Column, Integer, MetaData, Numeric, String, Table
+
+import bulk_loader
+import etl_processor
+import http_transport
+import indicators
+import instrumentation
+import provider_simulator
+import rollups
+import validation
+from crypto_etl import CryptoETLProcessor
+from etl_metadata import SourceState
+from http_transport import HTTPTransport, RateLimitError
+from indicators import BOLLINGER_K, EMA_FAST, EMA_SLOW, RSI_PERIOD, WINDOW, IndicatorState, update_indicators
+from news_sentiment_etl import PAGE_LIMIT, NewsSentimentETLProcessor
+from payload_archive import PayloadArchive
+from provider_simulator import AV_INFORMATION, AV_NOTE, ERROR_STATUSES, ProviderSimulator
+from registry import SchemaRegistry, UpsertStatement, get_engine
+from run_etl import ETLJob, ETLRunner
+from sp_index_etl import DEFERRED, SPIndexETLProcessor, backing_off
+from streaming import WriteBehindQueue
+from treasury_yield_etl import TreasuryYieldETLProcessor
+from validation import TableValidator, quarantine
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def quotes_table():
+    return Table(
+        "quotes", MetaData(),
+        Column("symbol", String(4), primary_key=True),
+        Column("name", String(5)),
+        Column("price", Numeric(6, 2), nullable=False),
+        Column("volume", Integer),
+    )
+
+
+def test_table_validator_rejects_nulls_overflow_and_long_keys():
+    df = pd.DataFrame({
+        "symbol": ["AAPL", "MSFT", "GOOGL", "AMZN"],
+        "name": ["Apple Inc", "Msft", "Alphabet", "Amazon"],
+        "price": [189.5, None, 140.0, 12345.0],
+        "volume": [1, 2, 3, 2 ** 40],
+    })
+    valid, rejected = TableValidator(quotes_table()).check(df)
+
+    assert valid["symbol"].tolist() == ["AAPL"]
+    # Over-long text outside the keys is truncated, not rejected.
+    assert valid["name"].tolist() == ["Apple"]
+    assert dict(zip(rejected["symbol"], rejected["reasons"])) == {
+        "MSFT": ["null:price"],
+        "GOOGL": ["too_long:symbol"],
+        "AMZN": ["overflow:price", "overflow:volume"],
+    }
+
+
+def test_table_validator_extra_required_columns():
+    df = pd.DataFrame({"symbol": ["AAPL"], "name": ["Apple"], "price": [1.0], "volume": [None]})
+    valid, rejected = TableValidator(quotes_table(), required=["volume"]).check(df)
+    assert valid.empty
+    assert rejected["reasons"].tolist() == [["null:volume"]]
+
+
+def test_economic_series_drops_missing_sentinel():
+    payload = load_fixture("av_treasury_yield.json")
+    holidays = {row["date"] for row in payload["data"] if row["value"] == "."}
+    assert holidays
+
+    df = TreasuryYieldETLProcessor.spec.transform(payload)
+    assert len(df) == len(payload["data"]) - len(holidays)
+    assert not df["value"].isna().any()
+    assert not set(df["date"].dt.strftime("%Y-%m-%d")) & holidays
+
+
+def test_stale_rows_are_not_validated(monkeypatch):
+    checked = []
+    quarantined = []
+
+    class RejectAll:
+        def check(self, df):
+            checked.append(len(df))
+            return df.iloc[0:0], df.assign(reasons=[["null:value"]] * len(df))
+
+    monkeypatch.setattr(etl_processor, "get_validator", lambda *args: RejectAll())
+    monkeypatch.setattr(etl_processor, "quarantine", lambda engine, source, rejected, exclude: quarantined.append(
+        len(rejected)))
+
+    payload = load_fixture("av_treasury_yield.json")
+    processor = TreasuryYieldETLProcessor("sqlite://", "treasury_yields")
+    state = SourceState("treasury_yields", datetime(2024, 5, 29), 1, 1, None, None)
+    processor.process_data(payload, state)
+
+    # Only 2024-05-30 and 2024-05-31 are newer than the watermark.
+    assert checked == [2]
+    assert quarantined == [2]
+
+
+def test_quarantine_hash_ignores_load_time(monkeypatch):
+    stored = []
+    monkeypatch.setattr(validation, "bulk_upsert", lambda engine, table, rows: stored.append(rows) or (len(rows), 0))
+
+    def rejected(pulled_on):
+        return pd.DataFrame({
+            "date": pd.to_datetime(["2024-04-02", "2024-04-02", "2024-04-08"]),
+            "value": [None, None, None],
+            "pulled_on": pd.to_datetime([pulled_on] * 3),
+            "reasons": [["null:value"]] * 3,
+        })
+
+    assert quarantine(None, "treasury_yields", rejected("2024-05-01"), ["pulled_on"]) == 2
+    assert quarantine(None, "treasury_yields", rejected("2024-05-02"), ["pulled_on"]) == 2
+    first, second = stored
+    assert list(first.columns) == ["source", "record_hash", "reasons", "record"]
+    assert first["record_hash"].tolist() == second["record_hash"].tolist()
+    assert first["record"].iloc[0]["pulled_on"] != second["record"].iloc[0]["pulled_on"]
+
+
+def test_constituent_symbol_is_validated_with_the_bars(monkeypatch):
+    checked = []
+
+    class Record:
+        def check(self, df):
+            checked.append(df.columns.tolist())
+            return df, df.iloc[0:0].assign(reasons=None)
+
+    monkeypatch.setattr(etl_processor, "get_validator", lambda *args: Record())
+    payload = load_fixture("av_time_series_daily.json")
+    payload = {**payload, "Meta Data": {**payload["Meta Data"], "2. Symbol": "brk.b"}}
+
+    df = SPIndexETLProcessor("sqlite://").process_data(payload)
+    assert checked and checked[0][0] == "symbol"
+    assert set(df["symbol"]) == {"BRK.B"}
+
+
+def test_failed_symbols_back_off():
+    now = datetime(2024, 6, 1, 12)
+    state = SourceState("sp500_constituent_bars:XYZ", None, 0, 0, None, None, failures=3,
+                        failed_at=now - timedelta(hours=20))
+    # Three failures back off for 24 hours.
+    assert backing_off(state, now)
+    assert not backing_off(state, now + timedelta(hours=5))
+    assert not backing_off(SourceState("sp500_constituent_bars:AAPL", now, 1, 1, None, now), now)
+    assert not backing_off(None, now)
+
+
+def test_constituent_run_stops_at_its_call_budget(monkeypatch):
+    processor = SPIndexETLProcessor("sqlite://", max_calls=2)
+    watermarks = {"AAPL": datetime(2024, 5, 1), "MSFT": datetime(2024, 5, 3), "NVDA": datetime(2024, 5, 2)}
+    monkeypatch.setattr(processor.metadata, "get_prefixed", lambda prefix: {
+        processor.symbol_source(symbol): SourceState(processor.symbol_source(symbol), watermark, 1, 1, None, watermark)
+        for symbol, watermark in watermarks.items()
+    })
+    requested = []
+
+    def fetch(url, parameters, headers, symbol, state):
+        requested.append(symbol)
+        return symbol, pd.DataFrame()
+
+    monkeypatch.setattr(processor, "_fetch_symbol", fetch)
+    results = dict(processor.fetch_symbols("http://localhost", symbols=["AAPL", "MSFT", "NVDA", "TSLA"]))
+    # The never-loaded and stalest symbols use the budget; the rest wait.
+    assert sorted(requested) == ["AAPL", "TSLA"]
+    assert results["MSFT"] is DEFERRED and results["NVDA"] is DEFERRED
+
+
+def test_symbol_watermarks_record_inserted_rows(monkeypatch):
+    recorded = []
+    processor = SPIndexETLProcessor("sqlite://")
+    monkeypatch.setattr(processor.metadata, "record", lambda source, watermark, rows, digest=None: recorded.append(
+        (source, watermark, rows)))
+    monkeypatch.setattr(processor, "after_load", lambda df: None)
+    df = pd.DataFrame({"symbol": ["AAPL", "AAPL", "MSFT"],
+                       "date": pd.to_datetime(["2024-05-30", "2024-05-31", "2024-05-31"])})
+    monkeypatch.setattr(processor, "upsert_data", lambda df: (1, 2, {"AAPL": 1}))
+
+    assert processor.load_frame(df) == (1, 2)
+    assert recorded == [
+        ("sp500_constituent_bars", datetime(2024, 5, 31), 1),
+        ("sp500_constituent_bars:AAPL", datetime(2024, 5, 31), 1),
+        ("sp500_constituent_bars:MSFT", datetime(2024, 5, 31), 0),
+    ]
+
+
+def test_runner_draws_on_quota_and_shares_provider_slot(monkeypatch):
+    monkeypatch.setattr(instrumentation, "write_textfile", lambda run, directory=None: None)
+    slots = []
+
+    class Processor:
+        def __init__(self, database_url, table_name, slot=None):
+            self.engine = get_engine(database_url)
+            slots.append(slot)
+
+        def extract(self, url, parameters=None, headers=None):
+            return {"data": []}
+
+        def load(self, raw_data):
+            return 0, 0
+
+    job = ETLJob("quota_test", "quota_test_provider", Processor, "quota_test", "http://localhost", calls=3)
+    runner = ETLRunner([job], database_url="sqlite://", provider_limits={"quota_test_provider": 1},
+                       quotas={"quota_test_provider": (None, 10)})
+    assert runner.run_job(job)["status"] == "ok"
+    assert slots == [runner._semaphores["quota_test_provider"]]
+    quota = runner._quotas["quota_test_provider"]
+    assert quota.delay(7) == 0
+    assert quota.delay(8) > 0
+
+
+class CountingTransport:
+    """
+    Stand-in HTTPTransport that records the most requests in flight at once.
+    """
+    def __init__(self, respond):
+        self.respond = respond
+        self.in_flight = self.peak = 0
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get_json(self, url, params=None, headers=None):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.requests.append(dict(params or {}))
+        time.sleep(0.01)
+        with self._lock:
+            self.in_flight -= 1
+        return self.respond(params or {})
+
+
+def http_response(payload, status_code=200, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = json.dumps(payload).encode()
+    return response
+
+
+class ScriptedSession:
+    """
+    Stand-in requests.Session answering each GET with the next scripted
+    response, or raising it if it is an exception.
+    """
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def scripted_transport(monkeypatch, *responses, **kwargs):
+    delays = []
+    monkeypatch.setattr(http_transport.time, "sleep", delays.append)
+    transport = HTTPTransport(backoff=1.0, throttle_delay=20.0, **kwargs)
+    transport._sessions["api.example.com"] = ScriptedSession(*responses)
+    return transport, delays
+
+
+def test_transport_retries_errors_and_throttle_notes(monkeypatch):
+    transport, delays = scripted_transport(
+        monkeypatch,
+        requests.exceptions.ConnectionError("reset"),
+        http_response({}, status_code=503, headers={"Retry-After": "30"}),
+        http_response({"Note": "5 calls per minute"}),
+        http_response({"data": [1]}),
+    )
+    assert transport.get_json("https://api.example.com/query") == {"data": [1]}
+    assert transport._sessions["api.example.com"].calls == 4
+    assert len(delays) == 3
+    assert delays[0] < 2 and 30 <= delays[1] < 31 and 20 <= delays[2] < 21
+
+
+def test_transport_raises_once_throttling_persists(monkeypatch):
+    transport, delays = scripted_transport(monkeypatch, http_response({"Information": "daily limit"}))
+    with pytest.raises(RateLimitError, match="daily limit"):
+        transport.get_json("https://api.example.com/query")
+    assert delays == []
+
+    transport, delays = scripted_transport(
+        monkeypatch, *[http_response({"Note": "5 calls per minute"}) for _ in range(3)], max_retries=2,
+    )
+    with pytest.raises(RateLimitError):
+        transport.get_json("https://api.example.com/query")
+    assert len(delays) == 2
+
+    transport, _ = scripted_transport(monkeypatch, *[http_response({}, status_code=502) for _ in range(3)],
+                                      max_retries=2)
+    with pytest.raises(requests.exceptions.HTTPError):
+        transport.get_json("https://api.example.com/query")
+
+
+def test_transport_cache_evicts_least_recently_used(monkeypatch):
+    transport, _ = scripted_transport(
+        monkeypatch, *[http_response({"page": page}) for page in (1, 2, 3, 2)], cache_ttl=60, cache_size=2,
+    )
+    for page in (1, 2, 1, 3, 1, 2):
+        assert transport.get_json("https://api.example.com/query", params={"page": page}) == {"page": page}
+    # Page 1 was read again before page 3 came in, so page 2 was evicted instead.
+    assert transport._sessions["api.example.com"].calls == 4
+    assert len(transport._cache) == 2
+
+
+def test_transport_caches_list_parameters(monkeypatch):
+    transport, _ = scripted_transport(monkeypatch, http_response({"feed": []}), cache_ttl=60)
+    params = {"tickers": ["AAPL", "MSFT"], "limit": 50}
+    for _ in range(2):
+        assert transport.get_json("https://api.example.com/query", params=params) == {"feed": []}
+    assert transport._sessions["api.example.com"].calls == 1
+
+
+def test_crypto_pages_hold_the_provider_slot():
+    def listings(params):
+        start, limit = params["start"], params["limit"]
+        return {"status": {"total_count": 10000}, "data": [{"id": i} for i in range(start, start + limit)]}
+
+    transport = CountingTransport(listings)
+    processor = CryptoETLProcessor("sqlite://", "crypto_data", max_workers=8, transport=transport,
+                                   slot=threading.BoundedSemaphore(2))
+    payload = processor.fetch_data("http://localhost/listings")
+
+    assert len(payload["data"]) == 10000
+    assert len(transport.requests) == 10
+    assert transport.peak == 2
+
+
+def test_news_queries_and_pages_hold_the_provider_slot():
+    def feed(params):
+        # Two full pages per query, then a short one.
+        page = sum(1 for request in transport.requests if request.get("tickers") == params.get("tickers")
+                   and request.get("topics") == params.get("topics"))
+        size = PAGE_LIMIT if page < 3 else 1
+        query = params.get("tickers") or params.get("topics")
+        return {"feed": [{"url": f"{query}/{page}/{i}", "time_published": f"2024060{page}T{i % 24:02d}0000"}
+                         for i in range(size)]}
+
+    transport = CountingTransport(feed)
+    processor = NewsSentimentETLProcessor("sqlite://", "news_sentiment", max_workers=4, transport=transport,
+                                          slot=threading.BoundedSemaphore(2))
+    payload = processor.fetch_data("http://localhost/query", {"tickers": ["A", "B", "C"], "topics": ["d"]})
+
+    assert len(transport.requests) == 12
+    assert len(payload["feed"]) == 4 * (2 * PAGE_LIMIT + 1)
+    assert transport.peak == 2
+
+
+def test_news_fetch_fails_when_any_query_fails():
+    def feed(params):
+        if params.get("tickers") == "B" and params.get("time_from"):
+            raise RateLimitError("Thank you for using Alpha Vantage!")
+        return {"feed": [{"url": f"{params.get('tickers')}/{i}", "time_published": f"20240601T{i:02d}0000"}
+                         for i in range(PAGE_LIMIT)] if "time_from" not in params else []}
+
+    processor = NewsSentimentETLProcessor("sqlite://", "news_sentiment", transport=CountingTransport(feed))
+    # Ticker B's second page fails: loading A and the first page of B would
+    # move the shared watermark past B's missing articles.
+    assert processor.fetch_data("http://localhost/query", {"tickers": ["A", "B"]}) is None
+    assert processor.fetch_data("http://localhost/query", {"tickers": ["A"]}) is not None
+
+
+class RecordingConnection:
+    """
+    Stand-in DB-API connection recording what bulk_upsert executes.
+    """
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.statements = []
+        self.copied = []
+        self.committed = self.rolled_back = 0
+        self.rowcount = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, statement):
+        if self.fail_on and self.fail_on in statement:
+            raise RuntimeError(f"failed: {statement}")
+        self.statements.append(statement)
+
+    def copy_expert(self, statement, buffer):
+        self.copied.append((statement, buffer.read()))
+        self.rowcount = len(self.copied[-1][1].splitlines())
+
+    def commit(self):
+        self.committed += 1
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def close(self):
+        pass
+
+
+class RecordingEngine:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def raw_connection(self):
+        return self.connection
+
+
+class StringSchema:
+    def get_upsert_statement(self, table_name, columns):
+        table = Table(table_name, MetaData(), *[Column(name, String) for name in columns])
+        return UpsertStatement(table, columns, lambda name: f'"{name}"')
+
+
+def test_bulk_upsert_stages_each_chunk_in_one_transaction(monkeypatch):
+    monkeypatch.setattr(bulk_loader, "get_schema", lambda engine: StringSchema())
+    df = pd.DataFrame({"symbol": ["AAPL", "MSFT", "AMZN", "NVDA", "TSLA"], "name": list("abcde")})
+    connection = RecordingConnection()
+
+    assert bulk_loader.bulk_upsert(RecordingEngine(connection), "quotes", df, chunk_size=2) == (5, 0)
+    staging = '"_staging_quotes"'
+    assert connection.statements == [
+        f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT "symbol", "name" FROM "quotes" WITH NO DATA',
+        *[f'INSERT INTO "quotes" ("symbol", "name") SELECT "symbol", "name" FROM {staging} ON CONFLICT DO NOTHING',
+          f"TRUNCATE {staging}"] * 3,
+    ]
+    assert [rows for _, rows in connection.copied] == ["AAPL,a\nMSFT,b\n", "AMZN,c\nNVDA,d\n", "TSLA,e\n"]
+    assert (connection.committed, connection.rolled_back) == (1, 0)
+
+    connection = RecordingConnection(fail_on="TRUNCATE")
+    with pytest.raises(RuntimeError):
+        bulk_loader.bulk_upsert(RecordingEngine(connection), "quotes", df, chunk_size=2)
+    assert (connection.committed, connection.rolled_back) == (0, 1)
+
+
+def test_schema_registry_reflects_again_after_a_version_change(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'registry.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE schema_version (version INTEGER)")
+        connection.exec_driver_sql("INSERT INTO schema_version VALUES (1)")
+        connection.exec_driver_sql("CREATE TABLE quotes (symbol TEXT PRIMARY KEY, price NUMERIC)")
+    registry = SchemaRegistry(engine, check_interval=0)
+
+    statement = registry.get_upsert_statement("quotes", ["symbol", "price"])
+    assert registry.get_upsert_statement("quotes", ["symbol", "price"]) is statement
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE quotes ADD COLUMN volume INTEGER")
+    with pytest.raises(ValueError):
+        registry.get_upsert_statement("quotes", ["symbol", "volume"])
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE schema_version SET version = 2")
+    assert "volume" in registry.get_table("quotes").c
+    assert registry.get_upsert_statement("quotes", ["symbol", "price"]) is not statement
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE quotes ADD COLUMN name TEXT")
+    registry.invalidate()
+    assert "name" in registry.get_table("quotes").c
+
+
+def test_rollup_statement_overwrites_buckets_on_conflict():
+    crypto = str(rollups._rollup_statement("crypto_data", "hourly"))
+    assert crypto.startswith(
+        "INSERT INTO crypto_ohlc_hourly (id, bucket, symbol, volume_24h, open, high, low, close, samples) "
+    )
+    assert "unnest(CAST(:keys AS INT[]), CAST(:buckets AS TIMESTAMP[])) AS touched (id, bucket)" in crypto
+    assert "raw.last_updated < touched.bucket + INTERVAL '1 hour'" in crypto
+    assert crypto.endswith(
+        "GROUP BY touched.id, touched.bucket ON CONFLICT (id, bucket) DO UPDATE SET "
+        "symbol = EXCLUDED.symbol, volume_24h = EXCLUDED.volume_24h, open = EXCLUDED.open, "
+        "high = EXCLUDED.high, low = EXCLUDED.low, close = EXCLUDED.close, samples = EXCLUDED.samples"
+    )
+
+    gold = str(rollups._rollup_statement("gold_price_history", "daily"))
+    assert gold.startswith("INSERT INTO gold_ohlc_daily (bucket, open, high, low, close, samples) ")
+    assert "INTERVAL '1 day'" in gold and "ON CONFLICT (bucket) DO UPDATE SET open = EXCLUDED.open" in gold
+
+
+def test_update_rollups_rebuilds_only_the_touched_buckets():
+    executed = []
+
+    class Connection:
+        def execute(self, statement, parameters):
+            executed.append((str(statement), parameters))
+            return type("Result", (), {"rowcount": len(parameters["buckets"])})()
+
+    class Engine:
+        @contextmanager
+        def begin(self):
+            yield Connection()
+
+    df = pd.DataFrame({
+        "id": [1, 1, 1027, 1],
+        "last_updated": pd.to_datetime(["2024-06-01 10:05", "2024-06-01 10:55", "2024-06-01 10:30",
+                                        "2024-06-01 11:10"]),
+    })
+    assert rollups.update_rollups(Engine(), "crypto_data", df) == {"hourly": 3, "daily": 2}
+
+    (hourly_sql, hourly), (daily_sql, daily) = executed
+    assert "crypto_ohlc_hourly" in hourly_sql and "crypto_ohlc_daily" in daily_sql
+    assert sorted(zip(hourly["keys"], hourly["buckets"])) == [
+        (1, datetime(2024, 6, 1, 10)), (1, datetime(2024, 6, 1, 11)), (1027, datetime(2024, 6, 1, 10)),
+    ]
+    assert sorted(zip(daily["keys"], daily["buckets"])) == [(1, datetime(2024, 6, 1)), (1027, datetime(2024, 6, 1))]
+    assert rollups.update_rollups(Engine(), "sp500_index_data", df) == {}
+
+
+def test_news_children_load_in_the_articles_transaction(monkeypatch):
+    monkeypatch.setattr(bulk_loader, "get_schema", lambda engine: StringSchema())
+    df = NewsSentimentETLProcessor.spec.transform(load_fixture("av_news_sentiment.json"))
+    processor = NewsSentimentETLProcessor("sqlite://", "news_sentiment")
+
+    processor.engine = RecordingEngine(RecordingConnection())
+    assert processor.upsert_data(df) == (len(df), 0)
+    connection = processor.engine.connection
+    assert connection.committed == 1
+    assert [statement.split(" (")[0] for statement, _ in connection.copied] == [
+        'COPY "_staging_news_sentiment"', 'COPY "_staging_news_ticker_sentiment"', 'COPY "_staging_news_topics"',
+    ]
+
+    processor.engine = RecordingEngine(RecordingConnection(fail_on='INSERT INTO "news_topics"'))
+    assert processor.upsert_data(df) is None
+    assert (processor.engine.connection.committed, processor.engine.connection.rolled_back) == (0, 1)
+
+
+def test_replay_processes_archived_payloads_in_spawned_workers(tmp_path, monkeypatch):
+    archive = PayloadArchive(str(tmp_path))
+    payload = load_fixture("av_treasury_yield.json")
+    archive.store("treasury_yields", payload)
+    archive.store("treasury_yields", {**payload, "data": payload["data"][:5]})
+    archive.store("treasury_yields", payload)
+
+    processor = TreasuryYieldETLProcessor("sqlite://", "treasury_yields", archive=archive)
+    loaded = []
+    monkeypatch.setattr(processor, "load_frame", lambda df, digest=None: loaded.append(df) or (len(df), 0))
+
+    assert processor.replay(max_workers=2) == (102, 0)
+    assert len(loaded) == 1
+    assert not loaded[0]["value"].isna().any()
+
+
+def test_write_behind_quarantines_frames_that_keep_failing():
+    class FailingProcessor:
+        table_name = "gold_price_history"
+
+        def __init__(self):
+            self.quarantined = []
+
+        def load_frame(self, df):
+            return None
+
+        def quarantine_rows(self, rejected):
+            self.quarantined.append(rejected)
+            return len(rejected)
+
+    processor = FailingProcessor()
+    writer = WriteBehindQueue(processor, max_flush_attempts=3)
+    writer.put(pd.DataFrame({"price": [1.0, 2.0]}))
+    writer._flush(writer._take())
+    writer.put(pd.DataFrame({"price": [3.0]}))
+    writer._flush(writer._take())
+    writer._flush(writer._take())
+
+    # The first frame failed three flushes; the second has two and is still queued.
+    assert processor.quarantined[0]["price"].tolist() == [1.0, 2.0]
+    assert processor.quarantined[0]["reasons"].tolist() == [["flush_failed"]] * 2
+    assert [(frame["price"].tolist(), attempts) for frame, attempts in writer._pending] == [([3.0], 2)]
+    assert writer.stats["rows_quarantined"] == 2
+    assert writer.stats["failed_flushes"] == 3
+
+
+def wilder_average(values):
+    """
+    Wilder's smoothing seeded with the simple mean of the first RSI_PERIOD values.
+    """
+    seeded = pd.concat([values.iloc[:RSI_PERIOD].expanding().mean(), values.iloc[RSI_PERIOD:]])
+    smoothed = seeded.iloc[RSI_PERIOD - 1:].ewm(alpha=1.0 / RSI_PERIOD, adjust=False).mean()
+    return pd.concat([seeded.iloc[:RSI_PERIOD - 1], smoothed])
+
+
+def test_indicators_match_pandas(tmp_path):
+    rng = np.random.default_rng(3)
+    times = pd.date_range("2024-01-01", periods=80, freq="D")
+    prices = {key: pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(times)))), index=times)
+              for key in ("BTC", "ETH")}
+    bars = pd.concat([pd.DataFrame({"key": key, "time": times, "price": series.to_numpy()})
+                      for key, series in prices.items()]).sample(frac=1, random_state=0)
+
+    # Two batches with the state saved and reloaded in between.
+    path = str(tmp_path / "state.npz")
+    first = bars[bars["time"] < times[45]]
+    state = IndicatorState()
+    outputs = [state.update(first["key"].to_numpy(), first["time"], first["price"].to_numpy())]
+    state.save(path)
+    second = bars[bars["time"] >= times[45]]
+    state = IndicatorState.load(path)
+    outputs.append(state.update(second["key"].to_numpy(), second["time"], second["price"].to_numpy()))
+    result = pd.concat(outputs).set_index(["series_key", "time"]).sort_index()
+
+    for key, price in prices.items():
+        change = price.diff().iloc[1:]
+        log_return = np.log(price).diff()
+        gain, loss = wilder_average(change.clip(lower=0)), wilder_average((-change).clip(lower=0))
+        expected = pd.DataFrame({
+            f"sma_{WINDOW}": price.rolling(WINDOW).mean(),
+            f"ema_{EMA_FAST}": price.ewm(span=EMA_FAST, adjust=False).mean(),
+            f"ema_{EMA_SLOW}": price.ewm(span=EMA_SLOW, adjust=False).mean(),
+            f"rsi_{RSI_PERIOD}": (100 - 100 / (1 + gain / loss)).where(np.arange(len(change)) >= RSI_PERIOD - 1),
+            "bollinger_upper": price.rolling(WINDOW).mean() + BOLLINGER_K * price.rolling(WINDOW).std(ddof=0),
+            "bollinger_lower": price.rolling(WINDOW).mean() - BOLLINGER_K * price.rolling(WINDOW).std(ddof=0),
+            f"realized_vol_{WINDOW}": log_return.rolling(WINDOW).std(),
+        })
+        actual = result.loc[key].reindex(columns=expected.columns)
+        pd.testing.assert_frame_equal(actual, expected, check_names=False, check_freq=False, rtol=1e-8)
+
+
+def test_overlapping_indicator_updates_keep_every_series(tmp_path, monkeypatch):
+    def slow_upsert(engine, table_name, df, **kwargs):
+        time.sleep(0.2)
+        return len(df), 0
+
+    monkeypatch.setattr(indicators, "bulk_upsert", slow_upsert)
+    times = pd.date_range("2024-01-01", periods=3, freq="h")
+    batches = [
+        pd.DataFrame({"id": [coin] * 3, "last_updated": times, "price": [1.0, 2.0, 3.0]})
+        for coin in (1, 1027)
+    ]
+    threads = [
+        threading.Thread(target=update_indicators, args=(None, "crypto_data", df), kwargs={"state_dir": str(tmp_path)})
+        for df in batches
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    state = IndicatorState.load(str(tmp_path / "crypto_data.npz"))
+    assert sorted(state.keys) == [1, 1027]
+    assert state.price_count.tolist() == [3, 3]
+
+
+@contextmanager
+def simulated_providers(simulator):
+    """
+    Serve a ProviderSimulator on a free local port for the block; yields its base URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), provider_simulator.make_handler(simulator))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_simulated_listings_page_through_the_crypto_processor():
+    simulator = ProviderSimulator(latency_ms=0, crypto_count=250)
+    with simulated_providers(simulator) as base_url:
+        processor = CryptoETLProcessor("sqlite://", "crypto_data", transport=HTTPTransport())
+        processor.page_size = 100
+        payload = processor.fetch_data(f"{base_url}/v1/cryptocurrency/listings/latest", {"convert": "USD"},
+                                       {"X-CMC_PRO_API_KEY": "test"})
+
+    assert [listing["id"] for listing in payload["data"]] == list(range(1, 251))
+    assert simulator.stats["coinmarketcap_requests"] == 3
+    df = processor.process_data(payload)
+    assert len(df) == 250 and df["price"].notna().all()
+
+
+def test_simulated_alpha_vantage_throttle_bodies(monkeypatch):
+    monkeypatch.setattr(http_transport.time, "sleep", lambda seconds: None)
+    url_parameters = {"function": "FEDERAL_FUNDS_RATE", "apikey": "test"}
+
+    simulator = ProviderSimulator(latency_ms=0, quotas={"alpha_vantage": (1, None)})
+    with simulated_providers(simulator) as base_url:
+        transport = HTTPTransport(max_retries=2)
+        assert transport.get_json(f"{base_url}/query", url_parameters)["data"]
+        # Every retry within the minute gets the "Note" body again.
+        with pytest.raises(RateLimitError) as error:
+            transport.get_json(f"{base_url}/query", url_parameters)
+    assert str(error.value) == AV_NOTE.format(per_minute=1)
+    assert simulator.stats["alpha_vantage_throttled_minute"] == 3
+
+    simulator = ProviderSimulator(latency_ms=0, quotas={"alpha_vantage": (None, 1)})
+    with simulated_providers(simulator) as base_url:
+        transport = HTTPTransport(max_retries=2)
+        transport.get_json(f"{base_url}/query", url_parameters)
+        # The daily limit's "Information" body is not retried.
+        with pytest.raises(RateLimitError) as error:
+            transport.get_json(f"{base_url}/query", url_parameters)
+    assert str(error.value) == AV_INFORMATION.format(per_day=1)
+    assert simulator.stats["alpha_vantage_throttled_day"] == 1
+
+
+def test_simulated_error_fraction():
+    simulator = ProviderSimulator(latency_ms=0, error_rate=0.25, seed=3)
+    statuses = []
+    with simulated_providers(simulator) as base_url, requests.Session() as session:
+        for _ in range(400):
+            response = session.get(f"{base_url}/api/XAU/USD", headers={"x-access-token": "test"})
+            statuses.append(response.status_code)
+            if response.status_code != 200:
+                assert response.headers["Retry-After"] == "1"
+
+    errors = [status for status in statuses if status != 200]
+    assert set(errors) <= set(ERROR_STATUSES)
+    assert 0.18 < len(errors) / len(statuses) < 0.32
+    assert simulator.stats["goldapi_errors"] == len(errors)
@@ -0,0 +1,215 @@
+"""
+ETL benchmarks driven by the recorded API payloads in tests/fixtures.
+
+Every payload is scaled synthetically (10x, 100x and 1000x by default, see
+SIGNAL_BENCH_SCALES) and process_data, validate_and_truncate and upsert_data
+are timed per processor. validate_and_truncate and upsert_data are only
+measured when SIGNAL_BENCH_DATABASE_URL points at a disposable PostgreSQL
+database, since validation only uses the table definitions there: its
+public schema is dropped and recreated from database/schema.sql.
+
+The benchmarks are not part of the unit suite. Run them with
+`SIGNAL_BENCH=1 pytest tests/test_etl_benchmark.py`; the rows/sec and peak
+memory of each stage are printed and saved under tests/benchmarks/results,
+compared with the previous run.
+"""
+import json
+import os
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import pytest
+
+if not os.environ.get("SIGNAL_BENCH"):
+    pytest.skip("SIGNAL_BENCH is not set", allow_module_level=True)
+
+pd = pytest.importorskip("pandas")
+
+from sqlalchemy import text
+
+from crypto_etl import CryptoETLProcessor
+from database_setup import create_schema
+from federal_funds_rate_etl import FederalFundsRateETLProcessor
+from gold_etl import GoldETLProcessor
+from news_sentiment_etl import NewsSentimentETLProcessor
+from registry import get_engine
+from sp500_etl import SP500ETLProcessor
+from treasury_yield_etl import TreasuryYieldETLProcessor
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+SCALES = [int(scale) for scale in os.environ.get("SIGNAL_BENCH_SCALES", "10,100,1000").split(",")]
+# Timed runs per stage; the fastest is recorded, which is the least noisy.
+REPEATS = int(os.environ.get("SIGNAL_BENCH_REPEATS", 3))
+
+# Offset added to CoinMarketCap ids for each synthetic copy of the listings.
+CRYPTO_ID_STRIDE = 1000000
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _days_back(last_day, count):
+    last_day = date.fromisoformat(last_day)
+    return [(last_day - timedelta(days=i)).isoformat() for i in range(count)]
+
+
+def scale_crypto(payload, factor):
+    """
+    One listings response with `factor` copies of every coin under new ids.
+    """
+    listings = [
+        {**listing, "id": listing["id"] + copy * CRYPTO_ID_STRIDE}
+        for copy in range(factor)
+        for listing in payload["data"]
+    ]
+    return [{**payload, "status": {**payload["status"], "total_count": len(listings)}, "data": listings}]
+
+
+def scale_gold(payload, factor):
+    """
+    `factor` spot-price responses one minute apart.
+    """
+    return [{**payload, "timestamp": payload["timestamp"] - minute * 60} for minute in range(factor)]
+
+
+def scale_daily_series(payload, factor):
+    """
+    A TIME_SERIES_DAILY response extended back in time with the recorded bars repeated.
+    """
+    key = "Time Series (Daily)"
+    bars = list(payload[key].values())
+    days = _days_back(max(payload[key]), len(bars) * factor)
+    return [{**payload, key: {day: bars[i % len(bars)] for i, day in enumerate(days)}}]
+
+
+def scale_economic_series(payload, factor):
+    """
+    A TREASURY_YIELD or FEDERAL_FUNDS_RATE response extended back in time.
+    """
+    values = [row["value"] for row in payload["data"]]
+    days = _days_back(max(row["date"] for row in payload["data"]), len(values) * factor)
+    return [{**payload, "data": [{"date": day, "value": values[i % len(values)]} for i, day in enumerate(days)]}]
+
+
+def scale_news(payload, factor):
+    """
+    One NEWS_SENTIMENT response with `factor` copies of every article under new urls.
+    """
+    feed = [
+        {**article, "url": f"{article['url']}?copy={copy}"}
+        for copy in range(factor)
+        for article in payload["feed"]
+    ]
+    return [{**payload, "items": str(len(feed)), "feed": feed}]
+
+
+# source -> (processor class, table, recorded payload, scaler)
+SOURCES = {
+    "crypto": (CryptoETLProcessor, "crypto_data", "cmc_listings.json", scale_crypto),
+    "gold": (GoldETLProcessor, "gold_price_history", "goldapi_xau_usd.json", scale_gold),
+    "sp500": (SP500ETLProcessor, "sp500_index_data", "av_time_series_daily.json", scale_daily_series),
+    "treasury_yield": (TreasuryYieldETLProcessor, "treasury_yields", "av_treasury_yield.json", scale_economic_series),
+    "federal_funds_rate": (FederalFundsRateETLProcessor, "federal_funds_rate", "av_federal_funds_rate.json",
+                           scale_economic_series),
+    "news_sentiment": (NewsSentimentETLProcessor, "news_sentiment", "av_news_sentiment.json", scale_news),
+}
+
+
+def measure(fn, setup=None, repeats=REPEATS):
+    """
+    Run fn `repeats` times timed, keeping the fastest, and once under
+    tracemalloc for its peak allocation, calling setup before each run.
+    Returns (result, seconds, peak bytes).
+    """
+    seconds = None
+    for _ in range(repeats):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+@pytest.fixture(scope="session")
+def bench_engine():
+    """
+    Engine for the disposable benchmark database, or None when it is not configured.
+    """
+    database_url = os.environ.get("SIGNAL_BENCH_DATABASE_URL")
+    if not database_url:
+        return None
+    engine = get_engine(database_url)
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE"))
+        connection.execute(text("CREATE SCHEMA public"))
+    create_schema(engine)
+    return engine
+
+
+@pytest.mark.parametrize("scale", SCALES)
+@pytest.mark.parametrize("source", list(SOURCES))
+def test_etl_throughput(source, scale, bench_engine, benchmark_results):
+    processor_cls, table_name, fixture, scaler = SOURCES[source]
+    payloads = scaler(load_fixture(fixture), scale)
+    database_url = bench_engine.url.render_as_string(hide_password=False) if bench_engine else "sqlite://"
+    processor = processor_cls(database_url, table_name)
+
+    def record(stage, rows, seconds, peak):
+        benchmark_results.append({
+            "source": source, "scale": scale, "stage": stage, "rows": rows, "seconds": seconds,
+            "rows_per_sec": rows / seconds if seconds else 0.0, "peak_mb": peak / 2 ** 20,
+        })
+
+    # process_data calls validate_and_truncate itself; keep its inputs so the
+    # validation step can also be timed on its own.
+    validate = processor.validate_and_truncate
+    validate_inputs = []
+
+    def capture_validate(df):
+        validate_inputs.append(df)
+        return validate(df)
+
+    processor.validate_and_truncate = capture_validate
+    frames, seconds, peak = measure(lambda: [processor.process_data(payload) for payload in payloads],
+                                    setup=validate_inputs.clear)
+    processor.validate_and_truncate = validate
+    df = pd.concat(frames, ignore_index=True)
+    assert len(df) > 0
+    record("process_data", len(df), seconds, peak)
+
+    # Without PostgreSQL there is no TableValidator, and timing the spec
+    # fallback would not say anything about the production path.
+    if bench_engine is None:
+        return
+
+    copies = []
+
+    def copy_inputs():
+        copies[:] = [frame.copy() for frame in validate_inputs]
+
+    _, seconds, peak = measure(lambda: [validate(frame) for frame in copies], setup=copy_inputs)
+    record("validate_and_truncate", sum(len(frame) for frame in validate_inputs), seconds, peak)
+
+    def truncate():
+        with bench_engine.begin() as connection:
+            connection.execute(text(f"TRUNCATE {table_name} CASCADE"))
+
+    result, seconds, peak = measure(lambda: processor.upsert_data(df), setup=truncate)
+    assert result is not None
+    inserted, _ = result
+    record("upsert_data", inserted, seconds, peak)
@@ -0,0 +1,301 @@
+import os
+from contextlib import nullcontext
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import data_access
+import preprocessing
+from correlation import EWMA_LAMBDAS, MIN_PERIODS_FRACTION, WINDOWS, CorrelationState
+from data_access import DataAccess, LRUCache
+from predict import PredictionService
+from preprocessing import REVISION_DAYS, FeatureStore, build_features
+from train_model import fit_ridge, predict, split_xy, train_final_model, walk_forward_folds
+
+
+def daily_series(calendar):
+    """
+    One series per DAILY_SERIES entry: S&P 500 and rates on weekdays only,
+    gold every day, news sentiment on some days.
+    """
+    rng = np.random.default_rng(7)
+    weekdays = calendar[calendar.dayofweek < 5]
+    return {
+        "sp500_close": pd.Series(4000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(weekdays)))), index=weekdays),
+        "sp500_volume": pd.Series(rng.uniform(1e6, 2e6, len(weekdays)), index=weekdays),
+        "gold_close": pd.Series(2000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(calendar)))), index=calendar),
+        "treasury_10y": pd.Series(4 + np.cumsum(rng.normal(0, 0.02, len(weekdays))), index=weekdays),
+        "fed_funds_rate": pd.Series(5.25, index=weekdays),
+        "news_sentiment": pd.Series(rng.normal(0, 0.2, 10), index=calendar[::3][:10]),
+    }
+
+
+def test_returns_are_taken_between_observations():
+    calendar = pd.date_range("2024-01-01", "2024-02-29", freq="D")
+    series = daily_series(calendar)
+    features = build_features(series, calendar)
+
+    weekend = calendar.dayofweek >= 5
+    # Levels are carried over the weekend, returns are not.
+    assert not features["sp500_close"][weekend].isna().any()
+    assert features["sp500_close_ret_1d"][weekend].isna().all()
+    assert features["treasury_10y_diff_1d"][weekend].isna().all()
+
+    # Monday's return is measured from Friday's close and its lag is Friday's return.
+    observed = np.log(series["sp500_close"])
+    expected = observed.diff()
+    pd.testing.assert_series_equal(features["sp500_close_ret_1d"][~weekend], expected, check_names=False,
+                                   check_freq=False)
+    pd.testing.assert_series_equal(features["sp500_close_ret_1d_lag1"][~weekend], expected.shift(1),
+                                   check_names=False, check_freq=False)
+    pd.testing.assert_series_equal(features["sp500_close_ret_5d"][~weekend], observed.diff(5),
+                                   check_names=False, check_freq=False)
+    # A series observed every day is unchanged.
+    pd.testing.assert_series_equal(features["gold_close_ret_1d"], np.log(series["gold_close"]).diff(),
+                                   check_names=False, check_freq=False)
+
+
+class NoCrypto:
+    """
+    Stand-in DataAccess whose crypto universe query returns no symbols.
+    """
+    class engine:
+        @staticmethod
+        def connect():
+            return nullcontext(SimpleNamespace(execute=lambda *args: []))
+
+
+def test_feature_store_revises_trailing_rows(tmp_path, monkeypatch):
+    calendar = pd.date_range("2024-01-01", "2024-02-29", freq="D")
+    series = daily_series(calendar)
+    monkeypatch.setattr(preprocessing, "get_data_access", lambda database_url: NoCrypto())
+    monkeypatch.setattr(preprocessing, "_read_series", lambda data, start, symbols: {
+        name: values[(values.index >= pd.Timestamp(start)) & (values.index <= available)]
+        for name, values in series.items()
+    })
+    store = FeatureStore(str(tmp_path), database_url="sqlite://")
+
+    available = pd.Timestamp("2024-01-31")
+    assert store.update(until=date(2024, 1, 31)) == 31
+    _, before, columns = store.load()
+    before = np.array(before)
+
+    # Jan 28's sentiment is revised once more articles are indexed, and five new days arrive.
+    series["news_sentiment"] = series["news_sentiment"].copy()
+    series["news_sentiment"][pd.Timestamp("2024-01-28")] = 0.9
+    available = pd.Timestamp("2024-02-05")
+    assert store.update(until=date(2024, 2, 5)) == 5
+
+    dates, after, _ = store.load()
+    assert list(dates) == list(np.arange("2024-01-01", "2024-02-06", dtype="datetime64[D]"))
+    sentiment = columns.index("news_sentiment")
+    assert after[dates.tolist().index(date(2024, 1, 28)), sentiment] == 0.9
+    assert before[27, sentiment] != 0.9
+    # Rows before the revision window are left as they were.
+    np.testing.assert_array_equal(after[:31 - preprocessing.REVISION_DAYS], before[:31 - preprocessing.REVISION_DAYS])
+
+
+def test_correlation_state_matches_pandas(tmp_path):
+    rng = np.random.default_rng(11)
+    dates = pd.date_range("2023-01-01", periods=320, freq="D")
+    mixing = np.array([[1.0, 0.0, 0.0, 0.0], [0.6, 0.8, 0.0, 0.0], [0.3, 0.2, 0.9, 0.0], [-0.4, 0.1, 0.0, 0.9]])
+    returns = pd.DataFrame(rng.normal(0, 0.01, (len(dates), 4)) @ mixing.T, index=dates,
+                           columns=["sp500_close", "gold_close", "crypto_BTC_close", "stock_AAPL_close"])
+    # A stock that trades on weekdays only and a coin listed partway through.
+    returns.loc[returns.index.dayofweek >= 5, "stock_AAPL_close"] = np.nan
+    returns.iloc[:200, 2] = np.nan
+
+    # Two updates with the state saved and reloaded in between.
+    path = str(tmp_path / "state.npz")
+    state = CorrelationState()
+    state.update(returns.iloc[:150])
+    state.save(path)
+    state = CorrelationState.load(path)
+    state.update(returns.iloc[150:])
+
+    for window in WINDOWS:
+        min_periods = max(2, int(np.ceil(window * MIN_PERIODS_FRACTION)))
+        recent = returns.iloc[-window:]
+        cov, corr = state.matrices(f"w{window}")
+        np.testing.assert_allclose(cov, recent.cov(min_periods=min_periods).to_numpy(), rtol=1e-7, atol=1e-12)
+        np.testing.assert_allclose(corr, recent.corr(min_periods=min_periods).to_numpy(), rtol=1e-7, atol=1e-9)
+
+    for lam in EWMA_LAMBDAS:
+        expected = np.array([[(returns[a] * returns[b]).dropna().ewm(alpha=1 - lam).mean().iloc[-1]
+                              for b in returns] for a in returns])
+        cov, corr = state.matrices(f"ewma{lam:g}")
+        np.testing.assert_allclose(cov, expected, rtol=1e-7)
+        std = np.sqrt(np.diag(expected))
+        np.testing.assert_allclose(corr, expected / np.outer(std, std), rtol=1e-7)
+
+
+def test_correlation_state_reapplies_revised_days(tmp_path):
+    rng = np.random.default_rng(5)
+    dates = pd.date_range("2023-01-01", periods=300, freq="D")
+    returns = pd.DataFrame(rng.normal(0, 0.01, (len(dates), 3)), index=dates,
+                           columns=["sp500_close", "gold_close", "stock_AAPL_close"])
+    returns.loc[returns.index.dayofweek >= 5, "stock_AAPL_close"] = np.nan
+    revised = returns.copy()
+    revised.iloc[280 - REVISION_DAYS:280] += rng.normal(0, 0.01, (REVISION_DAYS, 3))
+
+    # Past the ring size, so the rollback has to restore days that left the largest window.
+    path = str(tmp_path / "state.npz")
+    state = CorrelationState()
+    state.update(returns.iloc[:280])
+    state.save(path)
+    state = CorrelationState.load(path)
+    assert state.update(revised.iloc[280 - REVISION_DAYS:]) == 20 + REVISION_DAYS
+
+    expected = CorrelationState()
+    expected.update(revised)
+    for key in expected.keys():
+        for actual, wanted in zip(state.matrices(key), expected.matrices(key)):
+            np.testing.assert_allclose(actual, wanted, rtol=1e-7, atol=1e-12)
+    average = [column for column in expected.regime_columns if column.startswith("avg_corr")]
+    pd.testing.assert_frame_equal(state.regime_frame()[average], expected.regime_frame()[average])
+
+
+def test_walk_forward_folds_roll_without_overlap():
+    rows, train_size, test_size = 20, 8, 5
+    folds = walk_forward_folds(rows, train_size, test_size)
+    assert folds == [(0, 8, 13), (5, 13, 18), (10, 18, 19)]
+
+    features = np.arange(rows, dtype=float)[:, None].repeat(2, axis=1)
+    scored = []
+    for train_start, test_start, test_stop in folds:
+        assert test_start - train_start == train_size
+        X_train, Y_train = split_xy(features, train_start, test_start, [1])
+        X_test, Y_test = split_xy(features, test_start, test_stop, [1])
+        # Day t's features predict day t + 1's return.
+        np.testing.assert_array_equal(Y_train[:, 0], X_train[:, 0] + 1)
+        np.testing.assert_array_equal(Y_test[:, 0], X_test[:, 0] + 1)
+        # No training target falls in the test period.
+        assert Y_train[:, 0].max() < Y_test[:, 0].min()
+        scored.extend(X_test[:, 0])
+    # Test windows are contiguous, and the last row (no next day) is never scored.
+    assert scored == list(range(train_size, rows - 1))
+    assert walk_forward_folds(train_size + 1, train_size, test_size) == []
+
+
+def test_fit_ridge_matches_least_squares():
+    rng = np.random.default_rng(3)
+    X = rng.normal(2.0, 3.0, (40, 4))
+    Y = X @ rng.normal(size=(4, 2)) + rng.normal(0, 0.1, (40, 2))
+    alpha = 5.0
+
+    model = fit_ridge(X, Y, alpha)
+    # Ridge is least squares on the standardized features with sqrt(alpha) * I
+    # rows appended, against the centred targets.
+    Xs = (X - X.mean(axis=0)) / X.std(axis=0)
+    augmented = np.vstack([Xs, np.sqrt(alpha) * np.eye(4)])
+    targets = np.vstack([Y - Y.mean(axis=0), np.zeros((4, 2))])
+    weights, *_ = np.linalg.lstsq(augmented, targets, rcond=None)
+
+    np.testing.assert_allclose(model["weights"], weights, rtol=1e-10)
+    np.testing.assert_allclose(predict(model, X), Xs @ weights + Y.mean(axis=0), rtol=1e-10)
+
+
+class MemoryStore:
+    """
+    Stand-in FeatureStore over an in-memory matrix, counting full loads.
+    """
+    def __init__(self, features, columns):
+        self.features = features
+        self.columns = columns
+        self.loads = 0
+
+    def read_meta(self):
+        return {"rows": len(self.features), "columns": self.columns}
+
+    def load(self):
+        self.loads += 1
+        dates = pd.date_range("2024-01-01", periods=len(self.features), freq="D").strftime("%Y-%m-%d")
+        return np.array(dates), self.features, self.columns
+
+
+def test_prediction_service_folds_standardization_into_weights(tmp_path):
+    rng = np.random.default_rng(5)
+    columns = ["sp500_ret_1d", "gold_ret_1d", "treasury_10y", "news_sentiment"]
+    features = rng.normal(0.5, 2.0, (60, len(columns)))
+    features[-1, 3] = np.nan
+    store = MemoryStore(features, columns)
+    path = str(tmp_path / "ridge.npz")
+    model = train_final_model(store, alpha=10.0, train_size=40, path=path)
+
+    service = PredictionService(store, model_path=path)
+    result = service.predict()
+    expected = predict(model, features[-1:])[0]
+    assert result["as_of"] == "2024-02-29"
+    assert list(result["predictions"]) == ["sp500", "gold"]
+    np.testing.assert_allclose(list(result["predictions"].values()), expected, rtol=1e-10)
+    assert service.predict(["gold"])["predictions"]["gold"] == pytest.approx(expected[1], rel=1e-10)
+
+
+def test_prediction_service_refreshes_only_on_changes(tmp_path):
+    rng = np.random.default_rng(6)
+    columns = ["sp500_ret_1d", "gold_ret_1d"]
+    store = MemoryStore(rng.normal(size=(30, 2)), columns)
+    path = str(tmp_path / "ridge.npz")
+    train_final_model(store, alpha=1.0, train_size=20, path=path)
+
+    service = PredictionService(store, model_path=path)
+    model, loads = service.model, store.loads
+    service.refresh()
+    assert service.model is model and store.loads == loads
+
+    store.features = np.vstack([store.features, rng.normal(size=(1, 2))])
+    service.refresh()
+    assert service.model is model and store.loads == loads + 1
+    assert service.latest_date == "2024-01-31"
+
+    mtime = os.path.getmtime(path)
+    os.utime(path, (mtime + 10, mtime + 10))
+    service.refresh()
+    assert service.model is not model and store.loads == loads + 2
+
+
+def test_lru_cache_is_bounded_by_bytes():
+    cache = LRUCache(max_bytes=100)
+    cache.put("a", 1, 40)
+    cache.put("b", 2, 40)
+    assert cache.get("a") == 1
+    cache.put("c", 3, 40)
+    # "b" was the least recently used.
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.bytes == 80
+
+    cache.put("a", 4, 10)
+    assert cache.get("a") == 4 and cache.bytes == 50
+    cache.put("huge", 5, 101)
+    assert cache.get("huge") is None and cache.bytes == 50
+    cache.discard(lambda key: key == "c")
+    assert cache.get("c") is None and cache.bytes == 10
+
+
+def test_data_access_drops_a_source_when_its_version_changes(monkeypatch):
+    versions = {"gold_price_history": (date(2024, 6, 1), 10), "sp500_index_data": (date(2024, 6, 1), 20)}
+    reads = []
+
+    def read_chunks(self, name, start=None, end=None, keys=None):
+        reads.append(name)
+        yield {column: np.zeros(3, dtype=dtype) for column, dtype in data_access.QUERIES[name].columns.items()}
+
+    monkeypatch.setattr(DataAccess, "_read_versions", lambda self: dict(versions))
+    monkeypatch.setattr(DataAccess, "read_chunks", read_chunks)
+    access = DataAccess("sqlite://", check_interval=0)
+
+    gold = access.read("gold_ohlc_daily", format="numpy")
+    sp500 = access.read("sp500_index_data", format="numpy")
+    assert access.read("gold_ohlc_daily", format="numpy") is gold
+    assert reads == ["gold_ohlc_daily", "sp500_index_data"]
+
+    # A new gold load drops the gold rollup, but not the S&P 500 result.
+    versions["gold_price_history"] = (date(2024, 6, 2), 11)
+    assert access.read("gold_ohlc_daily", format="numpy") is not gold
+    assert access.read("sp500_index_data", format="numpy") is sp500
+    assert reads == ["gold_ohlc_daily", "sp500_index_data", "gold_ohlc_daily"]
+    assert len(access.cache._entries) == 2